@@ -1,6 +1,36 @@
+import asyncio
+import contextlib
+
 from fastapi import FastAPI
-from lib.routes import router as api_router
+from lib.db import get_writer
+from lib.models import Settings
+from lib.routes import IDEMPOTENT_ROUTES, router as api_router
+from lib.utils.auto_enrollment import scheduler
+from lib.utils.idempotency import IdempotencyMiddleware
+from lib.utils.metrics import MetricsMiddleware
+from lib.utils.seat_feed import seat_feed
+from lib.utils.warmup import warm_up
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.startup_warmup:
+        await warm_up(app)
+    scheduler.start()
+    seat_feed.start()
+    yield
+    await seat_feed.stop()
+    await scheduler.stop()
+    writer = get_writer()
+    if writer is not None:
+        # commit the writes still queued
+        await asyncio.to_thread(writer.close)
+
 
+settings = Settings()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(api_router)
+app.add_middleware(IdempotencyMiddleware, routes=IDEMPOTENT_ROUTES)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,216 @@
+import argparse
+import contextlib
+import datetime
+import itertools
+import pathlib
+import random
+import sqlite3
+import sys
+import time
+
+from lib.loader import LOAD_PRAGMAS, drop_derived_objects, restore_derived_objects
+from lib.migrations import migrate
+from lib.utils.seat_counters import repair_seat_counters
+
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Same order as bin/init.sh
+SCHEMA_FILES = [
+    "departments", "professors", "students", "courses", "sections",
+    "enrollments", "waitlists", "droplists", "configs", "catalog",
+]
+
+# Seed rows from share/*.sql that are replaced by generated ones (children first)
+GENERATED_TABLES = ["droplist", "waitlist", "enrollments", "course_section", "course", "students", "professors"]
+
+ROOM_CAPACITIES = [20, 25, 30, 40, 60, 120]
+
+FIRST_NAMES = ["Ana", "Ben", "Chen", "Dana", "Eli", "Fatima", "Gus", "Hana", "Ivan", "Jun", "Kai", "Lena"]
+LAST_NAMES = ["Garcia", "Nguyen", "Smith", "Kim", "Patel", "Lopez", "Brown", "Singh", "Chen", "Davis"]
+
+
+def build_schema(db: sqlite3.Connection):
+    """Create the schema exactly like bin/init.sh, then bring it to the latest version."""
+    for name in SCHEMA_FILES:
+        db.executescript((ROOT / "share" / f"{name}.sql").read_text())
+    migrate(db)
+
+
+def section_weights(sections: int, skew: float, rng: random.Random):
+    """
+    Zipf-like popularity: the n-th most popular section gets weight 1 / n**skew
+
+    Returns:
+        list[float]: Cumulative weights, one per section id (1-based ids in order).
+    """
+
+    weights = [1 / (rank ** skew) for rank in range(1, sections + 1)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def generate(db: sqlite3.Connection, students: int, sections: int, professors: int,
+             max_enrollments: int, skew: float, waitlist_capacity: int,
+             max_student_waitlists: int, seed: int):
+    """
+    Replace the seed data with a synthetic campus
+
+    Every student tries to enroll in 1..`max_enrollments` sections, picked by
+    popularity, with the same rules as the API: seats first, then the section
+    waitlist (up to `waitlist_capacity`) while the student is on fewer than
+    `max_student_waitlists` waitlists. Popular sections therefore fill up and
+    carry waitlists, like on a registration morning.
+
+    Returns:
+        dict: Rows generated per table.
+    """
+
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    departments = [row[0] for row in db.execute("SELECT code FROM departments ORDER BY code")]
+
+    for table in GENERATED_TABLES:
+        db.execute(f"DELETE FROM {table}")
+    derived = drop_derived_objects(db, GENERATED_TABLES)
+
+    db.executemany(
+        "INSERT INTO professors (id, first_name, last_name, email, phone) VALUES (?, ?, ?, ?, ?)",
+        (
+            (i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"prof{i}@example.edu", 6570000000 + i)
+            for i in range(1, professors + 1)
+        ),
+    )
+    db.executemany(
+        "INSERT INTO students (id, first_name, last_name, email) VALUES (?, ?, ?, ?)",
+        (
+            (i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"student{i}@example.edu")
+            for i in range(1, students + 1)
+        ),
+    )
+
+    # about three sections per course
+    courses = [
+        (departments[i % len(departments)], 100 + i // len(departments))
+        for i in range(max(1, sections // 3))
+    ]
+    db.executemany(
+        "INSERT INTO course (department_code, course_no, title, description) VALUES (?, ?, ?, ?)",
+        ((dept, no, f"{dept} {no}", None) for dept, no in courses),
+    )
+
+    capacity = {}
+    section_rows = []
+    section_numbers = {}
+    for section_id in range(1, sections + 1):
+        dept, no = rng.choice(courses)
+        section_numbers[dept, no] = section_numbers.get((dept, no), 0) + 1
+        capacity[section_id] = rng.choice(ROOM_CAPACITIES)
+        section_rows.append((
+            section_id, dept, no, section_numbers[dept, no], "FA", today.year,
+            rng.randint(1, professors), rng.randint(100, 999), capacity[section_id],
+            (today + datetime.timedelta(days=14)).isoformat(),
+            f"{today - datetime.timedelta(days=7)} 08:00:00",
+            f"{today + datetime.timedelta(days=7)} 17:00:00",
+        ))
+    db.executemany(
+        """
+        INSERT INTO course_section (id, dept_code, course_num, section_no, semester, year, prof_id,
+            room_num, room_capacity, course_start_date, enrollment_start, enrollment_end)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        section_rows,
+    )
+
+    cumulative = section_weights(sections, skew, rng)
+    section_ids = range(1, sections + 1)
+    enrolled = dict.fromkeys(section_ids, 0)
+    waitlisted = dict.fromkeys(section_ids, 0)
+    enrollment_rows = []
+    waitlist_rows = []
+    clock = datetime.datetime.combine(today - datetime.timedelta(days=7), datetime.time(8))
+
+    for student_id in range(1, students + 1):
+        wanted = min(rng.randint(1, max_enrollments), sections)
+        picked = set()
+        while len(picked) < wanted:
+            picked.update(rng.choices(section_ids, cum_weights=cumulative, k=wanted - len(picked)))
+
+        student_waitlists = 0
+        for section_id in picked:
+            clock += datetime.timedelta(seconds=rng.randint(1, 5))
+            if enrolled[section_id] < capacity[section_id]:
+                enrolled[section_id] += 1
+                enrollment_rows.append((section_id, student_id, clock.isoformat(" ")))
+            elif waitlisted[section_id] < waitlist_capacity and student_waitlists < max_student_waitlists:
+                waitlisted[section_id] += 1
+                student_waitlists += 1
+                waitlist_rows.append((section_id, student_id, clock.isoformat(" ")))
+
+    db.executemany(
+        "INSERT INTO enrollments (section_id, student_id, enrollment_date) VALUES (?, ?, ?)",
+        enrollment_rows,
+    )
+    db.executemany(
+        "INSERT INTO waitlist (section_id, student_id, waitlist_date) VALUES (?, ?, ?)",
+        waitlist_rows,
+    )
+    db.commit()
+
+    restore_derived_objects(db, derived)
+    repair_seat_counters(db)
+    # the catalog triggers were dropped during the load, so bump the version by hand
+    db.execute(
+        """
+        UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP
+        WHERE name = 'catalog'
+        """
+    )
+    db.execute("ANALYZE")
+    db.commit()
+
+    return {
+        "professors": professors,
+        "students": students,
+        "courses": len(courses),
+        "sections": sections,
+        "enrollments": len(enrollment_rows),
+        "waitlist": len(waitlist_rows),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a database filled with a synthetic campus for benchmarking.")
+    parser.add_argument("--database", default="var/bench.db", help="database to (re)create")
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--sections", type=int, default=1500)
+    parser.add_argument("--professors", type=int, default=300)
+    parser.add_argument("--max-enrollments", type=int, default=5, help="sections each student tries to join")
+    parser.add_argument("--skew", type=float, default=1.0, help="zipf exponent of section popularity (0 = uniform)")
+    parser.add_argument("--waitlist-capacity", type=int, default=15)
+    parser.add_argument("--max-student-waitlists", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=449)
+    args = parser.parse_args(argv)
+
+    path = pathlib.Path(args.database)
+    for suffix in ("", "-wal", "-shm"):
+        pathlib.Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    started = time.perf_counter()
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        build_schema(db)
+        for name, value in LOAD_PRAGMAS.items():
+            db.execute(f"PRAGMA {name}={value}")
+        counts = generate(
+            db, args.students, args.sections, args.professors, args.max_enrollments,
+            args.skew, args.waitlist_capacity, args.max_student_waitlists, args.seed,
+        )
+
+    for table, rows in counts.items():
+        print(f"{table}: {rows:,}")
+    print(f"{path} built in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
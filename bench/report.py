@@ -0,0 +1,106 @@
+import argparse
+import json
+import math
+import sys
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float], statuses: dict, errors: int, seconds: float) -> dict:
+    """
+    Throughput and latency percentiles for one route (or all of them)
+
+    Parameters:
+        latencies (list[float]): Seconds per completed request.
+        statuses (dict): HTTP status -> count.
+        errors (int): Requests that failed without a response or with a 5xx.
+        seconds (float): Length of the measured window.
+
+    Returns:
+        dict: requests, errors, statuses, throughput (req/s) and latency in ms.
+    """
+
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput": round(len(ordered) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "max_ms": round(1000 * ordered[-1], 3) if ordered else 0.0,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(1000 * percentile(ordered, p), 3)
+    return summary
+
+
+def print_report(report: dict):
+    meta = report["meta"]
+    print(f"{meta['mode']} {meta['concurrency']} clients, {meta['seconds']:.1f}s, commit {meta.get('commit') or '-'}")
+    rows = list(report["routes"].items()) + [("total", report["total"])]
+    width = max(len(name) for name, _ in rows)
+    header = f"{'route':<{width}} {'req':>7} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for name, s in rows:
+        print(
+            f"{name:<{width}} {s['requests']:>7} {s['throughput']:>9.1f} "
+            f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['errors']:>5}"
+        )
+
+
+def compare(old: dict, new: dict):
+    """
+    Change in throughput and latency percentiles per route between two reports
+
+    Returns:
+        list[tuple]: (route, metric, old, new, change in %) for every compared value.
+    """
+
+    rows = []
+    names = [n for n in new["routes"] if n in old["routes"]] + ["total"]
+    for name in names:
+        before = old["total"] if name == "total" else old["routes"][name]
+        after = new["total"] if name == "total" else new["routes"][name]
+        for metric in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+            a, b = before[metric], after[metric]
+            change = round(100 * (b - a) / a, 1) if a else None
+            rows.append((name, metric, a, b, change))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a benchmark report, or compare two of them.")
+    parser.add_argument("reports", nargs="+", metavar="REPORT", help="one report to print, or OLD NEW to compare")
+    args = parser.parse_args(argv)
+
+    loaded = []
+    for path in args.reports:
+        with open(path) as f:
+            loaded.append(json.load(f))
+
+    if len(loaded) == 1:
+        print_report(loaded[0])
+        return 0
+    if len(loaded) != 2:
+        parser.error("pass one report, or two to compare")
+
+    rows = compare(*loaded)
+    width = max(len(row[0]) for row in rows)
+    for name, metric, a, b, change in rows:
+        delta = "n/a" if change is None else f"{change:+.1f}%"
+        print(f"{name:<{width}} {metric:<10} {a:>10.2f} -> {b:>10.2f} {delta:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
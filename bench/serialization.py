@@ -0,0 +1,73 @@
+import argparse
+import contextlib
+import json
+import sqlite3
+import statistics
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from lib.utils.json_response import Rows, RowsJSONResponse, orjson
+
+
+# Same shape as GET /professors/{id}/enrollments and GET /classes/
+QUERIES = {
+    "enrollments": "SELECT * FROM enrollments ORDER BY section_id, student_id LIMIT ?",
+    "classes": """
+        SELECT c.*, cs.id as section_id
+        FROM course_section cs
+        INNER JOIN course c ON c.department_code = cs.dept_code AND c.course_no = cs.course_num
+        ORDER BY cs.id
+        LIMIT ?
+    """,
+}
+
+
+def generic_response(db: sqlite3.Connection, sql: str, rows: int) -> bytes:
+    """What the routes did before: sqlite3.Row objects through jsonable_encoder and JSONResponse."""
+    db.row_factory = sqlite3.Row
+    content = {"rows": db.execute(sql, [rows]).fetchall(), "next_cursor": None}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def rows_response(db: sqlite3.Connection, sql: str, rows: int) -> bytes:
+    db.row_factory = sqlite3.Row
+    return RowsJSONResponse({"rows": Rows.fetch(db, sql, [rows]), "next_cursor": None}).body
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time building a JSON list response with and without RowsJSONResponse.")
+    parser.add_argument("--database", default="var/bench.db", help="database built by bench.generate")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per response")
+    parser.add_argument("--repeat", type=int, default=10, help="responses timed per path (the median is shown)")
+    args = parser.parse_args(argv)
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (orjson not installed)'}")
+    with contextlib.closing(sqlite3.connect(args.database)) as db:
+        for name, sql in QUERIES.items():
+            generic, old_body = timed(lambda: generic_response(db, sql, args.rows), args.repeat)
+            fast, new_body = timed(lambda: rows_response(db, sql, args.rows), args.repeat)
+            if json.loads(old_body) != json.loads(new_body):
+                raise SystemExit(f"{name}: the two responses differ")
+            count = len(json.loads(new_body)["rows"])
+            print(
+                f"{name:<12} {count:>7} rows {len(new_body) / 1024:>8.0f} KiB   "
+                f"generic {1000 * generic:>8.2f} ms   rows {1000 * fast:>7.2f} ms   "
+                f"speedup {generic / fast:>5.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import argparse
+import collections
+import contextlib
+import os
+import pathlib
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.workload import ROOT, free_port
+
+
+IMPORT_API = "import time; started = time.perf_counter(); import api; print(time.perf_counter() - started)"
+
+
+def import_time(database: str, top: int):
+    """
+    Time `import api` in a fresh interpreter, and break it down per top-level package with -X importtime
+
+    Returns:
+        tuple[float, list[tuple[str, float]]]: Seconds, and the `top` packages by seconds spent importing them.
+    """
+
+    env = {**os.environ, "DATABASE": database}
+    seconds = float(subprocess.check_output([sys.executable, "-c", IMPORT_API], cwd=ROOT, env=env, text=True))
+
+    trace = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    packages = collections.Counter()
+    for line in trace.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return seconds, packages.most_common(top)
+
+
+@contextlib.contextmanager
+def worker(database: str, warmup: bool):
+    """
+    Run one `uvicorn api:app` process, the same app a gunicorn worker runs
+
+    uvicorn only listens once the lifespan startup is complete, so the block
+    is entered as soon as a connection is accepted, without sending any
+    request that would warm the worker up.
+    """
+
+    port = free_port()
+    env = {**os.environ, "DATABASE": database, "STARTUP_WARMUP": str(warmup).lower()}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise SystemExit(f"uvicorn exited with {server.returncode}")
+            with contextlib.suppress(OSError):
+                socket.create_connection(("127.0.0.1", port), timeout=1.0).close()
+                break
+            time.sleep(0.01)
+        yield f"http://127.0.0.1:{port}", time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def routes(database: str):
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        student = db.execute("SELECT MIN(student_id) FROM enrollments").fetchone()[0] or 1
+        professor = db.execute("SELECT MIN(prof_id) FROM course_section").fetchone()[0] or 1
+    return [
+        "/classes/?limit=50",
+        f"/students/{student}/schedule",
+        f"/professors/{professor}/enrollments?limit=50",
+        f"/student/{student}/waitlist",
+        "/configs",
+    ]
+
+
+def first_requests(url: str, paths: list[str], repeat: int):
+    """
+    Send every path once on a fresh worker, then `repeat` more times
+
+    Returns:
+        dict: path -> (first request seconds, median of the later ones).
+    """
+
+    timings = {}
+    with httpx.Client(base_url=url, timeout=30.0) as client:
+        for path in paths:
+            samples = []
+            for _ in range(repeat + 1):
+                started = time.perf_counter()
+                client.get(path).raise_for_status()
+                samples.append(time.perf_counter() - started)
+            timings[path] = (samples[0], statistics.median(samples[1:]))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure what a new worker process pays before it serves requests at steady-state latency."
+    )
+    parser.add_argument("--database", default="var/bench.db", help="database built by bench.generate")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per route after the first one")
+    parser.add_argument("--runs", type=int, default=3, help="fresh workers started per setting (the median is shown)")
+    parser.add_argument("--top", type=int, default=10, help="packages shown in the import breakdown")
+    args = parser.parse_args(argv)
+    database = str(pathlib.Path(args.database).resolve())
+
+    seconds, packages = import_time(database, args.top)
+    print(f"import api: {1000 * seconds:.0f} ms")
+    for name, spent in packages:
+        print(f"    {name:<24} {1000 * spent:>7.1f} ms")
+
+    paths = routes(database)
+    for warmup in (False, True):
+        ready = []
+        runs = collections.defaultdict(list)
+        for _ in range(args.runs):
+            with worker(database, warmup) as (url, startup):
+                ready.append(startup)
+                for path, timing in first_requests(url, paths, args.repeat).items():
+                    runs[path].append(timing)
+        print(f"\nstartup warmup {'on' if warmup else 'off'}: listening after {1000 * statistics.median(ready):.0f} ms")
+        for path in paths:
+            first = statistics.median(t[0] for t in runs[path])
+            steady = statistics.median(t[1] for t in runs[path])
+            print(f"    {path:<40} first {1000 * first:>7.2f} ms   steady {1000 * steady:>6.2f} ms   {first / steady:>5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
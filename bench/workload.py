@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import collections
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import pathlib
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.report import print_report, summarize
+
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Registration-morning mix: operation -> relative weight
+DEFAULT_MIX = {
+    "browse": 45,
+    "enroll": 20,
+    "drop": 10,
+    "waitlist": 20,
+    "professor": 5,
+    # not in the baseline mix, enable with --mix schedule=30
+    "schedule": 0,
+}
+
+
+class Campus:
+    """
+    What the workload needs to know about the data: id ranges, departments,
+    section popularity and the enrollments that can still be dropped.
+    """
+
+    def __init__(self, database: str, seed: int):
+        rng = random.Random(seed)
+        with contextlib.closing(sqlite3.connect(database)) as db:
+            self.students = [row[0] for row in db.execute("SELECT id FROM students")]
+            self.professors = [row[0] for row in db.execute("SELECT id FROM professors")]
+            self.departments = [row[0] for row in db.execute("SELECT DISTINCT dept_code FROM course_section")]
+            self.terms = db.execute("SELECT DISTINCT semester, year FROM course_section").fetchall()
+            sections = db.execute("SELECT id, enrolled_count + waitlist_count + 1 FROM course_section").fetchall()
+            self.droppable = db.execute("SELECT section_id, student_id FROM enrollments").fetchall()
+            self.waitlisted = db.execute("SELECT section_id, student_id FROM waitlist").fetchall()
+
+        if not self.students or not sections:
+            raise SystemExit(f"{database} has no students or sections, run python -m bench.generate first")
+
+        # demand follows the existing enrollments, so hot sections stay hot
+        self.sections = [row[0] for row in sections]
+        self.popularity = list(itertools.accumulate(row[1] for row in sections))
+        rng.shuffle(self.droppable)
+
+    def popular_section(self, rng: random.Random) -> int:
+        return rng.choices(self.sections, cum_weights=self.popularity)[0]
+
+    def take_enrollment(self):
+        # each enrollment is dropped at most once
+        return self.droppable.pop() if self.droppable else None
+
+    def counts(self) -> dict:
+        return {
+            "students": len(self.students),
+            "sections": len(self.sections),
+            "professors": len(self.professors),
+            "enrollments": len(self.droppable),
+            "waitlist": len(self.waitlisted),
+        }
+
+
+def next_request(kind: str, campus: Campus, rng: random.Random):
+    """
+    Build one request of the given kind
+
+    Returns:
+        tuple: (route label, method, url, json body or None)
+    """
+
+    if kind == "browse":
+        params = {"limit": 50}
+        choice = rng.random()
+        if choice < 0.3:
+            params["department"] = rng.choice(campus.departments)
+        elif choice < 0.5:
+            params["semester"], params["year"] = rng.choice(campus.terms)
+        elif choice < 0.7:
+            params["open_seats"] = "true"
+        if rng.random() < 0.3:
+            params["after"] = rng.choice(campus.sections)
+        return "GET /classes/", "GET", "/classes/?" + "&".join(f"{k}={v}" for k, v in params.items()), None
+
+    if kind == "enroll":
+        body = {"student_id": rng.choice(campus.students), "section_id": campus.popular_section(rng)}
+        return "POST /enrollments/", "POST", "/enrollments/", body
+
+    if kind == "drop":
+        enrollment = campus.take_enrollment()
+        if enrollment is not None:
+            section_id, student_id = enrollment
+            return (
+                "DELETE /enrollments/course_section/{section_id}/student/{student_id}",
+                "DELETE",
+                f"/enrollments/course_section/{section_id}/student/{student_id}?prof_id=0",
+                None,
+            )
+        return next_request("browse", campus, rng)
+
+    if kind == "waitlist":
+        if campus.waitlisted and rng.random() < 0.5:
+            section_id, student_id = rng.choice(campus.waitlisted)
+            return (
+                "GET /student/waitlist/{section_id}/{student_id}",
+                "GET",
+                f"/student/waitlist/{section_id}/{student_id}",
+                None,
+            )
+        student_id = rng.choice(campus.students)
+        return "GET /student/{student_id}/waitlist", "GET", f"/student/{student_id}/waitlist", None
+
+    if kind == "professor":
+        prof_id = rng.choice(campus.professors)
+        return "GET /professors/{id}/enrollments", "GET", f"/professors/{prof_id}/enrollments?limit=100", None
+
+    if kind == "schedule":
+        student_id = rng.choice(campus.students)
+        return "GET /students/{student_id}/schedule", "GET", f"/students/{student_id}/schedule", None
+
+    raise ValueError(f"unknown operation {kind!r}")
+
+
+async def run_workload(client: httpx.AsyncClient, campus: Campus, mix: dict, concurrency: int,
+                       duration: float, warmup: float, max_requests: int, seed: int):
+    """
+    Drive `concurrency` closed-loop clients for `warmup` + `duration` seconds
+
+    Returns:
+        tuple[dict, float]: Per-route raw results and the measured seconds.
+    """
+
+    kinds = list(mix)
+    cum_weights = list(itertools.accumulate(mix.values()))
+    results = collections.defaultdict(lambda: {"latencies": [], "statuses": collections.Counter(), "errors": 0})
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    deadline = measure_from + duration
+    sent = 0
+
+    async def worker(n: int):
+        nonlocal sent
+        rng = random.Random(seed + n)
+        while loop.time() < deadline and (not max_requests or sent < max_requests):
+            kind = rng.choices(kinds, cum_weights=cum_weights)[0]
+            label, method, url, body = next_request(kind, campus, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            elapsed = time.perf_counter() - started
+
+            if loop.time() < measure_from:
+                continue
+            sent += 1
+            route = results[label]
+            if status is None or status >= 500:
+                route["errors"] += 1
+            if status is not None:
+                route["statuses"][status] += 1
+                route["latencies"].append(elapsed)
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return results, max(0.0, loop.time() - measure_from)
+
+
+def build_report(results: dict, seconds: float, meta: dict) -> dict:
+    routes = {
+        label: summarize(r["latencies"], r["statuses"], r["errors"], seconds)
+        for label, r in sorted(results.items())
+    }
+    total = summarize(
+        [latency for r in results.values() for latency in r["latencies"]],
+        sum((r["statuses"] for r in results.values()), collections.Counter()),
+        sum(r["errors"] for r in results.values()),
+        seconds,
+    )
+    return {"meta": {**meta, "seconds": round(seconds, 3)}, "total": total, "routes": routes}
+
+
+async def run_in_process(args, campus: Campus, mix: dict):
+    # Settings are read at import time
+    os.environ["DATABASE"] = str(pathlib.Path(args.database).resolve())
+    import api
+
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_workload(
+                client, campus, mix, args.concurrency, args.duration, args.warmup, args.requests, args.seed
+            )
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_server(database: str, workers: int):
+    """Run `uvicorn api:app` on a free local port for the duration of the block."""
+    port = free_port()
+    env = {**os.environ, "DATABASE": str(pathlib.Path(database).resolve())}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            if server.poll() is not None:
+                raise SystemExit(f"uvicorn exited with {server.returncode}")
+            with contextlib.suppress(httpx.HTTPError):
+                httpx.get(url + "/autoenrollment/status", timeout=1.0)
+                break
+            time.sleep(0.05)
+        yield url
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+async def run_http(args, campus: Campus, mix: dict, url: str):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        return await run_workload(
+            client, campus, mix, args.concurrency, args.duration, args.warmup, args.requests, args.seed
+        )
+
+
+def git_commit():
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    return None
+
+
+def parse_mix(text: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    if text:
+        for item in text.split(","):
+            kind, _, weight = item.partition("=")
+            if kind not in DEFAULT_MIX:
+                raise argparse.ArgumentTypeError(f"unknown operation {kind!r}")
+            mix[kind] = float(weight)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a registration-morning request mix against api:app.")
+    parser.add_argument("--database", default="var/bench.db", help="database built by bench.generate (it is modified)")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--url", help="http mode: benchmark this server instead of starting uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="http mode: uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds first")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many measured requests")
+    parser.add_argument("--mix", type=parse_mix, default="",
+                        help="weights, e.g. browse=60,enroll=30,drop=10 (others keep their defaults)")
+    parser.add_argument("--seed", type=int, default=449)
+    parser.add_argument("--output", help="report path (defaults to var/bench/<time>-<mode>.json)")
+    args = parser.parse_args(argv)
+
+    campus = Campus(args.database, args.seed)
+    meta = {
+        "mode": args.mode,
+        "url": args.url,
+        "workers": args.workers if args.mode == "http" else None,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "mix": args.mix,
+        "seed": args.seed,
+        "data": campus.counts(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+    if args.mode == "inprocess":
+        results, seconds = asyncio.run(run_in_process(args, campus, args.mix))
+    elif args.url:
+        results, seconds = asyncio.run(run_http(args, campus, args.mix, args.url))
+    else:
+        with local_server(args.database, args.workers) as url:
+            results, seconds = asyncio.run(run_http(args, campus, args.mix, url))
+
+    report = build_report(results, seconds, meta)
+    output = pathlib.Path(
+        args.output or f"var/bench/{datetime.datetime.now():%Y%m%d-%H%M%S}-{args.mode}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+
+    print_report(report)
+    print(f"report saved to {output}")
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,3 +7,6 @@ sqlite3 ./var/titanonline.db < ./share/enrollments.sql
 sqlite3 ./var/titanonline.db < ./share/waitlists.sql
 sqlite3 ./var/titanonline.db < ./share/droplists.sql
 sqlite3 ./var/titanonline.db < ./share/configs.sql
+sqlite3 ./var/titanonline.db < ./share/catalog.sql
+sqlite3 ./var/titanonline.db < ./share/idempotency.sql
+python -m lib.migrations --database ./var/titanonline.db
@@ -0,0 +1,23 @@
+# Production server: python -m gunicorn -c gunicorn.conf.py api:app
+#
+# Several worker processes share the SQLite database (WAL, one writer at a
+# time), each with its own connection pool and caches. With preload_app the
+# master imports api.py once (FastAPI, pydantic models, routes) and the
+# workers are forked from it; nothing opens a database connection or starts
+# a thread at import time, those happen per worker in the lifespan, which
+# also warms the worker up before it accepts requests (see lib/utils/warmup.py).
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+# seconds; the lifespan warmup runs before the worker reports for duty
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30  # lets the group-commit writer flush queued writes on shutdown
+keepalive = 5
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")  # e.g. "-" for stdout; off by default
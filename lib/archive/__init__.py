@@ -0,0 +1,353 @@
+import argparse
+import contextlib
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+
+
+# Per-term tables moved out of the hot database, parents first
+ARCHIVED_TABLES = ("course_section", "enrollments", "waitlist", "droplist")
+
+ARCHIVED_TERMS_QUERY = "SELECT semester, year, path FROM term_archive ORDER BY year, semester"
+
+# Archived terms a professor taught in, through the term_archive_professor(prof_id) key
+PROFESSOR_TERMS_QUERY = """
+    SELECT a.semester, a.year, a.path
+    FROM term_archive_professor p
+    JOIN term_archive a ON a.year = p.year AND a.semester = p.semester
+    WHERE p.prof_id = ?
+    ORDER BY a.year, a.semester
+"""
+
+TERM_VERSIONS_QUERY = "SELECT name, version FROM catalog_version WHERE name IN ('catalog', 'seats') ORDER BY name"
+
+# CREATE TABLE / CREATE INDEX statement, up to the object name
+CREATE_OBJECT = re.compile(r"^(CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?)", re.IGNORECASE)
+
+
+class ArchiveError(Exception):
+    """Raised when a term cannot be archived."""
+
+
+def schema_name(semester: str, year: int) -> str:
+    """Name a term's archive is attached under, e.g. term_2023_fa."""
+    if not semester.isalpha():
+        raise ArchiveError(f"invalid semester: {semester!r}")
+    return f"term_{int(year)}_{semester.lower()}"
+
+
+def database_directory(db: sqlite3.Connection) -> pathlib.Path:
+    """Directory of the main database file, which archive paths are relative to."""
+    for _, name, path in db.execute("PRAGMA database_list"):
+        if name == "main":
+            return pathlib.Path(path).parent
+
+
+def matching_archives(db: sqlite3.Connection, semester: str = None, year: int = None, prof_id: int = None):
+    """
+    Archived terms a query reads
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        semester (str, optional): Only archives of this semester.
+        year (int, optional): Only archives of this year.
+        prof_id (int, optional): Only archives of terms this professor taught in.
+
+    Returns:
+        list[tuple[str, str]]: Schema name and path of each archive, oldest term first.
+
+    Raises:
+        ArchiveError: If more archives match than one connection can attach.
+    """
+
+    if prof_id is not None:
+        terms = db.execute(PROFESSOR_TERMS_QUERY, [prof_id]).fetchall()
+    else:
+        terms = db.execute(ARCHIVED_TERMS_QUERY).fetchall()
+    archives = [
+        (schema_name(term_semester, term_year), path)
+        for term_semester, term_year, path in terms
+        if (semester is None or term_semester == semester) and (year is None or term_year == year)
+    ]
+    limit = db.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(archives) > limit:
+        raise ArchiveError(
+            f"{len(archives)} archived terms match, one query can read at most {limit}: filter by semester or year"
+        )
+    return archives
+
+
+def attach_archives(db: sqlite3.Connection, semester: str = None, year: int = None, prof_id: int = None):
+    """
+    Attach the archives of closed terms a query reads to a connection
+
+    Only the matching archives are attached, however many terms are archived.
+    They are opened read-only and immutable and stay attached for the next
+    queries on the connection; archives the query does not read are detached,
+    so a pooled connection never runs out of attach slots. Must be called
+    outside of a transaction.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        semester (str, optional): Only archives of this semester.
+        year (int, optional): Only archives of this year.
+        prof_id (int, optional): Only archives of terms this professor taught in.
+
+    Returns:
+        list[str]: Schema names of the matching archives, oldest term first.
+
+    Raises:
+        ArchiveError: If more archives match than one connection can attach.
+    """
+
+    archives = matching_archives(db, semester, year, prof_id)
+    schemas = [schema for schema, _ in archives]
+    attached = {row[1] for row in db.execute("PRAGMA database_list")}
+    for schema in attached - {"main", "temp"} - set(schemas):
+        db.execute(f"DETACH DATABASE {schema}")
+    directory = None
+    for schema, path in archives:
+        if schema not in attached:
+            directory = directory or database_directory(db)
+            uri = (directory / path).resolve().as_uri() + "?mode=ro&immutable=1"
+            db.execute(f"ATTACH DATABASE ? AS {schema}", [uri])
+    return schemas
+
+
+def union_terms(sql: str, schemas: list[str], tail: str) -> str:
+    """
+    Run a query over the hot database and archived terms
+
+    Parameters:
+        sql (str): Query naming its per-term tables as `{schema}.table`.
+        schemas (list[str]): Archives to include, from `attach_archives`.
+        tail (str): ORDER BY / LIMIT applied to the combined rows, in terms
+            of the result columns.
+
+    Returns:
+        str: `sql` on the hot database alone when there are no archives,
+        otherwise a UNION ALL with one branch per database.
+    """
+
+    if not schemas:
+        return sql.format(schema="main")
+    branches = (f"SELECT * FROM ({sql.format(schema=schema)})" for schema in ("main", *schemas))
+    return "\nUNION ALL\n".join(branches) + f"\n{tail}"
+
+
+def archived_terms(db: sqlite3.Connection):
+    return db.execute(
+        "SELECT semester, year, path, sections, archived_at FROM term_archive ORDER BY year, semester"
+    ).fetchall()
+
+
+def term_versions(db: sqlite3.Connection):
+    return db.execute(TERM_VERSIONS_QUERY).fetchall()
+
+
+def build_archive(db: sqlite3.Connection, path: pathlib.Path, semester: str, year: int):
+    """
+    Copy a term's sections, enrollments, waitlists and drops into a new file
+
+    The copy runs in one read transaction on the hot database, so it is a
+    consistent snapshot and does not block the API's writers. The archive
+    gets the same tables and indexes (the seat counters are copied frozen,
+    triggers are not copied) and a rollback journal, so it can be opened
+    read-only without a WAL index.
+
+    Parameters:
+        db (sqlite3.Connection): Connection to the hot database, outside of a transaction.
+        path (pathlib.Path): Archive file to create. Replaced if it exists.
+        semester (str): Semester code.
+        year (int): Year.
+
+    Returns:
+        tuple[dict, list]: Rows copied per table, and the catalog/seats
+        versions the copy was taken at.
+    """
+
+    for leftover in (path, path.with_name(path.name + "-journal")):
+        with contextlib.suppress(FileNotFoundError):
+            leftover.unlink()
+
+    objects = db.execute(
+        f"""
+        SELECT type, sql FROM main.sqlite_master
+        WHERE type IN ('table', 'index') AND sql IS NOT NULL
+            AND tbl_name IN ({', '.join('?' * len(ARCHIVED_TABLES))})
+        """,
+        ARCHIVED_TABLES,
+    ).fetchall()
+    term = {"semester": semester, "year": year}
+
+    db.execute("ATTACH DATABASE ? AS archive", [str(path)])
+    try:
+        db.execute("BEGIN")
+        try:
+            for type_, sql in objects:
+                if type_ == "table":
+                    db.execute(CREATE_OBJECT.sub(r"\1archive.", sql, count=1))
+            db.execute(
+                "INSERT INTO archive.course_section "
+                "SELECT * FROM main.course_section WHERE semester = :semester AND year = :year",
+                term,
+            )
+            for table in ARCHIVED_TABLES[1:]:
+                db.execute(
+                    f"INSERT INTO archive.{table} "
+                    f"SELECT * FROM main.{table} WHERE section_id IN (SELECT id FROM archive.course_section)"
+                )
+            # indexes are built once the rows are in
+            for type_, sql in objects:
+                if type_ == "index":
+                    db.execute(CREATE_OBJECT.sub(r"\1archive.", sql, count=1))
+            counts = {table: db.execute(f"SELECT COUNT(*) FROM archive.{table}").fetchone()[0] for table in ARCHIVED_TABLES}
+            versions = term_versions(db)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        db.execute("ANALYZE archive")
+    finally:
+        db.execute("DETACH DATABASE archive")
+    return counts, versions
+
+
+def move_term(db: sqlite3.Connection, semester: str, year: int, path: str, versions: list, sections: int):
+    """
+    Delete an archived term from the hot database and register its archive
+    and the professors who taught in it
+
+    Runs in one BEGIN IMMEDIATE transaction, after checking that the
+    catalog and seat versions still match the ones the archive was built at
+    (nothing was written in between).
+
+    Returns:
+        bool: False if something changed since the copy; nothing is deleted then.
+    """
+
+    term = {"semester": semester, "year": year}
+    term_sections = "SELECT id FROM course_section WHERE semester = :semester AND year = :year"
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if term_versions(db) != versions:
+            db.rollback()
+            return False
+        for table in reversed(ARCHIVED_TABLES[1:]):
+            db.execute(f"DELETE FROM {table} WHERE section_id IN ({term_sections})", term)
+        db.execute(
+            "INSERT INTO term_archive_professor (semester, year, prof_id) "
+            "SELECT DISTINCT semester, year, prof_id FROM course_section WHERE semester = :semester AND year = :year",
+            term,
+        )
+        db.execute("DELETE FROM course_section WHERE semester = :semester AND year = :year", term)
+        db.execute(
+            "INSERT INTO term_archive (semester, year, path, sections) VALUES (:semester, :year, :path, :sections)",
+            {**term, "path": path, "sections": sections},
+        )
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return True
+
+
+def archive_term(db: sqlite3.Connection, semester: str, year: int, directory: pathlib.Path,
+                 force: bool = False, attempts: int = 3):
+    """
+    Move a closed term out of the hot database into a read-only archive file
+
+    The term's rows are copied into `<directory>/<year>-<semester>.db`, the
+    file is made read-only, then the rows are deleted from the hot database
+    and the archive is registered in term_archive, in one transaction. A
+    write to the catalog or the seat counters between the copy and the
+    delete restarts the copy. An archive file that was never registered
+    (an interrupted run) is rebuilt.
+
+    Parameters:
+        db (sqlite3.Connection): Connection to the hot database, outside of a transaction.
+        semester (str): Semester code.
+        year (int): Year.
+        directory (pathlib.Path): Where archive files are written.
+        force (bool): Archive the term even if enrollment is still open in some of its sections.
+        attempts (int): Copies tried before giving up on a busy term.
+
+    Returns:
+        dict: Rows moved per table.
+
+    Raises:
+        ArchiveError: If the term is unknown, already archived, still open or
+            kept changing.
+    """
+
+    schema_name(semester, year)
+    if any((s, y) == (semester, year) for s, y, *_ in archived_terms(db)):
+        raise ArchiveError(f"{semester} {year} is already archived")
+
+    sections, enrollment_end = db.execute(
+        "SELECT COUNT(*), MAX(enrollment_end) FROM course_section WHERE semester = ? AND year = ?",
+        [semester, year],
+    ).fetchone()
+    if not sections:
+        raise ArchiveError(f"no sections in {semester} {year}")
+    if not force and db.execute("SELECT ? >= datetime('now')", [enrollment_end]).fetchone()[0]:
+        raise ArchiveError(f"enrollment in {semester} {year} is open until {enrollment_end} (use --force)")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{year}-{semester}.db"
+    try:
+        relative = str(path.resolve().relative_to(database_directory(db).resolve()))
+    except ValueError:
+        relative = str(path.resolve())
+
+    for _ in range(attempts):
+        counts, versions = build_archive(db, path, semester, year)
+        path.chmod(0o444)
+        if move_term(db, semester, year, relative, versions, counts["course_section"]):
+            return counts
+        path.unlink()
+    raise ArchiveError(f"{semester} {year} kept changing while it was copied, try again later")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Move closed terms out of the database into read-only archive files."
+    )
+    parser.add_argument("--database", help="SQLite database path (defaults to Settings.database)")
+    parser.add_argument("--semester", help="semester code of the term to archive (SP, SU, FA, WI)")
+    parser.add_argument("--year", type=int, help="year of the term to archive")
+    parser.add_argument("--directory", help="where archive files are written (defaults to archive/ next to the database)")
+    parser.add_argument("--force", action="store_true", help="archive the term even if enrollment is still open")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards to return the freed pages")
+    parser.add_argument("--list", action="store_true", help="list the archived terms only")
+    args = parser.parse_args(argv)
+    if not args.list and (args.semester is None or args.year is None):
+        parser.error("--semester and --year are required")
+
+    database = args.database
+    if database is None:
+        from lib.models import Settings
+
+        database = Settings().database
+
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        db.execute("PRAGMA busy_timeout=5000")
+        if not args.list:
+            directory = pathlib.Path(args.directory) if args.directory else database_directory(db) / "archive"
+            try:
+                counts = archive_term(db, args.semester, args.year, directory, force=args.force)
+            except ArchiveError as e:
+                print(e, file=sys.stderr)
+                return 1
+            print(f"archived {args.semester} {args.year}: " + ", ".join(f"{n:,} {t}" for t, n in counts.items()))
+            if args.vacuum:
+                db.execute("VACUUM")
+
+        directory = database_directory(db)
+        for semester, year, path, sections, archived_at in archived_terms(db):
+            size = os.path.getsize(directory / path) if (directory / path).exists() else 0
+            print(f"{semester} {year}: {sections:,} sections, {size / 1024:,.0f} KiB in {path} (archived {archived_at})")
+    return 0
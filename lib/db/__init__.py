@@ -1,15 +1,122 @@
-import contextlib
 import sqlite3
+import threading
 
+from fastapi import HTTPException, status
 
 from ..models import Settings
+from .aio import AsyncDatabase
+from .instrument import InstrumentedConnection
+from .pool import ConnectionPool, PoolTimeout
+from .writer import GroupCommitWriter
 
 
 settings = Settings()
 
+_pool = None
+_pool_lock = threading.Lock()
+_async_db = None
+_writer = None
 
-def get_db():
-    with contextlib.closing(sqlite3.connect(settings.database)) as db:
-        db.row_factory = sqlite3.Row
-        db.execute("PRAGMA foreign_keys=ON")
+
+def _pragmas() -> dict:
+    return {
+        "journal_mode": settings.db_journal_mode,
+        "synchronous": settings.db_synchronous,
+        "cache_size": settings.db_cache_size,
+        "mmap_size": settings.db_mmap_size,
+        "busy_timeout": settings.db_busy_timeout,
+        "foreign_keys": "ON",
+    }
+
+
+def _factory() -> type:
+    return InstrumentedConnection if settings.metrics_enabled else sqlite3.Connection
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide connection pool, creating it on first use.
+
+    In "group" write mode the pool connections are read-only, writes go
+    through `get_writer()`.
+
+    Returns:
+        ConnectionPool: Pool configured from `Settings`.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    settings.database,
+                    size=settings.db_pool_size,
+                    timeout=settings.db_pool_timeout,
+                    pragmas=_pragmas(),
+                    factory=_factory(),
+                    read_only=settings.db_write_mode == "group",
+                )
+    return _pool
+
+
+def get_writer():
+    """
+    Return the process-wide group-commit writer, creating it on first use.
+
+    Returns:
+        GroupCommitWriter | None: The writer in "group" write mode, otherwise None.
+    """
+    global _writer
+    if settings.db_write_mode != "group":
+        return None
+    if _writer is None:
+        with _pool_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(
+                    ConnectionPool(
+                        settings.database,
+                        size=1,
+                        timeout=settings.db_pool_timeout,
+                        pragmas=_pragmas(),
+                        factory=_factory(),
+                    ),
+                    window=settings.db_group_commit_window,
+                    max_batch=settings.db_group_commit_max_batch,
+                )
+    return _writer
+
+
+def get_async_database() -> AsyncDatabase:
+    """
+    Return the process-wide async database, creating it on first use.
+
+    Returns:
+        AsyncDatabase: Wrapper around `get_pool()` and `get_writer()` configured from `Settings`.
+    """
+    global _async_db
+    if _async_db is None:
+        pool = get_pool()
+        writer = get_writer()
+        with _pool_lock:
+            if _async_db is None:
+                _async_db = AsyncDatabase(
+                    pool,
+                    workers=settings.db_executor_workers,
+                    max_waiting=settings.db_max_waiting,
+                    writer=writer,
+                )
+    return _async_db
+
+
+async def get_async_db():
+    adb = get_async_database()
+    try:
+        db = await adb.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"type": type(e).__name__, "msg": str(e)},
+        )
+    try:
         yield db
+    finally:
+        await adb.release(db)
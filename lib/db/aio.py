@@ -0,0 +1,181 @@
+import asyncio
+import contextvars
+import functools
+import sqlite3
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .pool import ConnectionPool, PoolTimeout
+from . import transaction
+
+
+ACQUIRE_POLL_INTERVAL = 0.002  # seconds
+
+
+class AsyncConnection:
+    """
+    Async facade over a pooled sqlite3 connection
+
+    Every call runs on the database executor, so the event loop never blocks
+    on SQLite I/O. Calls on one AsyncConnection are awaited one at a time by
+    its route, so the underlying connection is never used concurrently.
+
+    Writes go through `write` / `execute_write`, which use the group-commit
+    writer when there is one (the connection itself is then read-only).
+
+    Parameters:
+        db (sqlite3.Connection): The checked-out connection.
+        executor (ThreadPoolExecutor): Executor that runs the blocking calls.
+        writer (GroupCommitWriter, optional): Writer that commits the writes.
+    """
+
+    def __init__(self, db: sqlite3.Connection, executor: ThreadPoolExecutor, writer=None):
+        self.db = db
+        self._executor = executor
+        self._writer = writer
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run `fn(connection, *args, **kwargs)` on the executor
+
+        Use this for helpers that issue several statements, so they cost a
+        single executor hop. The caller's context variables (the request's
+        query stats) are visible to `fn`.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, fn, self.db, *args, **kwargs)
+        )
+
+    async def write(self, fn, *args):
+        """
+        Run the write transaction(s) of `fn(connection, *args)` and return its result once committed
+
+        `fn` writes through `run_immediate`. Without a writer it runs on this
+        connection like `run`; with one it runs on the writer connection, in
+        a savepoint of the next group commit.
+        """
+        if self._writer is None:
+            return await self.run(fn, *args)
+        return await asyncio.wrap_future(self._writer.submit(fn, *args))
+
+    async def execute_write(self, sql: str, params=()):
+        """Execute one write statement in its own transaction and return its cursor (rowcount, lastrowid)."""
+        return await self.write(transaction.execute, sql, params)
+
+    async def execute(self, sql: str, params=()):
+        """Execute one statement and return its cursor (rowcount, lastrowid)."""
+        return await self.run(sqlite3.Connection.execute, sql, params)
+
+    async def fetchall(self, sql: str, params=()):
+        """Execute a query and fetch every row."""
+        return await self.run(lambda db: db.execute(sql, params).fetchall())
+
+    async def fetchone(self, sql: str, params=()):
+        """Execute a query and fetch the first row."""
+        return await self.run(lambda db: db.execute(sql, params).fetchone())
+
+    async def commit(self):
+        await self.run(sqlite3.Connection.commit)
+
+    async def rollback(self):
+        await self.run(sqlite3.Connection.rollback)
+
+
+class AsyncDatabase:
+    """
+    Hands out AsyncConnections from a ConnectionPool
+
+    A dedicated executor (`workers` threads) runs all SQLite calls, separate
+    from the threadpool FastAPI uses for sync routes. Requests waiting for a
+    connection wait on an asyncio semaphore instead of holding a thread, so
+    a worker can keep far more requests in flight than it has threads. At
+    most `max_waiting` requests may queue for a connection; beyond that
+    checkouts fail immediately.
+
+    Parameters:
+        pool (ConnectionPool): Pool the connections come from.
+        workers (int): Executor threads.
+        max_waiting (int): Requests allowed to wait for a connection.
+        writer (GroupCommitWriter, optional): Writer handed to every AsyncConnection.
+    """
+
+    def __init__(self, pool: ConnectionPool, workers: int = 16, max_waiting: int = 1024, writer=None):
+        self.pool = pool
+        self.writer = writer
+        self.max_waiting = max_waiting
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._slots = weakref.WeakKeyDictionary()
+        self._waiting = 0
+
+    def _semaphore(self):
+        # one per event loop, asyncio primitives cannot be shared between loops
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.pool.size)
+        return slots
+
+    async def acquire(self, timeout: float = None):
+        """
+        Check a connection out without blocking the event loop
+
+        Parameters:
+            timeout (float, optional): Seconds to wait. Defaults to the pool timeout.
+
+        Returns:
+            AsyncConnection: Wrapper around the checked-out connection.
+
+        Raises:
+            PoolTimeout: If too many requests are already waiting, or the wait times out.
+        """
+        timeout = self.pool.timeout if timeout is None else timeout
+        slots = self._semaphore()
+
+        if self._waiting >= self.max_waiting:
+            raise PoolTimeout(f"more than {self.max_waiting} requests waiting for a database connection")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"no database connection available after {timeout}s")
+        finally:
+            self._waiting -= 1
+
+        # Connections are also checked out by sync code (streams, background
+        # jobs), so one may still not be free. Poll instead of blocking an
+        # executor thread that the connection holders need to finish.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                db = await loop.run_in_executor(self.executor, self.pool.try_acquire)
+                if db is not None:
+                    return AsyncConnection(db, self.executor, self.writer)
+                if loop.time() >= deadline:
+                    raise PoolTimeout(f"no database connection available after {timeout}s")
+                await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+        except BaseException:
+            slots.release()
+            raise
+
+    async def release(self, conn: AsyncConnection):
+        """Return a connection to the pool (the reset runs on the executor)."""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.pool.release, conn.db)
+        finally:
+            self._semaphore().release()
+
+    def stats(self) -> dict:
+        return {
+            "executor_workers": self.executor._max_workers,
+            "waiting": self._waiting,
+            "max_waiting": self.max_waiting,
+        }
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,116 @@
+import functools
+import sqlite3
+import time
+
+from ..utils.metrics import lock_wait, query_stats, sqlite_busy, statement_latency
+
+
+LOCK_ERRORS = {sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED}
+
+
+@functools.lru_cache(maxsize=1024)
+def operation(sql: str) -> str:
+    """Leading keyword of a statement ("SELECT", "BEGIN IMMEDIATE", ...), used as a metric label."""
+    words = sql.split(None, 2)
+    if not words:
+        return "EMPTY"
+    keyword = words[0].upper()
+    if keyword == "BEGIN" and len(words) > 1 and words[1].upper() in ("IMMEDIATE", "EXCLUSIVE"):
+        return f"BEGIN {words[1].upper()}"
+    return keyword
+
+
+def _record(sql: str, seconds: float, rows: int):
+    op = operation(sql)
+    statement_latency.observe((op,), seconds)
+    if op in ("BEGIN IMMEDIATE", "BEGIN EXCLUSIVE"):
+        lock_wait.observe((), seconds)
+    stats = query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.rows += rows
+        stats.seconds += seconds
+
+
+def _record_error(sql: str, e: sqlite3.Error):
+    if getattr(e, "sqlite_errorcode", 0) & 0xFF in LOCK_ERRORS:
+        sqlite_busy.inc((operation(sql),))
+
+
+def _add_fetch(seconds: float, rows: int):
+    stats = query_stats.get()
+    if stats is not None:
+        stats.rows += rows
+        stats.seconds += seconds
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times statements and counts the rows they return or change
+
+    Execution time, statement count and DML row counts are recorded when
+    the statement runs; rows of a query are counted (and their stepping
+    time added) as they are fetched.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            _record_error(sql, e)
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+        _record(sql, seconds, max(self.rowcount, 0))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            _record_error(sql, e)
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+        _record(sql, seconds, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        _add_fetch(time.perf_counter() - started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _add_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        _add_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        stats = query_stats.get()
+        if stats is not None:
+            stats.rows += 1
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3.Connection whose cursors (including `execute` shortcuts) are InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
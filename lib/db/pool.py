@@ -0,0 +1,226 @@
+import contextlib
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+# Put on the idle queue in place of a discarded connection: whoever gets it
+# opens a new connection in the freed slot, so a blocked waiter is woken
+_VACANT = object()
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to `size`, configured once when they are
+    first checked out, and reset (rollback + row factory) when returned so the
+    next request always starts outside of a transaction.
+
+    Parameters:
+        database (str): Path to the SQLite database file.
+        size (int): Maximum number of open connections.
+        timeout (float): Seconds to wait for a free connection on checkout.
+        pragmas (dict): PRAGMA name/value pairs applied to every new connection.
+        factory (type, optional): sqlite3.Connection subclass to open connections with.
+        read_only (bool, optional): Open the connections with mode=ro; writes fail.
+    """
+
+    def __init__(self, database: str, size: int = 8, timeout: float = 5.0, pragmas: dict = None,
+                 factory: type = sqlite3.Connection, read_only: bool = False):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.factory = factory
+        self.read_only = read_only
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._vacant = 0
+        self._wait_seconds = 0.0
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            uri = pathlib.Path(self.database).resolve().as_uri() + "?mode=ro"
+            db = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=self.factory)
+        else:
+            db = sqlite3.connect(self.database, check_same_thread=False, factory=self.factory)
+        db.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            db.execute(f"PRAGMA {name}={value}")
+        return db
+
+    def try_acquire(self):
+        """
+        Check a connection out only if one is available right away.
+
+        Returns:
+            sqlite3.Connection | None: A configured connection, or None if the pool is exhausted.
+        """
+        return self._acquire(wait=False)
+
+    def acquire(self, timeout: float = None) -> sqlite3.Connection:
+        """
+        Check a connection out of the pool.
+
+        Parameters:
+            timeout (float, optional): Override of the pool checkout timeout.
+
+        Returns:
+            sqlite3.Connection: A configured connection, outside of any transaction.
+
+        Raises:
+            PoolTimeout: If every connection stays busy for the whole timeout.
+        """
+        return self._acquire(wait=True, timeout=timeout)
+
+    def _acquire(self, wait: bool, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+
+        with self._lock:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                db = None
+
+            if db is not None:
+                self._checkouts += 1
+                self._in_use += 1
+                if db is not _VACANT:
+                    return db
+                self._vacant -= 1
+                create = True
+            elif self._created < self.size:
+                # reserve the slot before connecting so we never exceed size
+                self._checkouts += 1
+                self._created += 1
+                self._in_use += 1
+                create = True
+            elif not wait:
+                return None
+            else:
+                self._checkouts += 1
+                self._waits += 1
+                create = False
+
+        if create:
+            return self._open()
+
+        started = time.perf_counter()
+        try:
+            db = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+                self._wait_seconds += time.perf_counter() - started
+            raise PoolTimeout(f"no database connection available after {timeout}s")
+
+        with self._lock:
+            self._in_use += 1
+            self._wait_seconds += time.perf_counter() - started
+            if db is _VACANT:
+                self._vacant -= 1
+        return self._open() if db is _VACANT else db
+
+    def _open(self) -> sqlite3.Connection:
+        # the slot is already counted in created and in_use
+        try:
+            return self._connect()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        # hands the slot of a connection that is gone to a waiter, if any
+        with self._lock:
+            self._in_use -= 1
+            if self._closed:
+                self._created -= 1
+                return
+            self._vacant += 1
+        self._idle.put(_VACANT)
+
+    def release(self, db: sqlite3.Connection):
+        """
+        Reset a connection and return it to the pool.
+
+        A connection that cannot be reset is closed and its slot handed to
+        the next checkout, which opens a new connection.
+        """
+        try:
+            if self._closed:
+                raise sqlite3.ProgrammingError("pool is closed")
+            if db.in_transaction:
+                db.rollback()
+            db.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            with self._lock:
+                self._discarded += 1
+            with contextlib.suppress(sqlite3.Error):
+                db.close()
+            self._free_slot()
+            return
+
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(db)
+
+    @contextlib.contextmanager
+    def connection(self, timeout: float = None):
+        """Context manager that checks a connection out and always returns it."""
+        db = self.acquire(timeout)
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the pool counters.
+
+        Returns:
+            dict: size, open/idle/in-use connections and checkout counters.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "read_only": self.read_only,
+                "open": self._created - self._vacant,
+                "idle": self._idle.qsize() - self._vacant,
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_seconds": round(self._wait_seconds, 6),
+            }
+
+    def close(self):
+        """Close every idle connection. Checked-out connections are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+                if db is _VACANT:
+                    self._vacant -= 1
+                    continue
+            with contextlib.suppress(sqlite3.Error):
+                db.close()
@@ -0,0 +1,93 @@
+import random
+import sqlite3
+import time
+
+from ..models import Settings
+
+
+settings = Settings()
+
+
+def is_lock_error(e: sqlite3.OperationalError):
+    """
+    Check if an OperationalError is SQLITE_BUSY/SQLITE_LOCKED
+
+    Parameters:
+        e (sqlite3.OperationalError): The error raised by sqlite3.
+
+    Returns:
+        bool: True if the operation can be retried once the lock is released.
+    """
+
+    msg = str(e)
+    return "locked" in msg or "busy" in msg
+
+
+def begin_immediate(db: sqlite3.Connection):
+    """
+    Start a BEGIN IMMEDIATE transaction, retrying while the write lock is held
+
+    Lock contention is retried with jittered exponential backoff, up to
+    `Settings.enroll_max_retries` times.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection, outside of a transaction.
+    """
+
+    delay = settings.enroll_retry_backoff
+    for attempt in range(settings.enroll_max_retries + 1):
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not is_lock_error(e) or attempt == settings.enroll_max_retries:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+
+
+def run_immediate(db: sqlite3.Connection, fn, *args):
+    """
+    Run `fn(db, *args)` inside a BEGIN IMMEDIATE transaction and commit it
+
+    Taking the write lock up front means the reads done by `fn` cannot be
+    invalidated by another writer before its inserts.
+
+    If `db` is already in a transaction (a group commit of the
+    GroupCommitWriter), `fn` runs in a SAVEPOINT instead and the owner of
+    the transaction commits.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        fn (callable): The unit of work. Must not commit itself.
+
+    Returns:
+        Whatever `fn` returns.
+    """
+
+    if db.in_transaction:
+        db.execute("SAVEPOINT run_immediate")
+        try:
+            result = fn(db, *args)
+        except BaseException:
+            # some errors end the whole transaction, and the savepoint with it
+            if db.in_transaction:
+                db.execute("ROLLBACK TO run_immediate")
+                db.execute("RELEASE run_immediate")
+            raise
+        db.execute("RELEASE run_immediate")
+        return result
+
+    begin_immediate(db)
+    try:
+        result = fn(db, *args)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return result
+
+
+def execute(db: sqlite3.Connection, sql: str, params=()):
+    """Run one write statement in its own transaction and return its cursor (rowcount, lastrowid)."""
+    return run_immediate(db, lambda db: db.execute(sql, params))
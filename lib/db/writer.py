@@ -0,0 +1,255 @@
+import contextvars
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from ..utils.metrics import group_commit_seconds, group_commit_size
+from .pool import ConnectionPool
+from .transaction import begin_immediate
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Unit:
+    __slots__ = ("fn", "args", "context", "future")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread that commits concurrent write transactions together
+
+    SQLite has one write lock per database, so concurrent writers only queue
+    on it, and each of them pays for its own commit. Here every write goes
+    through one connection: `submit` queues a unit of work, and the writer
+    thread takes the units queued within `window` seconds of the first one
+    (at most `max_batch`), runs each in its own SAVEPOINT inside a single
+    BEGIN IMMEDIATE transaction and commits them with one COMMIT.
+
+    A unit that raises is rolled back to its savepoint and its caller gets
+    the exception, the rest of the group still commits. Results are handed
+    out only after the COMMIT. If the group transaction itself fails (BEGIN,
+    COMMIT, or an error that aborts the whole transaction) every unit is run
+    again in a transaction of its own, so each caller gets the outcome of
+    its own work.
+
+    If the writer thread itself fails (its connection cannot be checked out
+    or opened, say), every unit still waiting gets that exception and the
+    next `submit` starts a new thread.
+
+    Units run with the submitter's context variables (the request's query
+    stats). They must not commit or roll back; write through `run_immediate`
+    and it becomes a nested savepoint.
+
+    Parameters:
+        pool (ConnectionPool): Pool the writer connection is checked out of, for good.
+        window (float): Seconds to wait for more units once one is queued.
+            0 only groups the units already waiting.
+        max_batch (int): Maximum units per group commit.
+    """
+
+    def __init__(self, pool: ConnectionPool, window: float = 0.002, max_batch: int = 64):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self._groups = 0
+        self._units = 0
+        self._failed = 0
+        self._regrouped = 0
+        self._largest = 0
+        self._restarts = 0
+        self._commit_seconds = 0.0
+
+    def submit(self, fn, *args) -> Future:
+        """
+        Queue `fn(connection, *args)` for the next group commit
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result of `fn` once it is
+            committed, or to its exception.
+        """
+        unit = _Unit(fn, args)
+        # queued under the lock, so a failing writer thread fails it or a new thread runs it
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+            self._queue.put(unit)
+        return unit.future
+
+    def _next_group(self):
+        unit = self._queue.get()
+        if unit is _STOP:
+            return None
+        group = [unit]
+        deadline = time.monotonic() + self.window
+        while len(group) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                unit = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if unit is _STOP:
+                # finish this group first
+                self._queue.put(_STOP)
+                break
+            group.append(unit)
+        return group
+
+    def _run(self):
+        group = []
+        try:
+            db = self.pool.acquire()
+            try:
+                while True:
+                    group = self._next_group()
+                    if group is None:
+                        break
+                    # callers that were cancelled while queued are skipped
+                    group = [unit for unit in group if unit.future.set_running_or_notify_cancel()]
+                    if group:
+                        self._process(db, group)
+            finally:
+                self.pool.release(db)
+        except BaseException as e:
+            logger.exception("group-commit writer thread failed")
+            self._fail_pending(group or [], e)
+            if not isinstance(e, Exception):
+                raise
+
+    def _fail_pending(self, group: list, error: BaseException):
+        # the thread is gone: nothing left in the queue would ever run
+        with self._lock:
+            self._thread = None
+            self._restarts += 1
+            pending = list(group)
+            while True:
+                try:
+                    unit = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if unit is not _STOP and unit.future.set_running_or_notify_cancel():
+                    pending.append(unit)
+        for unit in pending:
+            if not unit.future.done():
+                unit.future.set_exception(error)
+
+    def _run_unit(self, db: sqlite3.Connection, unit: _Unit):
+        db.execute("SAVEPOINT unit")
+        try:
+            value = unit.context.run(unit.fn, db, *unit.args)
+        except Exception as e:
+            if not db.in_transaction:
+                # the error ended the whole transaction, the units before this one are lost too
+                raise
+            db.execute("ROLLBACK TO unit")
+            db.execute("RELEASE unit")
+            return False, e
+        db.execute("RELEASE unit")
+        return True, value
+
+    def _commit(self, db: sqlite3.Connection, group: list):
+        started = time.perf_counter()
+        begin_immediate(db)
+        try:
+            outcomes = [self._run_unit(db, unit) for unit in group]
+            db.commit()
+        except BaseException:
+            if db.in_transaction:
+                db.rollback()
+            raise
+        seconds = time.perf_counter() - started
+        group_commit_size.observe((), len(group))
+        group_commit_seconds.observe((), seconds)
+        with self._lock:
+            self._groups += 1
+            self._units += len(group)
+            self._failed += sum(1 for ok, _ in outcomes if not ok)
+            self._largest = max(self._largest, len(group))
+            self._commit_seconds += seconds
+        return outcomes
+
+    def _process(self, db: sqlite3.Connection, group: list):
+        try:
+            outcomes = self._commit(db, group)
+        except Exception as e:
+            if len(group) > 1:
+                with self._lock:
+                    self._regrouped += 1
+                for unit in group:
+                    self._process(db, [unit])
+                return
+            with self._lock:
+                self._failed += 1
+            outcomes = [(False, e)]
+
+        for unit, (ok, value) in zip(group, outcomes):
+            if ok:
+                unit.future.set_result(value)
+            else:
+                unit.future.set_exception(value)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the writer counters.
+
+        Returns:
+            dict: queued units, group commits, units committed or failed,
+            groups re-run one unit at a time, writer threads that failed
+            (and were restarted on the next submit), and the largest group.
+        """
+        with self._lock:
+            return {
+                "window": self.window,
+                "max_batch": self.max_batch,
+                "queued": self._queue.qsize(),
+                "groups": self._groups,
+                "units": self._units,
+                "failed": self._failed,
+                "regrouped": self._regrouped,
+                "restarts": self._restarts,
+                "largest_group": self._largest,
+                "mean_group": round(self._units / self._groups, 3) if self._groups else 0.0,
+                "commit_seconds": round(self._commit_seconds, 6),
+            }
+
+    def close(self, timeout: float = None):
+        """
+        Commit what is queued, then stop the writer thread
+
+        Units submitted while closing are rejected; once closed, the next
+        `submit` starts a new thread.
+        """
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        try:
+            if thread is not None:
+                self._queue.put(_STOP)
+                thread.join(timeout)
+        finally:
+            with self._lock:
+                self._thread = None
+                self._closed = False
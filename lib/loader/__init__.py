@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import itertools
+import json
+import sqlite3
+import sys
+import time
+
+from lib.utils.seat_counters import repair_seat_counters
+
+
+# Loadable datasets in dependency order: (table, columns)
+DATASETS = {
+    "departments": ("departments", ("code", "name")),
+    "students": ("students", ("id", "first_name", "last_name", "email")),
+    "professors": ("professors", ("id", "first_name", "last_name", "email", "phone")),
+    "courses": ("course", ("department_code", "course_no", "title", "description")),
+    "sections": (
+        "course_section",
+        (
+            "id", "dept_code", "course_num", "section_no", "semester", "year",
+            "prof_id", "room_num", "room_capacity", "course_start_date",
+            "enrollment_start", "enrollment_end",
+        ),
+    ),
+    "enrollments": ("enrollments", ("section_id", "student_id", "enrollment_date")),
+    "waitlists": ("waitlist", ("section_id", "student_id", "waitlist_date")),
+    "droplists": ("droplist", ("section_id", "student_id", "drop_date", "administrative")),
+}
+
+# Applied for the duration of the load only; durability comes from the final commit
+LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "foreign_keys": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -262144,  # 256 MB
+}
+
+
+def open_source(path: str):
+    """
+    Open a CSV or NDJSON file (optionally gzipped) as a stream of dicts
+
+    Parameters:
+        path (str): File path ending in .csv, .ndjson or .jsonl, plus optional .gz.
+
+    Returns:
+        iterator[dict]: One dict per record, read lazily.
+    """
+
+    name = path[:-3] if path.endswith(".gz") else path
+    raw = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+    with contextlib.closing(text):
+        if name.endswith(".csv"):
+            yield from csv.DictReader(text)
+        elif name.endswith((".ndjson", ".jsonl")):
+            for line in text:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"unsupported file type: {path} (expected .csv, .ndjson or .jsonl)")
+
+
+def load_table(db: sqlite3.Connection, dataset: str, path: str, batch_size: int,
+               commit_every: int, on_conflict: str, progress=None):
+    """
+    Stream one file into its table
+
+    Records are read lazily and inserted with `executemany` in batches of
+    `batch_size`, committing every `commit_every` rows, so memory use does not
+    depend on the file size. Columns missing from the first record fall back
+    to the table defaults.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        dataset (str): Key of DATASETS.
+        path (str): Source file.
+        batch_size (int): Rows per executemany call.
+        commit_every (int): Rows per transaction.
+        on_conflict (str): abort, ignore or replace.
+        progress (callable, optional): Called with (dataset, rows, seconds) after each batch.
+
+    Returns:
+        int: The number of rows read from the file.
+    """
+
+    table, columns = DATASETS[dataset]
+    records = open_source(path)
+    first = next(records, None)
+    if first is None:
+        return 0
+    columns = [c for c in columns if c in first]
+
+    verb = "INSERT" if on_conflict == "abort" else f"INSERT OR {on_conflict.upper()}"
+    sql = f"{verb} INTO {table}({', '.join(columns)}) VALUES({', '.join('?' * len(columns))})"
+    rows = (
+        tuple(record.get(c) for c in columns)
+        for record in itertools.chain([first], records)
+    )
+
+    started = time.perf_counter()
+    loaded = 0
+    uncommitted = 0
+    db.execute("BEGIN")
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        db.executemany(sql, batch)
+        loaded += len(batch)
+        uncommitted += len(batch)
+        if uncommitted >= commit_every:
+            db.commit()
+            db.execute("BEGIN")
+            uncommitted = 0
+        if progress:
+            progress(dataset, loaded, time.perf_counter() - started)
+    db.commit()
+    return loaded
+
+
+def drop_derived_objects(db: sqlite3.Connection, tables: list[str]):
+    """
+    Drop the secondary indexes and triggers on `tables`
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        tables (list[str]): Table names.
+
+    Returns:
+        list[str]: CREATE statements to restore them with `restore_derived_objects`.
+    """
+
+    rows = db.execute(
+        f"""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+            AND tbl_name IN ({', '.join('?' * len(tables))})
+        """,
+        tables,
+    ).fetchall()
+    for type_, name, _ in rows:
+        db.execute(f'DROP {type_.upper()} "{name}"')
+    db.commit()
+    return [sql for _, _, sql in rows]
+
+
+def restore_derived_objects(db: sqlite3.Connection, statements: list[str]):
+    """Recreate indexes and triggers saved by `drop_derived_objects`."""
+    for sql in statements:
+        db.execute(sql)
+    db.commit()
+
+
+def print_progress(dataset: str, rows: int, seconds: float):
+    rate = rows / seconds if seconds else 0.0
+    print(f"\r{dataset}: {rows:,} rows ({rate:,.0f} rows/s)", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bulk load CSV/NDJSON files into an existing database (create the schema with bin/init.sh first)."
+    )
+    parser.add_argument("--database", help="SQLite database path (defaults to Settings.database)")
+    for dataset in DATASETS:
+        parser.add_argument(f"--{dataset}", metavar="FILE", help=f"{dataset} file (.csv, .ndjson, .jsonl, optionally .gz)")
+    parser.add_argument("--truncate", action="store_true", help="delete existing rows from the tables being loaded")
+    parser.add_argument("--on-conflict", choices=["abort", "ignore", "replace"], default="abort")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--commit-every", type=int, default=500000)
+    parser.add_argument("--check-foreign-keys", action="store_true", help="run PRAGMA foreign_key_check after loading")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    sources = [(d, getattr(args, d)) for d in DATASETS if getattr(args, d)]
+    if not sources:
+        parser.error("nothing to load")
+
+    database = args.database
+    if database is None:
+        from lib.models import Settings
+
+        database = Settings().database
+
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        for name, value in LOAD_PRAGMAS.items():
+            db.execute(f"PRAGMA {name}={value}")
+
+        tables = [DATASETS[d][0] for d, _ in sources]
+        if args.truncate:
+            for table in reversed(tables):
+                db.execute(f"DELETE FROM {table}")
+            db.commit()
+
+        started = time.perf_counter()
+        derived = drop_derived_objects(db, tables)
+        total = 0
+        try:
+            for dataset, path in sources:
+                table_started = time.perf_counter()
+                rows = load_table(
+                    db, dataset, path, args.batch_size, args.commit_every, args.on_conflict,
+                    progress=None if args.quiet else print_progress,
+                )
+                seconds = time.perf_counter() - table_started
+                total += rows
+                if not args.quiet:
+                    print(file=sys.stderr)
+                print(f"{dataset}: {rows:,} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+        except BaseException:
+            # drop the rows of the failed batch; earlier batches are committed
+            db.rollback()
+            if not args.quiet:
+                print(file=sys.stderr)
+            raise
+        finally:
+            # the indexes, triggers and counters come back even if a load failed
+            index_started = time.perf_counter()
+            restore_derived_objects(db, derived)
+            repair_seat_counters(db)
+            # the catalog triggers were dropped during the load, so bump the version by hand
+            db.execute(
+                """
+                UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP
+                WHERE name = 'catalog'
+                """
+            )
+            db.execute("ANALYZE")
+            db.commit()
+            print(f"indexes, triggers and seat counters rebuilt in {time.perf_counter() - index_started:.2f}s")
+
+        seconds = time.perf_counter() - started
+        print(f"total: {total:,} rows in {seconds:.2f}s ({total / seconds if seconds else 0:,.0f} rows/s)")
+
+        if args.check_foreign_keys:
+            violations = db.execute("PRAGMA foreign_key_check").fetchall()
+            print(f"{len(violations)} foreign key violation(s)")
+            if violations:
+                return 1
+    return 0
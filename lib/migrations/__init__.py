@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import sqlite3
+
+from lib.utils.seat_counters import REPAIR_QUERY
+
+
+# Every statement below is idempotent: a database created from the current
+# share/*.sql files already has these objects, and migrating it only stamps
+# the version.
+
+CATALOG_BUMP = "UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = '{}';"
+
+
+def column_names(db: sqlite3.Connection, table: str):
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+
+
+def add_seat_counters(db: sqlite3.Connection):
+    columns = column_names(db, "course_section")
+    for column in ("enrolled_count", "waitlist_count"):
+        if column not in columns:
+            db.execute(f"ALTER TABLE course_section ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    counters = {
+        "enrollments_count_insert": ("AFTER INSERT ON enrollments", "enrolled_count = enrolled_count + 1", "NEW"),
+        "enrollments_count_delete": ("AFTER DELETE ON enrollments", "enrolled_count = enrolled_count - 1", "OLD"),
+        "waitlist_count_insert": ("AFTER INSERT ON waitlist", "waitlist_count = waitlist_count + 1", "NEW"),
+        "waitlist_count_delete": ("AFTER DELETE ON waitlist", "waitlist_count = waitlist_count - 1", "OLD"),
+    }
+    for name, (event, change, row) in counters.items():
+        db.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {event} "
+            f"BEGIN UPDATE course_section SET {change} WHERE id = {row}.section_id; END"
+        )
+    db.execute(REPAIR_QUERY)
+
+
+def add_section_indexes(db: sqlite3.Connection):
+    db.execute("CREATE INDEX IF NOT EXISTS waitlist_section_date_idx ON waitlist(section_id, waitlist_date, student_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS waitlist_student_idx ON waitlist(student_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS course_section_prof_idx ON course_section(prof_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS course_section_term_idx ON course_section(year, semester)")
+
+
+def convert_configs(db: sqlite3.Connection):
+    columns = column_names(db, "configs")
+    if columns == {"key", "value"}:
+        return
+
+    legacy = None
+    if "automatic_enrollment" in columns:
+        row = db.execute("SELECT automatic_enrollment FROM configs").fetchone()
+        legacy = row[0] if row else None
+        db.execute("DROP TABLE configs")
+    db.execute("CREATE TABLE configs (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    # the old flag was written as 'TRUE' by share/configs.sql and as 1/0 by the API
+    enabled = legacy is None or str(legacy).strip().upper() in ("TRUE", "1")
+    db.execute(
+        "INSERT INTO configs (key, value) VALUES ('automatic_enrollment', ?)",
+        ["TRUE" if enabled else "FALSE"],
+    )
+
+
+def add_catalog_versions(db: sqlite3.Connection):
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            modified_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    db.execute("INSERT OR IGNORE INTO catalog_version (name) VALUES ('catalog'), ('seats'), ('configs')")
+
+    catalog_columns = (
+        "id, dept_code, course_num, section_no, semester, year, prof_id, room_num, "
+        "room_capacity, course_start_date, enrollment_start, enrollment_end"
+    )
+    triggers = {
+        "course_catalog_insert": ("AFTER INSERT ON course", "catalog"),
+        "course_catalog_update": ("AFTER UPDATE ON course", "catalog"),
+        "course_catalog_delete": ("AFTER DELETE ON course", "catalog"),
+        "course_section_catalog_insert": ("AFTER INSERT ON course_section", "catalog"),
+        "course_section_catalog_update": (f"AFTER UPDATE OF {catalog_columns} ON course_section", "catalog"),
+        "course_section_catalog_delete": ("AFTER DELETE ON course_section", "catalog"),
+        "course_section_seats_update": ("AFTER UPDATE OF enrolled_count, waitlist_count ON course_section", "seats"),
+        "configs_insert": ("AFTER INSERT ON configs", "configs"),
+        "configs_update": ("AFTER UPDATE ON configs", "configs"),
+        "configs_delete": ("AFTER DELETE ON configs", "configs"),
+    }
+    for name, (event, counter) in triggers.items():
+        db.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {CATALOG_BUMP.format(counter)} END")
+
+
+def add_student_indexes(db: sqlite3.Connection):
+    db.execute("CREATE INDEX IF NOT EXISTS enrollments_student_idx ON enrollments(student_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS droplist_student_idx ON droplist(student_id)")
+
+
+def add_term_archive(db: sqlite3.Connection):
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS term_archive (
+            semester TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            sections INTEGER NOT NULL,
+            archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (year, semester)
+        )
+        """
+    )
+
+
+def add_idempotency_keys(db: sqlite3.Connection):
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_key (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idempotency_key_expires_idx ON idempotency_key(expires_at)")
+
+
+def add_class_filter_indexes(db: sqlite3.Connection):
+    db.execute("CREATE INDEX IF NOT EXISTS course_section_semester_idx ON course_section(semester, year)")
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS course_section_open_idx ON course_section(id) "
+        "WHERE enrolled_count < room_capacity"
+    )
+
+
+def add_term_archive_professors(db: sqlite3.Connection):
+    from lib.archive import database_directory
+
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS term_archive_professor (
+            semester TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            prof_id INTEGER NOT NULL,
+            PRIMARY KEY (prof_id, year, semester)
+        )
+        """
+    )
+    # terms archived before this table existed; the archives are read on their
+    # own connections, ATTACH is not allowed inside the migration transaction
+    terms = db.execute(
+        """
+        SELECT semester, year, path FROM term_archive a
+        WHERE NOT EXISTS (SELECT 1 FROM term_archive_professor p WHERE p.year = a.year AND p.semester = a.semester)
+        """
+    ).fetchall()
+    for semester, year, path in terms:
+        uri = (database_directory(db) / path).resolve().as_uri() + "?mode=ro&immutable=1"
+        with contextlib.closing(sqlite3.connect(uri, uri=True)) as archive:
+            professors = archive.execute("SELECT DISTINCT prof_id FROM course_section").fetchall()
+        db.executemany(
+            "INSERT INTO term_archive_professor (semester, year, prof_id) VALUES (?, ?, ?)",
+            [(semester, year, prof_id) for prof_id, in professors],
+        )
+
+
+# (user_version, description, migration) in the order they are applied
+MIGRATIONS = [
+    (1, "per-section seat counters and their triggers", add_seat_counters),
+    (2, "waitlist order and course_section lookup indexes", add_section_indexes),
+    (3, "key/value configs table", convert_configs),
+    (4, "catalog, seats and configs change counters", add_catalog_versions),
+    (5, "per-student enrollment and droplist indexes", add_student_indexes),
+    (6, "registry of archived terms", add_term_archive),
+    (7, "stored responses of Idempotency-Key requests", add_idempotency_keys),
+    (8, "course_section indexes for the semester and open seats filters", add_class_filter_indexes),
+    (9, "professors of archived terms", add_term_archive_professors),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db: sqlite3.Connection) -> int:
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db: sqlite3.Connection, target: int = LATEST_VERSION):
+    """
+    Upgrade a database in place to `target`
+
+    Each pending migration runs in its own BEGIN IMMEDIATE transaction
+    together with the PRAGMA user_version bump, so an interrupted upgrade
+    resumes where it stopped.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection, outside of a transaction.
+        target (int, optional): Schema version to reach. Defaults to the latest.
+
+    Returns:
+        list[tuple[int, str]]: Version and description of each migration applied.
+    """
+
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version > target or version <= get_schema_version(db):
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            fn(db)
+            db.execute(f"PRAGMA user_version = {version}")
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upgrade the database schema in place.")
+    parser.add_argument("--database", help="SQLite database path (defaults to Settings.database)")
+    parser.add_argument("--status", action="store_true", help="print the schema version and pending migrations only")
+    args = parser.parse_args(argv)
+
+    database = args.database
+    if database is None:
+        from lib.models import Settings
+
+        database = Settings().database
+
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        current = get_schema_version(db)
+        pending = [(v, d) for v, d, _ in MIGRATIONS if v > current]
+        if args.status:
+            print(f"schema version {current} (latest {LATEST_VERSION})")
+            for version, description in pending:
+                print(f"pending {version}: {description}")
+            return 1 if pending else 0
+
+        for version, description in migrate(db):
+            print(f"applied {version}: {description}")
+        print(f"schema version {get_schema_version(db)}")
+    return 0
@@ -0,0 +1,234 @@
+import argparse
+import contextlib
+import functools
+import os
+import re
+import sqlite3
+import sys
+
+
+KEYSET = "AND (cs.id, t.student_id) > (:section_id, :student_id)"
+
+# The filters GET /classes/ is sent with, and representative parameters
+CLASS_FILTER_VARIANTS = {
+    "all": ([], {}),
+    "department": (["department"], {"department": "CPSC"}),
+    "term": (["semester", "year"], {"semester": "FA", "year": 2023}),
+    "semester": (["semester"], {"semester": "FA"}),
+    "open seats": (["open_seats"], {}),
+}
+
+
+def classes_queries():
+    """
+    The GET /classes/ statement for every filter of CLASS_FILTER_VARIANTS, on
+    the first page (no cursor) and on a later one
+
+    Returns:
+        dict: `hot_queries` entries.
+    """
+
+    from lib.utils.catalog import CLASS_FILTERS, CLASSES_KEYSET, CLASSES_QUERY
+
+    queries = {}
+    for name, (filters, params) in CLASS_FILTER_VARIANTS.items():
+        conditions = [CLASS_FILTERS[f] for f in filters]
+        for page, keyset in (("first page", []), ("next page", [CLASSES_KEYSET])):
+            where = " AND ".join(conditions + keyset)
+            sql = CLASSES_QUERY.format(schema="main", where=("WHERE " + where) if where else "")
+            # unfiltered, the first page walks the table in primary key order up to :limit rows
+            allowed = set() if where else {"cs"}
+            queries[f"classes: {name}, {page}"] = (sql, {**params, "after": 0, "limit": 50}, allowed)
+    return queries
+
+
+@functools.cache
+def hot_queries():
+    """
+    The statements the routes and the promotion job run, with representative
+    parameters
+
+    Built on first use: the modules the statements come from read Settings
+    when they are imported.
+
+    Returns:
+        dict: name -> (sql, parameters, tables allowed to be scanned in full).
+            Add a table to the allowed set only if the statement really has
+            to read all of it.
+    """
+
+    from lib.archive import ARCHIVED_TERMS_QUERY, PROFESSOR_TERMS_QUERY
+    from lib.utils.catalog import SECTION_QUERY
+    from lib.utils.enrollment_engine import (
+        CATALOG_VERSION, ENROLL_INSERT, ROOM_CAPACITY, SECTION_STATE_QUERY, WAITLIST_INSERT,
+    )
+    from lib.utils import export
+    from lib.utils.enrollment_helper import (
+        DROP_ENROLLMENT_QUERY, DROP_WAITLIST_QUERY, RECORD_DROP_QUERY, SECTION_WAITLIST_QUERY, WAITLIST_POSITION_QUERY,
+    )
+    from lib.utils.idempotency import LOAD_QUERY as IDEMPOTENCY_LOAD_QUERY, PURGE_QUERY as IDEMPOTENCY_PURGE_QUERY
+    from lib.utils.professor_helper import (
+        PROFESSOR_QUERY, PROFESSOR_ROWS_QUERY, SECTION_COUNTS_QUERY, SECTION_ENROLLED_QUERY,
+    )
+    from lib.utils import seat_feed
+    from lib.utils.student_helper import SCHEDULE_QUERY
+    from lib.utils.waitlist_promotion import OPEN_WINDOW, PROMOTION_QUERY, SECTIONS_FILTER
+
+    return {
+        "enroll: section state": (SECTION_STATE_QUERY.format(capacity=ROOM_CAPACITY), {"student_id": 1, "section_id": 1}, set()),
+        "enroll: cached section state": (
+            SECTION_STATE_QUERY.format(capacity=CATALOG_VERSION), {"student_id": 1, "section_id": 1}, set()
+        ),
+        "enroll: insert": (ENROLL_INSERT, {"student_id": 1, "section_id": 1}, set()),
+        "enroll: waitlist insert": (WAITLIST_INSERT, {"student_id": 1, "section_id": 1}, set()),
+        "catalog: section": (SECTION_QUERY, [1], set()),
+        "configs: version": ("SELECT version FROM catalog_version WHERE name = 'configs'", [], set()),
+        **classes_queries(),
+        "professor: exists": (PROFESSOR_QUERY, [1], set()),
+        "professor: enrollments": (
+            PROFESSOR_ROWS_QUERY.format(schema="main", table="enrollments", keyset=KEYSET),
+            {"prof_id": 1, "section_id": 0, "student_id": 0, "limit": 50},
+            set(),
+        ),
+        "professor: droplist": (
+            PROFESSOR_ROWS_QUERY.format(schema="main", table="droplist", keyset=KEYSET),
+            {"prof_id": 1, "section_id": 0, "student_id": 0, "limit": 50},
+            set(),
+        ),
+        "professor: enrolled counts": (SECTION_ENROLLED_QUERY.format(schema="main"), {"prof_id": 1}, set()),
+        "professor: droplist counts": (
+            SECTION_COUNTS_QUERY.format(schema="main", table="droplist"), {"prof_id": 1}, set()
+        ),
+        "drop: enrollment": (DROP_ENROLLMENT_QUERY, [1, 1], set()),
+        "drop: waitlist": (DROP_WAITLIST_QUERY, [1, 1], set()),
+        "drop: record": (RECORD_DROP_QUERY, [1, 1, False], set()),
+        "student: schedule": (SCHEDULE_QUERY, {"student_id": 1, "drops": 10}, set()),
+        "waitlist: position": (WAITLIST_POSITION_QUERY + "WHERE me.section_id = ? AND me.student_id = ?", [1, 1], set()),
+        "waitlist: positions": (WAITLIST_POSITION_QUERY + "WHERE me.student_id = ? ORDER BY me.section_id", [1], set()),
+        "waitlist: section": (SECTION_WAITLIST_QUERY, [1], set()),
+        "promotion: sections": (
+            PROMOTION_QUERY.format(section_filter=SECTIONS_FILTER),
+            {"section_ids": "[1]"},
+            set(),
+        ),
+        "promotion: full pass": (
+            PROMOTION_QUERY.format(section_filter=OPEN_WINDOW),
+            {},
+            {"w"},
+        ),
+        "idempotency: load": (IDEMPOTENCY_LOAD_QUERY, ["key"], set()),
+        "idempotency: purge": (IDEMPOTENCY_PURGE_QUERY, [0.0], set()),
+        "seat feed: sections": (
+            seat_feed.SEAT_COUNTS_QUERY.format(where=seat_feed.SECTIONS_FILTER),
+            {"section_ids": "[1]"},
+            set(),
+        ),
+        "archive: terms": (ARCHIVED_TERMS_QUERY, [], {"term_archive"}),
+        "archive: professor terms": (PROFESSOR_TERMS_QUERY, [1], set()),
+        "seat feed: full read": (seat_feed.SEAT_COUNTS_QUERY.format(where=""), {}, {"cs"}),
+        "export: term": (
+            export.EXPORT_QUERY.format(
+                schema="main",
+                table="droplist",
+                where=export.TERM_FILTER.format(schema="main", term="semester = :semester AND year = :year"),
+            ) + "LIMIT :limit",
+            {"semester": "FA", "year": 2023, "limit": -1},
+            set(),
+        ),
+        "export: sections": (
+            export.EXPORT_QUERY.format(schema="main", table="enrollments", where=export.SECTIONS_FILTER + " " + export.KEYSET)
+            + "LIMIT :limit",
+            {"section_ids": "[1]", "section_id": 1, "student_id": 0, "limit": -1},
+            set(),
+        ),
+        # a full dump reads the whole table, in primary key order
+        "export: all": (export.EXPORT_QUERY.format(schema="main", table="waitlist", where=""), {}, {"t"}),
+    }
+
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+SCANNED_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+PARTIAL_INDEXES_QUERY = "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'"
+
+
+def full_scans(db: sqlite3.Connection, sql: str, params):
+    """
+    List the tables a statement reads in full
+
+    Parameters:
+        db (sqlite3.Connection): Database connection with the full schema.
+        sql (str): The statement.
+        params (dict | list): Its parameters.
+
+    Returns:
+        list[str]: The table (or alias) of every full table scan in the plan.
+    """
+
+    partial = {row[0] for row in db.execute(PARTIAL_INDEXES_QUERY)}
+    scans = []
+    for row in db.execute("EXPLAIN QUERY PLAN " + sql, params):
+        match = FULL_SCAN.match(row[3])
+        # walking a whole index is a full scan too, unless the index is partial
+        # (it holds only the rows the query asks for); virtual tables (json_each) are not tables
+        if not match or "VIRTUAL TABLE" in match.group(2):
+            continue
+        index = SCANNED_INDEX.search(match.group(2))
+        if index is None or index.group(1) not in partial:
+            scans.append(match.group(1))
+    return scans
+
+
+def check_query_plans(db: sqlite3.Connection, queries: dict = None):
+    """
+    Find hot queries whose plan regressed to a full table scan
+
+    Parameters:
+        db (sqlite3.Connection): Database connection with the full schema.
+        queries (dict, optional): Registry to check. Defaults to `hot_queries()`.
+
+    Returns:
+        list[tuple[str, list[str]]]: Query name and offending tables, for each regression.
+    """
+
+    regressions = []
+    for name, (sql, params, allowed) in (queries or hot_queries()).items():
+        scans = [table for table in full_scans(db, sql, params) if table not in allowed]
+        if scans:
+            regressions.append((name, scans))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fail if a hot route query's EXPLAIN QUERY PLAN contains a full table scan."
+    )
+    parser.add_argument("--database", help="SQLite database path (defaults to Settings.database)")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args(argv)
+
+    database = args.database
+    if database is None:
+        from lib.models import Settings
+
+        database = Settings().database
+    else:
+        # the modules the statements come from need a database setting to be imported
+        os.environ.setdefault("DATABASE", database)
+
+    queries = hot_queries()
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        if args.verbose:
+            for name, (sql, params, _) in queries.items():
+                print(name)
+                for row in db.execute("EXPLAIN QUERY PLAN " + sql, params):
+                    print(f"    {row[3]}")
+
+        regressions = check_query_plans(db, queries)
+        for name, tables in regressions:
+            print(f"{name}: full scan of {', '.join(tables)}")
+        print(f"{len(queries)} queries checked, {len(regressions)} regression(s)")
+        return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
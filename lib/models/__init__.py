@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional, Union
 from pydantic import BaseModel, EmailStr
 from pydantic_settings import BaseSettings
 
@@ -9,6 +9,79 @@ class Settings(BaseSettings, env_file="../.env", extra="ignore"):
     database: str
     # logging_config: str
 
+    # connection pool
+    db_pool_size: int = 8
+    db_pool_timeout: float = 5.0
+
+    # async data-access layer
+    db_executor_workers: int = 16  # threads running SQLite calls for async routes
+    db_max_waiting: int = 1024  # requests allowed to queue for a connection
+
+    # pragmas applied once to every pooled connection
+    db_journal_mode: str = "WAL"
+    db_synchronous: str = "NORMAL"
+    db_cache_size: int = -16000  # negative = KiB, so ~16 MB per connection
+    db_mmap_size: int = 268435456
+    db_busy_timeout: int = 5000  # milliseconds
+
+    # enrollment limits (defaults; rows in the configs table override them)
+    waitlist_capacity: int = 15
+    max_student_waitlists: int = 3
+
+    # configs table cache
+    config_check_interval: float = 0.25  # seconds between shared version checks
+
+    # write coordination: "direct" (each request writes and commits on its
+    # pooled connection) or "group" (writes go through one writer thread that
+    # commits concurrent transactions together; the pool is read-only)
+    db_write_mode: Literal["direct", "group"] = "direct"
+    db_group_commit_window: float = 0.002  # seconds the writer waits for more transactions
+    db_group_commit_max_batch: int = 64  # transactions per group commit
+
+    # retry/backoff when the write lock is contended
+    enroll_max_retries: int = 5
+    enroll_retry_backoff: float = 0.005  # seconds, doubled on each retry
+
+    # admission control for the enrollment and drop routes (429 + Retry-After)
+    admission_max_in_flight: int = 32  # write requests running at once, 0 = unlimited
+    admission_max_queued: int = 256  # write requests waiting for a slot
+    admission_queue_timeout: float = 2.0  # seconds a request may wait for a slot
+    admission_student_rate: float = 2.0  # writes per second per student, 0 = unlimited
+    admission_student_burst: int = 10  # writes a student can make at once
+    admission_retry_after: float = 1.0  # seconds, spread up to 2x, suggested to requests shed for load
+    admission_max_students: int = 100000  # per-student token buckets kept in memory
+
+    # Idempotency-Key on POST /enrollments/ and the drop routes
+    idempotency_ttl: float = 86400.0  # seconds a first response is replayed
+    idempotency_max_keys: int = 100000  # responses kept in memory per process
+    idempotency_persist: bool = True  # also store them in SQLite, for the other worker processes
+
+    # POST /enrollments/batch
+    enroll_batch_max_items: int = 50000
+    enroll_batch_chunk_size: int = 500  # rows decided and written per transaction
+
+    # background waitlist promotion
+    auto_enroll_interval: float = 1.0  # seconds between promotion runs
+    auto_enroll_batch_size: int = 1000  # sections per promotion transaction
+
+    # GET /exports/{table}
+    export_max_concurrent: int = 2  # exports streamed at once per process, each holds a pooled connection
+
+    # prepare connections, statements and caches before a worker serves requests
+    startup_warmup: bool = True
+
+    # per-route / per-query instrumentation and GET /metrics
+    metrics_enabled: bool = True
+
+    # GET /sections/stream (server-sent seat changes)
+    seat_feed_resync_interval: float = 2.0  # seconds between checks for other processes' writes, 0 = off
+    seat_feed_heartbeat: float = 15.0  # seconds between keep-alive comments on idle streams
+    seat_feed_max_subscribers: int = 10000
+
+    # in-process section catalog cache
+    catalog_cache_size: int = 4096
+    catalog_cache_check_interval: float = 0.25  # seconds between shared version checks
+
 
 class Professor(BaseModel):
     id: int
@@ -58,3 +131,14 @@ class SectionCreate(BaseModel):
 class Enrollment(BaseModel):
     student_id: int
     section_id: int
+
+
+class EnrollmentResult(BaseModel):
+    student_id: int
+    section_id: int
+    status: str  # enrolled, waitlisted or rejected
+    reason: Optional[str] = None
+
+
+class ConfigUpdate(BaseModel):
+    value: Union[bool, int, str]
@@ -1,18 +1,50 @@
-from fastapi import APIRouter, Depends, Response, HTTPException, status
-
-from lib.utils.enrollment_helper import enroll_students_from_waitlist, is_auto_enroll_enabled, get_opening_sections
-from lib.models import Course, SectionCreate, SectionPatch, Student, Enrollment, Professor
-from lib.db import get_db
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Response, HTTPException, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from lib.archive import ArchiveError, attach_archives, matching_archives, union_terms
+from lib.utils import enrollment_engine, enrollment_helper, professor_helper, student_helper
+from lib.utils.catalog import CLASS_FILTERS, CLASSES_KEYSET, CLASSES_QUERY, catalog_cache, get_catalog_versions, http_date, is_not_modified, validators as catalog_validators
+from lib.utils.admission import admission, admit_enrollment, admit_student, admit_student_write, admit_write
+from lib.utils.auto_enrollment import scheduler
+from lib.utils.seat_feed import seat_feed
+from lib.utils.config_store import CONFIG_KEYS, config_store
+from lib.utils.export import ENCODERS, EXPORT_FORMATS, EXPORT_TABLES, ExportResponse, export_rows, export_slots
+from lib.utils.idempotency import IdempotencyMiddleware, idempotency_store
+from lib.utils.json_response import Rows, RowsJSONResponse, iter_ndjson
+from lib.models import ConfigUpdate, Course, SectionCreate, SectionPatch, Student, Enrollment, Professor
+from lib.utils.metrics import MetricsMiddleware, registry as metrics_registry
+from lib.db import get_async_database, get_async_db, get_pool, get_writer
+from lib.db.aio import AsyncConnection
+import json
 import sqlite3
-from datetime import datetime
 
 
 router = APIRouter()
 
+REJECTION_STATUS = {
+    "section_not_found": status.HTTP_404_NOT_FOUND,
+    "student_not_found": status.HTTP_404_NOT_FOUND,
+    "already_enrolled": status.HTTP_400_BAD_REQUEST,
+    "already_waitlisted": status.HTTP_400_BAD_REQUEST,
+    "class_full": status.HTTP_400_BAD_REQUEST,
+    "waitlist_limit": status.HTTP_400_BAD_REQUEST,
+}
+
+REJECTION_DETAIL = {
+    "section_not_found": "no sections found",
+    "student_not_found": "Student not found",
+    "already_enrolled": "Student already enrolled in this section",
+    "already_waitlisted": "Student already waitlisted for this section",
+    "class_full": "Class capacity and waitlist is full, cannot enroll currently",
+    "waitlist_limit": "Student has reached the maximum number of waitlists",
+}
+
 
 @router.post("/courses/", status_code=status.HTTP_201_CREATED)
-def create_course(
-    course: Course, response: Response, db: sqlite3.Connection = Depends(get_db)
+async def create_course(
+    course: Course, response: Response, db: AsyncConnection = Depends(get_async_db)
 ):
     """
     Create course
@@ -34,14 +66,13 @@ def create_course(
     """
     record = dict(course)
     try:
-        cur = db.execute(
+        cur = await db.execute_write(
             """
             INSERT INTO course(department_code, course_no, title, description)
             VALUES(:department_code, :course_no, :title, :description)
             """,
             record,
         )
-        db.commit()
     except sqlite3.IntegrityError as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -51,8 +82,8 @@ def create_course(
 
 
 @router.post("/sections/", status_code=status.HTTP_201_CREATED)
-def create_section(
-    section: SectionCreate, response: Response, db: sqlite3.Connection = Depends(get_db)
+async def create_section(
+    section: SectionCreate, response: Response, db: AsyncConnection = Depends(get_async_db)
 ):
     """
     Create Section
@@ -82,7 +113,7 @@ def create_section(
     """
     record = dict(section)
     try:
-        cur = db.execute(
+        cur = await db.execute_write(
             """
             INSERT INTO course_section(id, dept_code, course_num, section_no, 
                     semester, year, prof_id, room_num, room_capacity, 
@@ -93,20 +124,21 @@ def create_section(
             """,
             record,
         )
-        db.commit()
     except sqlite3.IntegrityError as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={"type": type(e).__name__, "msg": str(e)},
         )
     record["id"] = cur.lastrowid
+    catalog_cache.invalidate_section(record["id"])
+    seat_feed.notify([record["id"]])
     response.headers["Location"] = f"/sections/{record['id']}"
     return record
 
 
 @router.delete("/sections/{id}", status_code=status.HTTP_200_OK)
-def delete_section(
-    id: int, response: Response, db: sqlite3.Connection = Depends(get_db)
+async def delete_section(
+    id: int, response: Response, db: AsyncConnection = Depends(get_async_db)
 ):
     """
     Delete section
@@ -125,28 +157,28 @@ def delete_section(
     - HTTPException (409): If there is a conflict in the delete operation.
     """
     try:
-        curr = db.execute("DELETE FROM course_section WHERE id=?;", [id])
+        curr = await db.execute_write("DELETE FROM course_section WHERE id=?;", [id])
 
         if curr.rowcount == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Record not Found"
             )
-        db.commit()
     except sqlite3.IntegrityError as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={"type": type(e).__name__, "msg": str(e)},
         )
+    catalog_cache.invalidate_section(id)
 
     return {"message": "Item deleted successfully"}
 
 
 @router.patch("/sections/{id}", status_code=status.HTTP_200_OK)
-def update_section(
+async def update_section(
     id: int,
     section: SectionPatch,
     response: Response,
-    db: sqlite3.Connection = Depends(get_db),
+    db: AsyncConnection = Depends(get_async_db),
 ):
     """
     Patch Section
@@ -188,39 +220,162 @@ def update_section(
         update_query = f"UPDATE course_section SET {keys} WHERE id = ?"
 
         # Execute the query
-        curr = db.execute(update_query, values)
+        curr = await db.execute_write(update_query, values)
 
         # Raise exeption if Record not Found
         if curr.rowcount == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Record not Found"
             )
-        db.commit()
     except sqlite3.Error as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={"type": type(e).__name__, "msg": str(e)},
         )
+    catalog_cache.invalidate_section(id)
+    if "room_capacity" in section_fields:
+        scheduler.notify(id)
+        seat_feed.notify([id])
     return {"message": "Section updated successfully"}
 
 
-@router.get("/classes/")
-def list_classes(db: sqlite3.Connection = Depends(get_db)):
+@router.get("/classes/", response_class=RowsJSONResponse)
+async def list_classes(
+    response: Response,
+    department: Optional[str] = None,
+    semester: Optional[str] = None,
+    year: Optional[int] = None,
+    open_seats: bool = False,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncConnection = Depends(get_async_db),
+):
     """
     List all available classes to the student
 
+    Parameters:
+    - `department` (str, optional): Only sections of this department code.
+    - `semester` (str, optional): Only sections in this semester (SP, SU, FA, WI).
+    - `year` (int, optional): Only sections in this academic year.
+    - `open_seats` (bool, optional): Only sections with seats left.
+    - `limit` (int, optional): Page size. All matching classes when omitted.
+    - `after` (int, optional): `next_cursor` of the previous page.
+
+    Responses carry an ETag and Last-Modified derived from the catalog
+    version; a matching If-None-Match / If-Modified-Since gets a 304 without
+    running the query.
+
     Returns:
     - dict: A dictionary containing the details of the classes
     """
 
-    classes = db.execute(
-        "SELECT c.*, cs.id as section_id FROM course c inner join course_section cs  on c.department_code = cs.dept_code and c.course_no = cs.course_num"
+    # open seats depend on enrollments too, everything else only on the catalog
+    versions = await db.run(get_catalog_versions)
+    etag, last_modified = catalog_validators(
+        versions, ["catalog", "seats"] if open_seats else ["catalog"]
+    )
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": "no-cache",
+    }
+    if is_not_modified(if_none_match, if_modified_since, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    filters = []
+    params = {}
+    if department is not None:
+        filters.append(CLASS_FILTERS["department"])
+        params["department"] = department
+    if semester is not None:
+        filters.append(CLASS_FILTERS["semester"])
+        params["semester"] = semester
+    if year is not None:
+        filters.append(CLASS_FILTERS["year"])
+        params["year"] = year
+    if open_seats:
+        filters.append(CLASS_FILTERS["open_seats"])
+    if after is not None:
+        filters.append(CLASSES_KEYSET)
+        params["after"] = after
+    params["limit"] = limit or -1
+    where = ("WHERE " + " AND ".join(filters)) if filters else ""
+
+    # closed terms are listed only when asked for by semester or year
+    archives = []
+    if semester is not None or year is not None:
+        try:
+            archives = await db.run(attach_archives, semester, year)
+        except ArchiveError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    sql = union_terms(CLASSES_QUERY.format(where=where, schema="{schema}"), archives, "ORDER BY section_id LIMIT :limit")
+
+    classes = await db.run(Rows.fetch, sql, params)
+
+    next_cursor = None
+    if limit and len(classes) == limit:
+        next_cursor = classes.last()["section_id"]
+
+    return RowsJSONResponse({"classes": classes, "next_cursor": next_cursor}, headers=headers)
+
+
+@router.get("/sections/stream")
+async def stream_sections(sections: Optional[list[int]] = Query(None)):
+    """
+    Seat changes as server-sent events
+
+    The stream starts with a `snapshot` event holding the current counters of
+    the watched sections, then sends a `seats` event for each section whose
+    enrolled/waitlist counts or capacity change. Updates that arrive faster
+    than the client reads are coalesced to the latest counters per section.
+    Every open stream is served from one in-process change feed, so waiting
+    streams cost no database queries.
+
+    Parameters:
+    - `sections` (list[int], optional): Only these sections (repeat the
+      parameter for several). All sections when omitted.
+
+    Returns:
+    - text/event-stream: `data` is a JSON object with `section_id`,
+      `enrolled_count`, `waitlist_count`, `room_capacity` and `open_seats`
+      (a list of them for the snapshot).
+
+    Raises:
+    - HTTPException (503): If this process already serves the maximum number of streams.
+    """
+    if seat_feed.is_full():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many open seat streams"
+        )
+
+    # subscribed only once the body is sent: a response that is never
+    # iterated (the client went away first) runs no finally to unsubscribe
+    async def events():
+        subscription, snapshot = await seat_feed.subscribe(sections)
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            while True:
+                updates = await subscription.next(seat_feed.heartbeat)
+                if not updates:
+                    yield ": keepalive\n\n"
+                for event in updates:
+                    yield f"event: seats\ndata: {json.dumps(event)}\n\n"
+        finally:
+            seat_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return {"classes": classes.fetchall()}
 
 
 @router.post("/enrollments/")
-def enroll_students(enrollment: Enrollment, db: sqlite3.Connection = Depends(get_db)):
+async def enroll_students(
+    enrollment: Enrollment, _=Depends(admit_enrollment), db: AsyncConnection = Depends(get_async_db)
+):
     """
     Lets a student enroll into the class
 
@@ -229,186 +384,391 @@ def enroll_students(enrollment: Enrollment, db: sqlite3.Connection = Depends(get
     - student successfully waitlisted into the class
 
     Raises:
-    - HTTPException (400): If student tries to enroll outside the enrollment window).
-    - HTTPException (400): If student has already enrolled into the class.
-    - HTTPException (400): Class and waitlist capacity is full, cannot enroll
+    - HTTPException (404): If the section or the student does not exist.
+    - HTTPException (400): If student has already enrolled into (or is waitlisted for) the class.
+    - HTTPException (400): Class and waitlist capacity is full, or the student is on too many waitlists
+    - HTTPException (429): If the student or the server is over its write limits (see Retry-After).
 
     """
-    response = ""
-    max_enrollment_capacity = 30
-    waitlist_capacity = 15
-
-    course_dates = db.execute(
-        "SELECT course_start_date, strftime('%Y-%m-%d',enrollment_start) as enrollment_start, strftime('%Y-%m-%d',enrollment_end) as enrollment_end FROM course_section where id = ?;",
-        [enrollment.section_id],
-    ).fetchone()
-
-    if course_dates == None:
+    # unknown sections are rejected from the cache, without taking the write
+    # lock; known ones give the engine their capacity
+    section, catalog_version = await db.run(catalog_cache.get_section, enrollment.section_id)
+    if section is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="no sections found"
+            status_code=REJECTION_STATUS["section_not_found"],
+            detail=REJECTION_DETAIL["section_not_found"],
         )
 
-    # course_start_date = datetime.strptime(course_dates['course_start_date'],'%Y-%m-%d')
-    enrollment_start_date = datetime.strptime(
-        course_dates["enrollment_start"], "%Y-%m-%d"
-    )
-    enrollment_end_date = datetime.strptime(course_dates["enrollment_end"], "%Y-%m-%d")
-
-    ## enrollments not allowed pre and post enrollment dates as defined in the db
-    # current_date = datetime.strptime(datetime.today().strftime("%Y-%m-%d"), "%Y-%m-%d")
-    ## if current_date > course_start_date+timedelta(days=7) or current_date<enrollment_start_date:
-    # if current_date > enrollment_end_date:
-    #   # or current_date < enrollment_start_date
-    #  raise HTTPException(
-    #     status_code=400,
-    #    detail="You are trying to enrolside the enrollment window",
-    #)
-
-    seats_taken = db.execute(
-        "SELECT COUNT(*) FROM enrollments where section_id = ?;",
-        [enrollment.section_id],
-    ).fetchone()
-    available_seats = max_enrollment_capacity - seats_taken[0]
-
-    if available_seats > 0:
-        # enrollment possible
-        # check if student is already enrolled into section id > then return UNIQUE constraint key violation error
-        already_enrolled = db.execute(
-            "Select count(*) cnt from enrollments where section_id=? and student_id=?",
-            (enrollment.section_id, enrollment.student_id),
-        ).fetchone()
-        if already_enrolled["cnt"] > 0:
-            raise HTTPException(
-                status_code=400, detail="Student already enrolled in this section"
-            )
-
-        db.execute(
-            "INSERT INTO enrollments(section_id,student_id,enrollment_date) VALUES(?, ?, datetime('now'))",
-            (enrollment.section_id, enrollment.student_id),
+    try:
+        result = await db.write(
+            enrollment_engine.enroll, enrollment.student_id, enrollment.section_id,
+            section["room_capacity"], catalog_version,
+        )
+    except sqlite3.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"type": type(e).__name__, "msg": str(e)},
         )
 
-        db.commit()
-        response = f"Student {enrollment.student_id} enrolled successfully for section_id {enrollment.section_id}"
+    if result.status != enrollment_engine.REJECTED:
+        seat_feed.notify([enrollment.section_id])
 
-    elif available_seats == 0:
-        # check waitlist capacity
-        current_waitlist_capacity = db.execute(
-            "SELECT COUNT(*) AS cnt FROM waitlist where section_id = ? group by section_id",
-            (enrollment.section_id,),
-        ).fetchone()
-
-        print(current_waitlist_capacity[0])
-
-        current_student_waitlist = db.execute(
-            "SELECT COUNT(*) AS cnt FROM waitlist where section_id = ? and student_id = ?",
-            (enrollment.section_id, enrollment.student_id),
-        ).fetchone()
-
-        print(current_student_waitlist)
-
-        current_waitlist_capacity = current_waitlist_capacity["cnt"]
-        current_student_waitlist = current_student_waitlist["cnt"]
-
-        if (
-            current_waitlist_capacity < waitlist_capacity
-            and current_student_waitlist < 3
-        ):
-            # push student in waitlist table
-            db.execute(
-                "INSERT INTO waitlist(section_id,student_id,waitlist_date) VALUES(?, ?, datetime('now'))",
-                (enrollment.section_id, enrollment.student_id),
-            )
-            db.commit()
-            response = f"Student {enrollment.student_id} waitlisted successfully for {enrollment.section_id}"
+    if result.status == enrollment_engine.ENROLLED:
+        response = f"Student {enrollment.student_id} enrolled successfully for section_id {enrollment.section_id}"
+    elif result.status == enrollment_engine.WAITLISTED:
+        response = f"Student {enrollment.student_id} waitlisted successfully for {enrollment.section_id}"
     else:
-        # enrollment not possible
         raise HTTPException(
-            status_code=400,
-            detail="Class capacity and waitlist is full, cannot enroll currently",
+            status_code=REJECTION_STATUS[result.reason],
+            detail=REJECTION_DETAIL[result.reason],
         )
 
     return {"enrollments": response}
 
 
-@router.post("/freezeenrollment/{flag}")
-def freeze_auto_enrollment(flag, db: sqlite3.Connection = Depends(get_db)):
-    # toggle the flag
-    flag = 0 if flag == 1 else 1
+@router.post("/enrollments/batch")
+async def enroll_students_batch(
+    enrollments: list[Enrollment], _=Depends(admit_write), db: AsyncConnection = Depends(get_async_db)
+):
+    """
+    Enroll many students in one call
+
+    Items are applied in order with the same rules as `POST /enrollments/`,
+    in chunked transactions.
+
+    Returns:
+    - dict: A per-item result (`enrolled`, `waitlisted`, or `rejected` with a
+      `reason`) in request order, and the number of items per status.
+
+    Raises:
+    - HTTPException (400): If the batch is larger than the configured maximum.
+    """
+    if len(enrollments) > enrollment_engine.settings.enroll_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch exceeds {enrollment_engine.settings.enroll_batch_max_items} items",
+        )
+
+    try:
+        results = await db.write(enrollment_engine.enroll_batch, enrollments)
+    except sqlite3.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"type": type(e).__name__, "msg": str(e)},
+        )
+
+    summary = {
+        enrollment_engine.ENROLLED: 0,
+        enrollment_engine.WAITLISTED: 0,
+        enrollment_engine.REJECTED: 0,
+    }
+    for result in results:
+        summary[result.status] += 1
+
+    seat_feed.notify({r.section_id for r in results if r.status != enrollment_engine.REJECTED})
+
+    return {"summary": summary, "results": results}
 
-    db.execute("UPDATE configs set automatic_enrollment = ?;", [flag])
-    db.commit()
 
-    if flag == 1:
-      opening_sections = get_opening_sections(db)
-      enroll_students_from_waitlist(db, opening_sections)
+@router.post("/freezeenrollment/{flag}")
+async def freeze_auto_enrollment(flag: bool, db: AsyncConnection = Depends(get_async_db)):
+    # freezing (1) disables automatic enrollment, unfreezing (0) enables it
+    enabled = await db.write(config_store.store, "automatic_enrollment", not flag)
+    config_store.invalidate()
+
+    if enabled:
+      # every open section, promoted in the background
+      scheduler.notify_all()
 
     return {"status_code ": 200}
 
-# Getting specific professors by using their id, then finding the courses they 
-# teach to then find their current enrollments.
 
-@router.get("/professors/{id}/enrollments")
-def get_professor_enrollments(
-    id: int, response: Response, db: sqlite3.Connection = Depends(get_db)):
-    cur = db.execute("SELECT * FROM PROFESSORS WHERE id = ? LIMIT 1", (id, ))
-    professor = cur.fetchall()
+@router.get("/configs")
+async def list_configs(db: AsyncConnection = Depends(get_async_db)):
+    """
+    Current configuration
 
-    if not professor:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Professor not found"
-        )
-    
-    cur = db.execute("SELECT * FROM COURSE_SECTION WHERE prof_id = ?", (id,))
-    course_sections = cur.fetchall()
+    Returns:
+    - dict: Every config key with its typed value (defaults included).
+    """
+    return dict(await db.run(config_store.all))
 
-    course_sections_li = []
 
-    for course in course_sections:
-        course_sections_li.append(course)
+@router.put("/configs/{key}")
+async def update_config(key: str, config: ConfigUpdate, db: AsyncConnection = Depends(get_async_db)):
+    """
+    Change one config value
+
+    Parameters:
+    - key (str): automatic_enrollment, waitlist_capacity or max_student_waitlists.
+    - config (ConfigUpdate): The new value.
+
+    Returns:
+    - dict: The key and its stored value.
+
+    Raises:
+    - HTTPException (404): If the key is unknown.
+    - HTTPException (422): If the value is invalid for the key.
+    """
+    if key not in CONFIG_KEYS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Config key not found")
+    try:
+        value = await db.write(config_store.store, key, config.value)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    config_store.invalidate()
+
+    if key == "automatic_enrollment" and value:
+        scheduler.notify_all()
+    return {key: value}
+
+
+@metrics_registry.collector
+def component_metrics():
+    pool = get_pool().stats()
+    adb = get_async_database().stats()
+    cache = catalog_cache.stats()
+    configs = config_store.stats()
+    auto_enroll = scheduler.status()
+
+    yield "http_requests_in_progress", "gauge", "Requests being served.", [({}, MetricsMiddleware.in_progress)]
+    yield "db_pool_connections", "gauge", "Pooled SQLite connections by state.", [
+        ({"state": state}, pool[state]) for state in ("open", "idle", "in_use")
+    ]
+    yield "db_pool_waiting_requests", "gauge", "Requests waiting for a connection.", [({}, adb["waiting"])]
+    for key in ("checkouts", "waits", "timeouts", "discarded"):
+        yield f"db_pool_{key}_total", "counter", f"Connection pool {key}.", [({}, pool[key])]
+    yield "db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", [({}, pool["wait_seconds"])]
+    yield "catalog_cache_entries", "gauge", "Cached section rows.", [({}, cache["entries"])]
+    for key in ("hits", "misses", "evictions", "invalidations"):
+        yield f"catalog_cache_{key}_total", "counter", f"Catalog cache {key}.", [({}, cache[key])]
+    yield "config_store_loads_total", "counter", "Reloads of the configs table.", [({}, configs["loads"])]
+    yield "auto_enroll_queue_depth", "gauge", "Sections waiting for promotion.", [({}, auto_enroll["queue_depth"])]
+    yield "auto_enroll_lag_seconds", "gauge", "Age of the oldest pending promotion.", [({}, auto_enroll["lag_seconds"])]
+    yield "auto_enroll_promoted_total", "counter", "Students promoted from waitlists.", [({}, auto_enroll["promoted"])]
+
+    admitted = admission.stats()
+    yield "admission_in_flight", "gauge", "Enrollment write requests running.", [({}, admitted["in_flight"])]
+    yield "admission_waiting", "gauge", "Enrollment write requests waiting for a slot.", [({}, admitted["waiting"])]
+    yield "admission_admitted_total", "counter", "Enrollment write requests admitted.", [({}, admitted["admitted"])]
+    yield "admission_queued_total", "counter", "Enrollment write requests that waited for a slot.", [({}, admitted["queued"])]
+    yield "admission_shed_total", "counter", "Enrollment write requests answered 429, by reason.", [
+        ({"reason": reason}, count) for reason, count in admitted["shed"].items()
+    ]
+
+    keys = idempotency_store.stats()
+    yield "idempotency_keys", "gauge", "Idempotency-Key responses kept in memory.", [({}, keys["entries"])]
+    yield "idempotency_replays_total", "counter", "Requests answered from a stored response.", [
+        ({}, IdempotencyMiddleware.replays)
+    ]
+    yield "idempotency_shared_hits_total", "counter", "Stored responses found in SQLite.", [({}, keys["shared_hits"])]
+    yield "idempotency_rejected_total", "counter", "Idempotency-Key requests refused, by reason.", [
+        ({"reason": "in_progress"}, IdempotencyMiddleware.conflicts),
+        ({"reason": "mismatch"}, IdempotencyMiddleware.mismatches),
+        ({"reason": "unavailable"}, IdempotencyMiddleware.unavailable),
+    ]
+
+    exports = export_slots.stats()
+    yield "exports_in_progress", "gauge", "Table exports being streamed.", [({}, exports["active"])]
+    yield "exports_started_total", "counter", "Table exports started.", [({}, exports["started"])]
+    yield "exports_rejected_total", "counter", "Table exports answered 503.", [({}, exports["rejected"])]
+    feed = seat_feed.stats()
+    yield "seat_feed_subscribers", "gauge", "Open seat change streams.", [({}, feed["subscribers"])]
+    for key in ("events", "refreshes", "full_reads"):
+        yield f"seat_feed_{key}_total", "counter", f"Seat feed {key}.", [({}, feed[key])]
+
+    writer = get_writer()
+    if writer is not None:
+        stats = writer.stats()
+        yield "db_writer_queue_depth", "gauge", "Write transactions waiting for the writer.", [({}, stats["queued"])]
+        for key in ("groups", "units", "failed", "regrouped", "restarts"):
+            yield f"db_writer_{key}_total", "counter", f"Group-commit writer {key}.", [({}, stats[key])]
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics
 
-    
-    enrollment_li = []
-    for course in course_sections_li:
-        cur = db.execute("SELECT * FROM ENROLLMENTS WHERE section_id = ?", (course['id'],))
-        enrollments = cur.fetchall()
-        
-        enrollment_li.extend(enrollments)
+    Returns:
+    - str: Request, SQL and lock metrics plus pool, cache and scheduler
+      state, in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
-    return {"professor": professor, "enrollments": enrollment_li}
 
+@router.get("/autoenrollment/status")
+async def get_auto_enrollment_status():
+    """
+    Background waitlist promotion status
 
-# This api is similar to enrollment api made above. Get the professor id, then go to 
-# courses the are teaching to get the course.id, to find the students who dropped 
-# the class.
+    Returns:
+    - dict: pending sections (queue depth), age of the oldest pending event
+      (lag), and details of the last promotion run.
+    """
+    return scheduler.status()
 
-@router.get("/professors/{id}/droplists")
-def get_professor_droplists(
-    id: int, response: Response, db: sqlite3.Connection = Depends(get_db)):
-    cur = db.execute("SELECT * FROM PROFESSORS WHERE id = ? LIMIT 1", (id,))
+def list_professor_rows(
+    db: sqlite3.Connection,
+    id: int,
+    table: str,
+    after: Optional[str],
+    limit: Optional[int],
+    aggregate: bool,
+    stream: bool,
+):
+    cur = db.execute(professor_helper.PROFESSOR_QUERY, (id, ))
     professor = cur.fetchall()
 
     if not professor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Professor not found"
         )
-    
-    cur = db.execute("SELECT * FROM COURSE_SECTION WHERE prof_id = ?", (id,))
-    course_sections = cur.fetchall()
 
-    course_sections_li = []
+    # too much history for one query is refused before a stream starts
+    try:
+        matching_archives(db, prof_id=id)
+    except ArchiveError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if aggregate:
+        return RowsJSONResponse(
+            {"professor": professor, "sections": professor_helper.professor_section_counts(db, id, table)}
+        )
+
+    if stream:
+        # validate the cursor before the response starts
+        if after:
+            professor_helper.parse_cursor(after)
+
+        # the request connection is function-scoped (see the routes below): it
+        # goes back to the pool before the body is sent, so the stream checks out its own
+        def rows():
+            with get_pool().connection() as conn:
+                yield from iter_ndjson(
+                    professor_helper.professor_rows(conn, id, table, after, limit)
+                )
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    rows = Rows.from_cursor(professor_helper.professor_rows(db, id, table, after, limit))
+    next_cursor = None
+    if limit and len(rows) == limit:
+        next_cursor = professor_helper.make_cursor(rows.last())
+
+    return RowsJSONResponse({"professor": professor, table: rows, "next_cursor": next_cursor})
+
+
+# Getting specific professors by using their id, then finding the enrollments in
+# the sections they teach with a single join.
+#
+# Optional query parameters:
+# - `limit` / `after`: keyset pagination, pass back `next_cursor` as `after`
+# - `aggregate`: per-section counts instead of rows
+# - `stream`: newline-delimited JSON rows, fetched incrementally
+
+@router.get("/professors/{id}/enrollments", response_class=RowsJSONResponse)
+async def get_professor_enrollments(
+    id: int,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    aggregate: bool = False,
+    stream: bool = False,
+    db: AsyncConnection = Depends(get_async_db, scope="function")):
+    return await db.run(list_professor_rows, id, "enrollments", after, limit, aggregate, stream)
+
+
+# This api is similar to enrollment api made above. Get the professor id, then join
+# the courses they are teaching to find the students who dropped the class.
+
+@router.get("/professors/{id}/droplists", response_class=RowsJSONResponse)
+async def get_professor_droplists(
+    id: int,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    aggregate: bool = False,
+    stream: bool = False,
+    db: AsyncConnection = Depends(get_async_db, scope="function")):
+    return await db.run(list_professor_rows, id, "droplist", after, limit, aggregate, stream)
+
+
+@router.get("/exports/{table}")
+async def export_table(
+    table: str,
+    format: str = "ndjson",
+    semester: Optional[str] = None,
+    year: Optional[int] = None,
+    sections: Optional[list[int]] = Query(None),
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncConnection = Depends(get_async_db, scope="function"),
+):
+    """
+    Bulk export of enrollments, waitlists or droplists
+
+    Streams every row of the table in (section_id, student_id) order,
+    `fetchmany` batch by batch, so memory use does not grow with the export.
+    The rows come from one database snapshot taken when the export starts;
+    writes made meanwhile are not included and are not blocked. An
+    interrupted export is resumed by passing the section_id and student_id
+    of the last row received as `after` (the resumed part reads a newer
+    snapshot).
 
-    for course in course_sections:
-        course_sections_li.append(course)
+    Parameters:
+    - `table` (str): "enrollments", "waitlists" or "droplists".
+    - `format` (str, optional): "ndjson" (default, one JSON object per line)
+      or "csv" (with a header line).
+    - `semester` / `year` (optional): Only sections of this term, archived terms included.
+    - `sections` (list[int], optional): Only these sections (repeat the parameter for several).
+    - `after` (str, optional): "<section_id>:<student_id>" of the last row already received.
+    - `limit` (int, optional): Rows to export. All rows when omitted.
+
+    Returns:
+    - application/x-ndjson or text/csv: The rows, with the table's columns.
+
+    Raises:
+    - HTTPException (404): If the table cannot be exported.
+    - HTTPException (400): If the format or the cursor is invalid, or more
+      archived terms match than one query can read.
+    - HTTPException (503): If this process already streams the maximum number of exports.
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No export for this table")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}"
+        )
+    # validate the cursor before the response starts
+    if after:
+        professor_helper.parse_cursor(after)
+    if semester is not None or year is not None:
+        try:
+            await db.run(matching_archives, semester, year)
+        except ArchiveError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not export_slots.try_acquire():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many exports in progress, retry later",
+            headers={"Retry-After": "10"},
+        )
 
-    
-    droplist_li = []
-    for course in course_sections_li:
-        cur = db.execute("SELECT * FROM DROPLIST WHERE section_id = ?", (course['id'],))
-        droplist = cur.fetchall()
-        
-        droplist_li.extend(droplist)
+    # runs in the threadpool for the whole download, on its own connection
+    def rows():
+        with get_pool().connection() as conn:
+            yield from ENCODERS[format](export_rows(conn, table, semester, year, sections, after, limit))
 
-    return {"professor": professor, "droplist": droplist_li}
+    try:
+        return ExportResponse(
+            rows(),
+            media_type=EXPORT_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+        )
+    except BaseException:
+        export_slots.release()
+        raise
 
 
 # Now, we must drop the student/s adminsitratively, the professor provide their id
@@ -416,12 +776,12 @@ def get_professor_droplists(
 # Inspired by Viditi's code
 
 @router.delete("/professors/{prof_id}/course_section/{section_id}/student/{student_id}/drop")
-def drop_student(
-    prof_id: int, section_id: int, student_id: int, response: Response, db: sqlite3.Connection = Depends(get_db)
+async def drop_student(
+    prof_id: int, section_id: int, student_id: int, response: Response,
+    _=Depends(admit_student_write), db: AsyncConnection = Depends(get_async_db)
     ):
 
-    cur = db.execute("SELECT * FROM PROFESSORS WHERE id = ?", [prof_id])
-    professor = cur.fetchall()
+    professor = await db.fetchall(professor_helper.PROFESSOR_QUERY, [prof_id])
 
     if professor:
         administrative = True
@@ -431,24 +791,18 @@ def drop_student(
         )
 
     try:
-        cur = db.execute("DELETE FROM ENROLLMENTS WHERE student_id=? AND section_id=?", [student_id, section_id])
-        db.commit()
-        cur = db.execute("DELETE FROM WAITLIST WHERE student_id=? AND section_id=?", [student_id, section_id])
-        db.commit()       
-        cur = db.execute("INSERT INTO droplist(section_id, student_id, drop_date, administrative) VALUES(?, ?, datetime('now'), ?)", [section_id, student_id, administrative])
-        db.commit()
-
-        auto_enroll_enabled = is_auto_enroll_enabled(db)
+        seat_freed = await db.write(enrollment_helper.drop_enrollment, section_id, student_id, administrative)
+        seat_feed.notify([section_id])
 
-        if auto_enroll_enabled:        
-            enrollment_count = enroll_students_from_waitlist(db, [section_id])
+        # the waitlist is promoted in the background, not in this request
+        if seat_freed:
+            scheduler.notify(section_id)
 
         return {"message": "Student dropped and inserted to droplist."}
 
     except sqlite3.IntegrityError as e:
-        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_40, detail={"type": type(e).__name__, "msg": str(e)}
+            status_code=status.HTTP_409_CONFLICT, detail={"type": type(e).__name__, "msg": str(e)}
         )
 
 #drop a class
@@ -456,61 +810,84 @@ def drop_student(
 #facing issue with autoenrollment
 
 @router.delete("/enrollments/course_section/{section_id}/student/{student_id}")
-def drop_self(prof_id: int , section_id: int, student_id: int, response: Response, db: sqlite3.Connection = Depends(get_db)):
+async def drop_self(prof_id: int , section_id: int, student_id: int, response: Response,
+                    _=Depends(admit_student_write), db: AsyncConnection = Depends(get_async_db)):
 
     try:
-        cur = db.execute("DELETE FROM ENROLLMENTS WHERE student_id=? AND section_id=?", [student_id, section_id])
-        db.commit()
-        cur = db.execute("DELETE FROM WAITLIST WHERE student_id=? AND section_id=?", [student_id, section_id])
-        db.commit()       
-        cur = db.execute("INSERT INTO droplist(section_id, student_id, drop_date) VALUES(?, ?, datetime('now'))", [section_id, student_id])
-        db.commit()
-
-        
-        # cur = db.execute("DELETE FROM waitlist LIMIT 1" )
-        # db.commit()
+        seat_freed = await db.write(enrollment_helper.drop_enrollment, section_id, student_id)
+        seat_feed.notify([section_id])
+
+        if seat_freed:
+            scheduler.notify(section_id)
     except sqlite3.IntegrityError as e:
-        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_40, detail={"type": type(e).__name__, "msg": str(e)}
+            status_code=status.HTTP_409_CONFLICT, detail={"type": type(e).__name__, "msg": str(e)}
         )
 
 
 # get waitlist position for a student
 
 @router.get("/student/waitlist/{section_id}/{student_id}")
-def get_waitlist_position(
-        section_id: int, student_id: int , db: sqlite3.Connection = Depends(get_db)
+async def get_waitlist_position(
+        section_id: int, student_id: int , db: AsyncConnection = Depends(get_async_db)
 ):
-    position = -1
-
     try:
-        waitlist = db.execute(
-            "SELECT student_id as sid FROM waitlist WHERE section_id = ? ORDER BY waitlist_date ASC",
-            [section_id]
+        position = await db.run(enrollment_helper.get_waitlist_position, section_id, student_id)
+    except sqlite3.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"type": type(e).__name__, "msg": str(e)},
         )
 
-        for idx, item in enumerate(waitlist.fetchall()):
-            print(idx, item["sid"])
-            if student_id == item["sid"]:
-                position = idx + 1
+    return {"position": position}
 
-    except sqlite3.IntegrityError as e:
+# get waitlist positions for a student across all sections they are waitlisted for
+
+@router.get("/student/{student_id}/waitlist")
+async def get_waitlist_positions(student_id: int, db: AsyncConnection = Depends(get_async_db)):
+    try:
+        positions = await db.run(enrollment_helper.get_waitlist_positions, student_id)
+    except sqlite3.Error as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={"type": type(e).__name__, "msg": str(e)},
         )
 
-    return {"position": position}
+    return {"positions": positions}
+
+# a student's schedule page: enrolled and waitlisted sections with course details,
+# waitlist positions and recent drops, in a constant number of queries
+
+@router.get("/students/{student_id}/schedule")
+async def get_student_schedule(
+    student_id: int,
+    drops: int = Query(10, ge=0, le=100),
+    db: AsyncConnection = Depends(get_async_db),
+):
+    """
+    Student schedule
+
+    Parameters:
+    - `student_id` (int): The student ID.
+    - `drops` (int, optional): Number of most recent drops to include (default 10).
+
+    Returns:
+    - dict: `student`, `enrolled` and `waitlisted` sections (with `position`),
+      and `dropped` sections, newest first.
+
+    Raises:
+    - HTTPException (404): If the student does not exist.
+    """
+    return await db.run(student_helper.get_student_schedule, student_id, drops)
 
 # drop self from waitlist
 
 @router.delete("/student/waitlist/{section_id}")
-def delete_waitlist(
-    section_id: int, student: Student, db: sqlite3.Connection = Depends(get_db)
+async def delete_waitlist(
+    section_id: int, student: Student, _=Depends(admit_student), db: AsyncConnection = Depends(get_async_db)
 ):
     try:
-        result = db.execute(
+        result = await db.execute_write(
             "DELETE FROM waitlist WHERE section_id = ? AND student_id = ?;",
             [section_id, student.id],
         )
@@ -521,35 +898,24 @@ def delete_waitlist(
                 detail="Could not delete because no such enrollments exist",
             )
 
-        db.commit()
-
     except sqlite3.IntegrityError as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail={"type": type(e).__name__, "msg": str(e)},
         )
 
+    seat_feed.notify([section_id])
     return {"message": "successfully removed from waitlist"}
 
 # list students in waitlist for a section/class
 
-@router.get("/professor/waitlist/{section_id}")
-def get_waitlist(section_id: int, db: sqlite3.Connection = Depends(get_db)):
-    watilist = []
-
+@router.get("/professor/waitlist/{section_id}", response_class=RowsJSONResponse)
+async def get_waitlist(section_id: int, db: AsyncConnection = Depends(get_async_db)):
+    # an empty waitlist is an empty list, as it always was (the 404 of the
+    # sync route tested a SELECT's rowcount, which is always -1)
     try:
-        results = db.execute(
-            "SELECT * FROM waitlist WHERE section_id = ? ORDER BY waitlist_date ASC",
-            [section_id]
-        )
-
-        if results.rowcount == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="could not find the waitlist for that section",
-            )
-
-        waitlist = [r["student_id"] for r in results]
+        results = await db.run(Rows.fetch, enrollment_helper.SECTION_WAITLIST_QUERY, [section_id])
+        waitlist = [row[0] for row in results.rows]
 
     except sqlite3.IntegrityError as e:
         raise HTTPException(
@@ -557,4 +923,10 @@ def get_waitlist(section_id: int, db: sqlite3.Connection = Depends(get_db)):
             detail={"type": type(e).__name__, "msg": str(e)},
         )
 
-    return {"waitlist": waitlist}
+    return RowsJSONResponse({"waitlist": waitlist})
+
+
+# Routes that replay their first response for a repeated Idempotency-Key, see IdempotencyMiddleware
+IDEMPOTENT_ROUTES = [
+    route for route in router.routes if route.endpoint in (enroll_students, drop_student, drop_self)
+]
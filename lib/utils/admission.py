@@ -0,0 +1,210 @@
+import asyncio
+import collections
+import contextlib
+import math
+import random
+import time
+
+from fastapi import HTTPException, status
+
+from lib.models import Enrollment, Settings, Student
+
+
+settings = Settings()
+
+SHED_REASONS = ("student_rate", "overloaded", "queue_timeout")
+
+
+class Shed(Exception):
+    """
+    Raised when a request is not admitted
+
+    Attributes:
+        reason (str): One of SHED_REASONS.
+        retry_after (float): Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admission control for the enrollment write routes
+
+    Every write to SQLite queues on the single write lock, so letting a
+    retry storm through only makes every request slower. A request is
+    admitted if its student has a token left (each student gets `burst`
+    writes at once, refilled at `student_rate` per second) and one of the
+    `max_in_flight` write slots is free. Otherwise it waits for a slot, in
+    arrival order, for at most `queue_timeout` seconds and only while fewer
+    than `max_queued` requests wait. Requests that are not admitted get a
+    Shed with the time to wait before retrying; none of this touches the
+    database.
+
+    Runs on the event loop, it is not thread-safe.
+
+    Parameters:
+        max_in_flight (int): Write requests running at once; 0 disables the budget.
+        max_queued (int): Write requests allowed to wait for a slot.
+        queue_timeout (float): Seconds a request may wait for a slot.
+        student_rate (float): Writes per second refilled per student; 0 disables the buckets.
+        student_burst (int): Writes a student can make at once.
+        retry_after (float): Base wait suggested to requests shed for load,
+            spread by up to as much again so they do not all come back together.
+        max_students (int): Token buckets kept, least recently used are dropped (back to full).
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_queued: int = 256, queue_timeout: float = 2.0,
+                 student_rate: float = 2.0, student_burst: int = 10, retry_after: float = 1.0,
+                 max_students: int = 100000):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.student_rate = student_rate
+        self.student_burst = student_burst
+        self.retry_after = retry_after
+        self.max_students = max_students
+
+        self._in_flight = 0
+        self._waiters = collections.deque()
+        self._buckets = collections.OrderedDict()  # student_id -> (tokens, monotonic time)
+
+        self._admitted = 0
+        self._queued = 0
+        self._shed = dict.fromkeys(SHED_REASONS, 0)
+
+    def _take_token(self, student_id: int):
+        if not self.student_rate or student_id is None:
+            return
+        now = time.monotonic()
+        tokens, stamp = self._buckets.pop(student_id, (self.student_burst, now))
+        tokens = min(self.student_burst, tokens + (now - stamp) * self.student_rate)
+        allowed = tokens >= 1
+        self._buckets[student_id] = (tokens - 1 if allowed else tokens, now)
+        if len(self._buckets) > self.max_students:
+            self._buckets.popitem(last=False)
+        if not allowed:
+            raise Shed("student_rate", (1 - tokens) / self.student_rate)
+
+    def _overloaded(self, reason: str):
+        return Shed(reason, self.retry_after * (1 + random.random()))
+
+    async def _acquire_slot(self):
+        if not self.max_in_flight or (self._in_flight < self.max_in_flight and not self._waiters):
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queued:
+            raise self._overloaded("overloaded")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # handed a slot just as the wait ran out
+                return
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            raise self._overloaded("queue_timeout")
+        except BaseException:
+            if waiter.done():
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+    def _release_slot(self):
+        # hand the slot straight to the oldest waiter, so in_flight stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def admit(self, student_id: int = None):
+        """
+        Take a write slot (and a token of `student_id`)
+
+        Release it with `release()` once the request is done.
+
+        Raises:
+            Shed: If the request is not admitted.
+        """
+        try:
+            self._take_token(student_id)
+            await self._acquire_slot()
+        except Shed as e:
+            self._shed[e.reason] += 1
+            raise
+        self._admitted += 1
+
+    def release(self):
+        self._release_slot()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "students": len(self._buckets),
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "shed": dict(self._shed),
+        }
+
+
+admission = AdmissionController(
+    max_in_flight=settings.admission_max_in_flight,
+    max_queued=settings.admission_max_queued,
+    queue_timeout=settings.admission_queue_timeout,
+    student_rate=settings.admission_student_rate,
+    student_burst=settings.admission_student_burst,
+    retry_after=settings.admission_retry_after,
+    max_students=settings.admission_max_students,
+)
+
+
+@contextlib.asynccontextmanager
+async def admitted(student_id: int = None):
+    """Hold a write slot for the duration of the block, or raise HTTPException (429) with a Retry-After."""
+    try:
+        await admission.admit(student_id)
+    except Shed as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many enrollment requests ({e.reason}), retry later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+# Route dependencies. Declare them before the database dependency so a shed
+# request is answered before it waits for a connection.
+
+async def admit_write():
+    async with admitted():
+        yield
+
+
+async def admit_student_write(student_id: int):
+    async with admitted(student_id):
+        yield
+
+
+async def admit_enrollment(enrollment: Enrollment):
+    async with admitted(enrollment.student_id):
+        yield
+
+
+async def admit_student(student: Student):
+    async with admitted(student.id):
+        yield
@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+
+from lib.db import get_async_database
+from lib.models import Settings
+from lib.utils.enrollment_helper import is_auto_enroll_enabled
+from lib.utils.seat_feed import seat_feed
+from lib.utils.waitlist_promotion import promote_waitlists
+
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+
+class AutoEnrollmentScheduler:
+    """
+    Background waitlist promotion, off the request path
+
+    Write routes report "seat freed" events with `notify(section_id)` (drops,
+    capacity changes) or `notify_all()` (unfreezing auto-enrollment). Events
+    are coalesced per section, and every `interval` seconds the pending
+    sections are promoted in batches of up to `batch_size` with the
+    set-based promotion engine, while auto-enrollment is enabled.
+
+    Parameters:
+        interval (float): Seconds between runs.
+        batch_size (int): Maximum sections promoted per transaction.
+    """
+
+    def __init__(self, interval: float = 1.0, batch_size: int = 1000):
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._pending = {}  # section_id -> monotonic time of its first pending event
+        self._full_pass_since = None
+        self._task = None
+
+        self._runs = 0
+        self._promoted = 0
+        self._events = 0
+        self._last_run_at = None
+        self._last_run_seconds = None
+        self._last_promoted = 0
+        self._last_lag = None
+        self._last_error = None
+
+    def notify(self, section_id: int):
+        """Record that a seat may have opened in `section_id` (thread-safe)."""
+        with self._lock:
+            self._events += 1
+            self._pending.setdefault(section_id, time.monotonic())
+
+    def notify_all(self):
+        """Request a promotion pass over every open section (thread-safe)."""
+        with self._lock:
+            self._events += 1
+            if self._full_pass_since is None:
+                self._full_pass_since = time.monotonic()
+
+    def _take(self):
+        with self._lock:
+            if self._full_pass_since is not None:
+                since = self._full_pass_since
+                self._full_pass_since = None
+                # a full pass covers everything that was pending
+                self._pending.clear()
+                return None, since
+            if not self._pending:
+                return [], None
+            section_ids = sorted(self._pending, key=self._pending.get)[: self.batch_size]
+            since = min(self._pending[s] for s in section_ids)
+            for s in section_ids:
+                del self._pending[s]
+            return section_ids, since
+
+    def _requeue(self, section_ids, since):
+        with self._lock:
+            if section_ids is None:
+                if self._full_pass_since is None:
+                    self._full_pass_since = since
+            else:
+                for s in section_ids:
+                    self._pending.setdefault(s, since)
+
+    async def run_once(self):
+        """
+        Promote one batch of pending sections
+
+        Returns:
+            int: Number of students promoted.
+        """
+
+        section_ids, since = self._take()
+        if section_ids == []:
+            return 0
+
+        started = time.monotonic()
+        adb = get_async_database()
+        try:
+            db = await adb.acquire()
+        except Exception as e:
+            self._requeue(section_ids, since)
+            self._last_error = f"{type(e).__name__}: {e}"
+            raise
+        try:
+            if not await db.run(is_auto_enroll_enabled):
+                # frozen: drop the events, unfreezing triggers a full pass
+                report = []
+            else:
+                report = await db.write(promote_waitlists, section_ids)
+        except Exception as e:
+            self._requeue(section_ids, since)
+            self._last_error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            await adb.release(db)
+
+        seat_feed.notify([r["section_id"] for r in report])
+        promoted = sum(r["promoted"] for r in report)
+        finished = time.monotonic()
+        self._runs += 1
+        self._promoted += promoted
+        self._last_promoted = promoted
+        self._last_run_at = time.time()
+        self._last_run_seconds = round(finished - started, 6)
+        self._last_lag = round(finished - since, 6)
+        self._last_error = None
+        return promoted
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                while self.queue_depth():
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("waitlist promotion failed")
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._pending) + (1 if self._full_pass_since is not None else 0)
+
+    def start(self):
+        """Start the background task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Cancel the background task; pending events stay queued."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def status(self) -> dict:
+        """
+        Snapshot of the scheduler state.
+
+        Returns:
+            dict: queue depth, age of the oldest pending event (lag), last run and totals.
+        """
+        now = time.monotonic()
+        with self._lock:
+            oldest = list(self._pending.values())
+            if self._full_pass_since is not None:
+                oldest.append(self._full_pass_since)
+            pending_sections = len(self._pending)
+            full_pass_pending = self._full_pass_since is not None
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "queue_depth": pending_sections,
+            "full_pass_pending": full_pass_pending,
+            "lag_seconds": round(now - min(oldest), 6) if oldest else 0.0,
+            "events": self._events,
+            "runs": self._runs,
+            "promoted": self._promoted,
+            "last_run_at": self._last_run_at,
+            "last_run_seconds": self._last_run_seconds,
+            "last_run_lag_seconds": self._last_lag,
+            "last_promoted": self._last_promoted,
+            "last_error": self._last_error,
+        }
+
+
+scheduler = AutoEnrollmentScheduler(settings.auto_enroll_interval, settings.auto_enroll_batch_size)
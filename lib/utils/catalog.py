@@ -0,0 +1,264 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from lib.models import Settings
+
+
+settings = Settings()
+
+# Course listing behind GET /classes/; `where` holds the optional filters and keyset
+CLASSES_QUERY = """
+    SELECT c.*, cs.id as section_id
+    FROM {schema}.course_section cs
+    INNER JOIN course c ON c.department_code = cs.dept_code AND c.course_no = cs.course_num
+    {where}
+    ORDER BY cs.id
+    LIMIT :limit
+"""
+
+# Optional filters of GET /classes/, keyed by query parameter, and the keyset
+# of its pages
+CLASS_FILTERS = {
+    "department": "cs.dept_code = :department",
+    "semester": "cs.semester = :semester",
+    "year": "cs.year = :year",
+    "open_seats": "cs.enrolled_count < cs.room_capacity",
+}
+CLASSES_KEYSET = "cs.id > :after"
+
+# Catalog columns of a section (everything except the seat counters)
+SECTION_COLUMNS = """
+    id, dept_code, course_num, section_no, semester, year, prof_id,
+    room_num, room_capacity, course_start_date, enrollment_start, enrollment_end
+"""
+SECTION_QUERY = f"SELECT {SECTION_COLUMNS} FROM course_section WHERE id = ?"
+
+
+def get_catalog_versions(db: sqlite3.Connection):
+    """
+    Read the catalog change counters
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+
+    Returns:
+        dict: name ("catalog", "seats") -> (version, modified_at as aware UTC datetime).
+    """
+
+    return {
+        row[0]: (row[1], datetime.strptime(row[2], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc))
+        for row in db.execute("SELECT name, version, modified_at FROM catalog_version")
+    }
+
+
+def validators(versions: dict, names: list[str]):
+    """
+    Build the ETag and Last-Modified values for a response built from `names`
+
+    Parameters:
+        versions (dict): Result of `get_catalog_versions`.
+        names (list[str]): The counters the response depends on.
+
+    Returns:
+        tuple[str, datetime]: Weak ETag and the latest modification time.
+    """
+
+    etag = "W/\"" + "-".join(f"{name[0]}{versions[name][0]}" for name in names) + "\""
+    last_modified = max(versions[name][1] for name in names)
+    return etag, last_modified
+
+
+def is_not_modified(if_none_match: str, if_modified_since: str, etag: str, last_modified: datetime):
+    """
+    Evaluate the conditional request headers (If-None-Match wins when both are sent)
+
+    Returns:
+        bool: True if the client's copy is still current and a 304 can be sent.
+    """
+
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def http_date(value: datetime):
+    return format_datetime(value, usegmt=True)
+
+
+class CatalogCache:
+    """
+    Size-bounded LRU read-through cache for section catalog rows
+
+    Entries are tagged with the shared "catalog" version. At most once every
+    `check_interval` seconds a lookup reads that version (one primary key
+    probe); if another process changed the catalog the whole cache is
+    dropped. Write routes in this process call `invalidate_section` so their
+    own changes are visible immediately. Lookups also return the version, so
+    a transaction can confirm the entry is still current by reading the
+    version again instead of the row.
+
+    Parameters:
+        max_entries (int): Maximum number of cached rows.
+        check_interval (float): Seconds between shared version checks.
+    """
+
+    def __init__(self, max_entries: int = 4096, check_interval: float = 0.25):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._version_changes = 0
+
+    def _check_version(self, db: sqlite3.Connection):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        row = db.execute("SELECT version FROM catalog_version WHERE name = 'catalog'").fetchone()
+        version = row[0] if row else None
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                if self._version is not None:
+                    self._version_changes += 1
+                self._entries.clear()
+                self._generation += 1
+                self._version = version
+
+    def _get(self, db: sqlite3.Connection, key: tuple, sql: str, params: list):
+        self._check_version(db)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key], self._version
+            self._misses += 1
+            generation = self._generation
+            version = self._version
+
+        row = db.execute(sql, params).fetchone()
+        value = dict(row) if row is not None else None
+
+        with self._lock:
+            if generation != self._generation:
+                # invalidated while we were reading, the row may already be stale
+                return value, None
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value, version
+
+    def get_section(self, db: sqlite3.Connection, section_id: int):
+        """
+        Get a section's catalog data (everything except the seat counters)
+
+        Parameters:
+            db (sqlite3.Connection): Database connection used on a miss.
+            section_id (int): Section ID.
+
+        Returns:
+            tuple[dict | None, int | None]: The section (None if it does not
+            exist), and the "catalog" version it is known to be current at
+            (None if that is not known, e.g. it was invalidated meanwhile).
+        """
+
+        return self._get(
+            db,
+            ("section", section_id),
+            SECTION_QUERY,
+            [section_id],
+        )
+
+    def preload(self, db: sqlite3.Connection):
+        """
+        Fill the cache with the newest sections
+
+        The newest terms get the registration traffic, so a new worker
+        answers its first lookups from memory.
+
+        Parameters:
+            db (sqlite3.Connection): Database connection.
+
+        Returns:
+            int: Rows cached.
+        """
+
+        self._check_version(db)
+        with self._lock:
+            generation = self._generation
+
+        sections = db.execute(
+            f"SELECT {SECTION_COLUMNS} FROM course_section ORDER BY id DESC LIMIT ?",
+            [self.max_entries],
+        ).fetchall()
+
+        with self._lock:
+            if generation != self._generation:
+                # the catalog changed while we were reading, lookups will fill it
+                return 0
+            for row in reversed(sections):
+                self._entries.setdefault(("section", row["id"]), dict(row))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return len(sections)
+
+    def _invalidate(self, key: tuple):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self._invalidations += 1
+            # our own write bumped the shared version; re-check on next lookup
+            self._checked_at = 0.0
+
+    def invalidate_section(self, section_id: int):
+        self._invalidate(("section", section_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._version = None
+            self._checked_at = 0.0
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the cache counters.
+
+        Returns:
+            dict: entries, hits, misses, hit ratio, evictions and invalidations.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "version": self._version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "version_changes": self._version_changes,
+            }
+
+
+catalog_cache = CatalogCache(settings.catalog_cache_size, settings.catalog_cache_check_interval)
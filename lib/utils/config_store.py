@@ -0,0 +1,200 @@
+import logging
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, NamedTuple
+
+from lib.db.transaction import run_immediate
+from lib.models import Settings
+
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = {"true", "1", "yes", "on"}
+FALSE_VALUES = {"false", "0", "no", "off"}
+
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+
+def format_bool(value: bool) -> str:
+    return "TRUE" if value else "FALSE"
+
+
+def parse_count(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"expected a non-negative integer, got {value!r}")
+    count = int(value)
+    if count < 0:
+        raise ValueError(f"expected a non-negative integer, got {value!r}")
+    return count
+
+
+class ConfigKey(NamedTuple):
+    parse: Callable[[Any], Any]
+    format: Callable[[Any], str]
+    default: Any
+
+
+# Every key the application reads; rows for other keys are ignored and missing
+# rows fall back to the default
+CONFIG_KEYS = {
+    "automatic_enrollment": ConfigKey(parse_bool, format_bool, True),
+    "waitlist_capacity": ConfigKey(parse_count, str, settings.waitlist_capacity),
+    "max_student_waitlists": ConfigKey(parse_count, str, settings.max_student_waitlists),
+}
+
+
+def load_configs(db: sqlite3.Connection):
+    """
+    Read and parse every known key from the configs table
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+
+    Returns:
+        dict: key -> typed value, with defaults for missing or invalid rows.
+    """
+
+    values = {key: spec.default for key, spec in CONFIG_KEYS.items()}
+    for key, raw in db.execute("SELECT key, value FROM configs"):
+        spec = CONFIG_KEYS.get(key)
+        if spec is None:
+            continue
+        try:
+            values[key] = spec.parse(raw)
+        except ValueError:
+            logger.warning("invalid value %r for config %s, using %r", raw, key, spec.default)
+    return values
+
+
+class ConfigStore:
+    """
+    Typed, cached view of the configs table
+
+    All keys are loaded at once and tagged with the shared "configs" version,
+    which triggers on the table bump on every write. At most once every
+    `check_interval` seconds a read checks that version (one primary key
+    probe) and reloads the table if it changed, so other processes' writes
+    show up within the interval and reads in between cost no query at all.
+
+    Parameters:
+        check_interval (float): Seconds between shared version checks.
+    """
+
+    def __init__(self, check_interval: float = 0.25):
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loads = 0
+        self._checks = 0
+
+    def _current(self, db: sqlite3.Connection):
+        now = time.monotonic()
+        values = self._values
+        if values is not None and now - self._checked_at < self.check_interval:
+            return values
+
+        row = db.execute("SELECT version FROM catalog_version WHERE name = 'configs'").fetchone()
+        version = row[0] if row else None
+        with self._lock:
+            self._checks += 1
+            if self._values is not None and version == self._version:
+                self._checked_at = now
+                return self._values
+
+        # the version was read first, so these values are at least that new
+        values = MappingProxyType(load_configs(db))
+        with self._lock:
+            self._values = values
+            self._version = version
+            self._checked_at = now
+            self._loads += 1
+        return values
+
+    def get(self, db: sqlite3.Connection, key: str):
+        """
+        Get one config value
+
+        Parameters:
+            db (sqlite3.Connection): Database connection used when a check is due.
+            key (str): A key of CONFIG_KEYS.
+
+        Returns:
+            The typed value.
+        """
+
+        return self._current(db)[key]
+
+    def all(self, db: sqlite3.Connection):
+        """
+        Get every config value
+
+        Parameters:
+            db (sqlite3.Connection): Database connection used when a check is due.
+
+        Returns:
+            Mapping: key -> typed value (read-only).
+        """
+
+        return self._current(db)
+
+    def store(self, db: sqlite3.Connection, key: str, value):
+        """
+        Validate and write one config value, without touching the cache
+
+        The write goes through `run_immediate`, so this can be a unit of a
+        group commit; call `invalidate` once it is committed.
+
+        Parameters:
+            db (sqlite3.Connection): Database connection.
+            key (str): A key of CONFIG_KEYS.
+            value: The new value, typed or as text.
+
+        Returns:
+            The typed value that was stored.
+
+        Raises:
+            KeyError: If the key is unknown.
+            ValueError: If the value does not parse.
+        """
+
+        spec = CONFIG_KEYS[key]
+        parsed = spec.parse(value)
+        run_immediate(
+            db,
+            lambda db: db.execute(
+                "INSERT INTO configs (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [key, spec.format(parsed)],
+            ),
+        )
+        return parsed
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+            self._checked_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "checks": self._checks,
+                "loads": self._loads,
+            }
+
+
+config_store = ConfigStore(settings.config_check_interval)
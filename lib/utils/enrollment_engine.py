@@ -0,0 +1,259 @@
+import sqlite3
+
+from lib.db.transaction import run_immediate
+from lib.models import EnrollmentResult, Settings
+from lib.utils.config_store import config_store
+
+
+settings = Settings()
+
+ENROLLED = "enrolled"
+WAITLISTED = "waitlisted"
+REJECTED = "rejected"
+
+# Everything needed to decide enroll vs. waitlist vs. reject, read in one
+# statement; `capacity` is the room capacity, or the "catalog" version when
+# the capacity comes from the catalog cache (see `enroll`)
+SECTION_STATE_QUERY = """
+    SELECT {capacity},
+        cs.enrolled_count,
+        cs.waitlist_count,
+        EXISTS(SELECT 1 FROM students WHERE id = :student_id) AS student_exists,
+        EXISTS(SELECT 1 FROM enrollments
+               WHERE section_id = cs.id AND student_id = :student_id) AS already_enrolled,
+        EXISTS(SELECT 1 FROM waitlist
+               WHERE section_id = cs.id AND student_id = :student_id) AS already_waitlisted,
+        (SELECT COUNT(*) FROM waitlist WHERE student_id = :student_id) AS student_waitlists
+    FROM course_section cs
+    WHERE cs.id = :section_id
+"""
+
+ROOM_CAPACITY = "cs.room_capacity"
+CATALOG_VERSION = "(SELECT version FROM catalog_version WHERE name = 'catalog')"
+
+ENROLL_INSERT = """
+    INSERT INTO enrollments(section_id, student_id, enrollment_date)
+    VALUES(:section_id, :student_id, datetime('now'))
+"""
+
+WAITLIST_INSERT = """
+    INSERT INTO waitlist(section_id, student_id, waitlist_date)
+    VALUES(:section_id, :student_id, datetime('now'))
+"""
+
+
+def decide(state, student_id: int, section_id: int, config):
+    """
+    Decide the outcome of an enrollment request from the section state
+
+    Parameters:
+        state (sqlite3.Row | None): Row returned by SECTION_STATE_QUERY.
+        student_id (int): Student ID.
+        section_id (int): Section ID.
+        config (Mapping): Config values, for the waitlist limits.
+
+    Returns:
+        EnrollmentResult: The outcome; nothing has been written yet.
+    """
+
+    def result(status, reason=None):
+        return EnrollmentResult(
+            student_id=student_id, section_id=section_id, status=status, reason=reason
+        )
+
+    if state is None:
+        return result(REJECTED, "section_not_found")
+    room_capacity, enrolled, waitlisted, student_exists, already_enrolled, already_waitlisted, student_waitlists = state
+    if not student_exists:
+        return result(REJECTED, "student_not_found")
+    if already_enrolled:
+        return result(REJECTED, "already_enrolled")
+    if already_waitlisted:
+        return result(REJECTED, "already_waitlisted")
+    if enrolled < room_capacity:
+        return result(ENROLLED)
+    if waitlisted >= config["waitlist_capacity"]:
+        return result(REJECTED, "class_full")
+    if student_waitlists >= config["max_student_waitlists"]:
+        return result(REJECTED, "waitlist_limit")
+    return result(WAITLISTED)
+
+
+def _enroll(db: sqlite3.Connection, student_id: int, section_id: int, room_capacity: int = None,
+            catalog_version: int = None):
+    params = {"student_id": student_id, "section_id": section_id}
+    state = None
+    if room_capacity is not None and catalog_version is not None:
+        state = db.execute(SECTION_STATE_QUERY.format(capacity=CATALOG_VERSION), params).fetchone()
+        if state is not None and state[0] == catalog_version:
+            state = (room_capacity, *state[1:])
+        else:
+            # the section is gone or the catalog changed since it was cached
+            state = None
+    if state is None:
+        state = db.execute(SECTION_STATE_QUERY.format(capacity=ROOM_CAPACITY), params).fetchone()
+    result = decide(state, student_id, section_id, config_store.all(db))
+
+    if result.status == ENROLLED:
+        db.execute(ENROLL_INSERT, params)
+    elif result.status == WAITLISTED:
+        db.execute(WAITLIST_INSERT, params)
+    return result
+
+
+def enroll(db: sqlite3.Connection, student_id: int, section_id: int, room_capacity: int = None,
+           catalog_version: int = None):
+    """
+    Enroll or waitlist a student atomically
+
+    One BEGIN IMMEDIATE transaction reads the section state (room capacity,
+    maintained counters, the student's existing enrollment and waitlist
+    rows) in a single statement, then performs at most one insert.
+    Concurrent requests for the same section are serialized by the write
+    lock, so the section can never be oversold.
+
+    With the capacity from the catalog cache, the statement reads the
+    "catalog" version instead of it: the cached capacity is used only if the
+    catalog has not changed since, otherwise the capacity is read again.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection, outside of a transaction.
+        student_id (int): Student ID.
+        section_id (int): Section ID.
+        room_capacity (int, optional): Cached capacity of the section.
+        catalog_version (int, optional): "catalog" version the capacity is current at.
+
+    Returns:
+        EnrollmentResult: enrolled, waitlisted, or rejected with a reason.
+    """
+
+    return run_immediate(db, _enroll, student_id, section_id, room_capacity, catalog_version)
+
+
+def _placeholders(values):
+    return ", ".join("?" * len(values))
+
+
+def _enroll_chunk(db: sqlite3.Connection, chunk: list):
+    section_ids = list({e.section_id for e in chunk})
+    student_ids = list({e.student_id for e in chunk})
+    sections_in = _placeholders(section_ids)
+    students_in = _placeholders(student_ids)
+
+    sections = {
+        row[0]: list(row[1:])
+        for row in db.execute(
+            f"""
+            SELECT id, room_capacity, enrolled_count, waitlist_count
+            FROM course_section WHERE id IN ({sections_in})
+            """,
+            section_ids,
+        )
+    }
+    students = {
+        row[0]
+        for row in db.execute(
+            f"SELECT id FROM students WHERE id IN ({students_in})", student_ids
+        )
+    }
+    enrolled = {
+        (row[0], row[1])
+        for row in db.execute(
+            f"""
+            SELECT section_id, student_id FROM enrollments
+            WHERE section_id IN ({sections_in}) AND student_id IN ({students_in})
+            """,
+            section_ids + student_ids,
+        )
+    }
+    waitlisted = {
+        (row[0], row[1])
+        for row in db.execute(
+            f"""
+            SELECT section_id, student_id FROM waitlist
+            WHERE section_id IN ({sections_in}) AND student_id IN ({students_in})
+            """,
+            section_ids + student_ids,
+        )
+    }
+    student_waitlists = dict(
+        db.execute(
+            f"""
+            SELECT student_id, COUNT(*) FROM waitlist
+            WHERE student_id IN ({students_in}) GROUP BY student_id
+            """,
+            student_ids,
+        ).fetchall()
+    )
+
+    config = config_store.all(db)
+    results = []
+    enroll_rows = []
+    waitlist_rows = []
+    for e in chunk:
+        key = (e.section_id, e.student_id)
+        section = sections.get(e.section_id)
+        state = None
+        if section is not None:
+            state = (
+                section[0],
+                section[1],
+                section[2],
+                e.student_id in students,
+                key in enrolled,
+                key in waitlisted,
+                student_waitlists.get(e.student_id, 0),
+            )
+        result = decide(state, e.student_id, e.section_id, config)
+
+        # apply the decision to the in-memory state so later items in the
+        # same chunk see it, exactly as if they had been sent one by one
+        if result.status == ENROLLED:
+            section[1] += 1
+            enrolled.add(key)
+            enroll_rows.append(key)
+        elif result.status == WAITLISTED:
+            section[2] += 1
+            waitlisted.add(key)
+            student_waitlists[e.student_id] = student_waitlists.get(e.student_id, 0) + 1
+            waitlist_rows.append(key)
+        results.append(result)
+
+    if enroll_rows:
+        db.executemany(
+            "INSERT INTO enrollments(section_id, student_id, enrollment_date) VALUES(?, ?, datetime('now'))",
+            enroll_rows,
+        )
+    if waitlist_rows:
+        db.executemany(
+            "INSERT INTO waitlist(section_id, student_id, waitlist_date) VALUES(?, ?, datetime('now'))",
+            waitlist_rows,
+        )
+    return results
+
+
+def enroll_batch(db: sqlite3.Connection, enrollments: list, chunk_size: int = None):
+    """
+    Enroll or waitlist many students at once
+
+    Items are processed in order, in chunks of `chunk_size`. Each chunk is one
+    BEGIN IMMEDIATE transaction that validates the whole chunk with a fixed
+    number of set-based reads, decides every item in memory with the same
+    rules as `enroll`, and writes the rows with `executemany`.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection, outside of a transaction.
+        enrollments (list[Enrollment]): The requested enrollments.
+        chunk_size (int, optional): Items per transaction. Defaults to
+            `Settings.enroll_batch_chunk_size`.
+
+    Returns:
+        list[EnrollmentResult]: One result per item, in request order.
+    """
+
+    chunk_size = chunk_size or settings.enroll_batch_chunk_size
+    results = []
+    for start in range(0, len(enrollments), chunk_size):
+        chunk = enrollments[start:start + chunk_size]
+        results.extend(run_immediate(db, _enroll_chunk, chunk))
+    return results
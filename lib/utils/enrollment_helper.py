@@ -1,5 +1,7 @@
 import sqlite3
-from fastapi import HTTPException, status
+
+from lib.db.transaction import run_immediate
+from lib.utils.config_store import config_store
 
 def is_auto_enroll_enabled(db: sqlite3.Connection):
     """
@@ -11,85 +13,94 @@ def is_auto_enroll_enabled(db: sqlite3.Connection):
     Returns:
         bool: True if automatic enrollment is enabled. Otherwise, False.
     """
-    
-    cursor = db.execute("SELECT automatic_enrollment FROM configs")
-    result = cursor.fetchone()
-    return result[0] == 1
 
-def get_opening_sections(db: sqlite3.Connection):
+    return config_store.get(db, "automatic_enrollment")
+
+WAITLIST_POSITION_QUERY = """
+    SELECT me.section_id,
+        (SELECT COUNT(*)
+        FROM waitlist w
+        WHERE w.section_id = me.section_id AND
+            (w.waitlist_date, w.student_id) < (me.waitlist_date, me.student_id)
+        ) + 1 AS position
+    FROM waitlist me
+"""
+
+# A section's waitlist in order, read from the (section_id, waitlist_date, student_id) index alone
+SECTION_WAITLIST_QUERY = "SELECT student_id FROM waitlist WHERE section_id = ? ORDER BY waitlist_date ASC"
+
+DROP_ENROLLMENT_QUERY = "DELETE FROM enrollments WHERE student_id = ? AND section_id = ?"
+DROP_WAITLIST_QUERY = "DELETE FROM waitlist WHERE student_id = ? AND section_id = ?"
+# a student who dropped, re-enrolled and drops again keeps one droplist row, with the last drop
+RECORD_DROP_QUERY = """
+    INSERT INTO droplist(section_id, student_id, drop_date, administrative)
+    VALUES(?, ?, datetime('now'), ?)
+    ON CONFLICT (section_id, student_id) DO UPDATE
+    SET drop_date = excluded.drop_date, administrative = excluded.administrative
+"""
+
+def get_waitlist_position(db: sqlite3.Connection, section_id: int, student_id: int):
     """
-    Get sections which have available seats
+    Get a student's position on a section's waitlist
+
+    The rank is counted on the (section_id, waitlist_date, student_id) index,
+    so only the entries ahead of the student are visited.
 
     Parameters:
         db (sqlite3.Connection): Database connection.
+        section_id (int): Section ID.
+        student_id (int): Student ID.
 
     Returns:
-        list[int]: A list of section_id.
+        int: 1-based position, or -1 if the student is not on the waitlist.
+    """
+
+    row = db.execute(
+        WAITLIST_POSITION_QUERY + "WHERE me.section_id = ? AND me.student_id = ?",
+        [section_id, student_id],
+    ).fetchone()
+    return row["position"] if row else -1
+
+def get_waitlist_positions(db: sqlite3.Connection, student_id: int):
+    """
+    Get a student's positions on every waitlist they are on
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        student_id (int): Student ID.
+
+    Returns:
+        list[dict]: section_id and 1-based position, ordered by section_id.
     """
 
     cursor = db.execute(
-        """
-        SELECT id 
-        FROM course_section 
-        WHERE DATE('now') <= date(course_start_date, '+14 days') AND
-            room_capacity > (SELECT COUNT(student_id)
-                            FROM enrollments
-                            WHERE section_id = id
-                            )
-        """)
-    rows = cursor.fetchall()
-    return [row[0] for row in rows]
-
-def enroll_students_from_waitlist(db: sqlite3.Connection, section_id_list: list[int]):
+        WAITLIST_POSITION_QUERY + "WHERE me.student_id = ? ORDER BY me.section_id",
+        [student_id],
+    )
+    return [{"section_id": row[0], "position": row[1]} for row in cursor]
+
+def _drop(db: sqlite3.Connection, section_id: int, student_id: int, administrative: bool):
+    cur = db.execute(DROP_ENROLLMENT_QUERY, [student_id, section_id])
+    seat_freed = cur.rowcount > 0
+    db.execute(DROP_WAITLIST_QUERY, [student_id, section_id])
+    db.execute(RECORD_DROP_QUERY, [section_id, student_id, administrative])
+    return seat_freed
+
+def drop_enrollment(db: sqlite3.Connection, section_id: int, student_id: int, administrative: bool = False):
     """
-    This function checks the waitlist for available spots in the sections
-    and enrolls students accordingly.
+    Drop a student from a section and record it in the droplist
+
+    The enrollment and any waitlist entry are deleted and the drop is
+    recorded in one transaction.
 
     Parameters:
         db (sqlite3.Connection): Database connection.
+        section_id (int): Section ID.
+        student_id (int): Student ID.
+        administrative (bool): True if a professor dropped the student.
 
     Returns:
-        int: The number of success enrollments.
+        bool: True if an enrolled seat was freed (the waitlist can be promoted).
     """
-    
-    enrollment_count = 0
-
-    try:
-        for e in section_id_list:
-            cursor = db.execute(
-            """
-            INSERT INTO enrollments (section_id, student_id, enrollment_date)
-                SELECT section_id, student_id, datetime('now')
-                FROM waitlist
-                WHERE section_id=$0
-                ORDER BY waitlist_date ASC
-                LIMIT (
-                        (SELECT room_capacity 
-                        FROM course_section
-                        WHERE id=$0) - (SELECT COUNT(student_id)
-                                        FROM enrollments
-                                        WHERE section_id=$0
-                                        )
-                    );
-            """, [e])
-
-            cursor = db.execute(
-            """
-            DELETE FROM waitlist
-            WHERE student_id IN (
-                SELECT student_id
-                FROM waitlist
-                ORDER BY waitlist_date
-                LIMIT $0
-            );
-            """, [cursor.rowcount])
-
-            enrollment_count += cursor.rowcount
-        
-        db.commit()
-    except sqlite3.Error as e:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail={"type": type(e).__name__, "msg": str(e)},
-        )
-    return enrollment_count
\ No newline at end of file
+
+    return run_immediate(db, _drop, section_id, student_id, administrative)
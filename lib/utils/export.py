@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import sqlite3
+import threading
+
+from fastapi.responses import StreamingResponse
+
+from lib.archive import attach_archives, union_terms
+from lib.models import Settings
+from lib.utils.json_response import STREAM_FETCH_SIZE, iter_ndjson
+from lib.utils.professor_helper import parse_cursor
+
+
+settings = Settings()
+
+# Tables that can be exported, keyed by the name in the URL
+EXPORT_TABLES = {
+    "enrollments": "enrollments",
+    "waitlists": "waitlist",
+    "droplists": "droplist",
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Every row of a table in primary key order, so an export can be resumed with
+# a keyset cursor; `where` holds the optional filters and keyset
+EXPORT_QUERY = """
+    SELECT t.*
+    FROM {schema}.{table} t
+    WHERE 1 {where}
+    ORDER BY t.section_id, t.student_id
+"""
+TERM_FILTER = "AND t.section_id IN (SELECT id FROM {schema}.course_section WHERE {term})"
+SECTIONS_FILTER = "AND t.section_id IN (SELECT value FROM json_each(:section_ids))"
+KEYSET = "AND (t.section_id, t.student_id) > (:section_id, :student_id)"
+
+
+def export_rows(db: sqlite3.Connection, table: str, semester: str = None, year: int = None,
+                section_ids: list[int] = None, after: str = None, limit: int = None):
+    """
+    Query every row of an exported table, optionally of one term or some sections
+
+    A single statement, so all of its rows come from one WAL snapshot however
+    long the export takes to read, and writers are not blocked meanwhile.
+    Archived terms are included when the export is filtered by term.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection, outside of a transaction.
+        table (str): A key of EXPORT_TABLES.
+        semester (str, optional): Only sections of this semester.
+        year (int, optional): Only sections of this year.
+        section_ids (list[int], optional): Only these sections.
+        after (str, optional): "<section_id>:<student_id>" of the last row already exported.
+        limit (int, optional): Rows to export. All rows when omitted.
+
+    Returns:
+        sqlite3.Cursor: Unfetched cursor over the rows, as plain tuples.
+    """
+
+    params = {"limit": limit or -1}
+    where = []
+    term = []
+    if semester is not None:
+        term.append("semester = :semester")
+        params["semester"] = semester
+    if year is not None:
+        term.append("year = :year")
+        params["year"] = year
+    if term:
+        where.append(TERM_FILTER.format(schema="{schema}", term=" AND ".join(term)))
+    if section_ids:
+        where.append(SECTIONS_FILTER)
+        params["section_ids"] = json.dumps(section_ids)
+    if after:
+        params["section_id"], params["student_id"] = parse_cursor(after)
+        where.append(KEYSET)
+
+    sql = EXPORT_QUERY.format(schema="{schema}", table=EXPORT_TABLES[table], where=" ".join(where))
+    archives = attach_archives(db, semester, year) if term else []
+    sql = union_terms(sql, archives, "ORDER BY section_id, student_id") + "\nLIMIT :limit"
+    cursor = db.cursor()
+    cursor.row_factory = None
+    return cursor.execute(sql, params)
+
+
+def iter_csv(cursor: sqlite3.Cursor, size: int = STREAM_FETCH_SIZE):
+    """
+    Encode a cursor as CSV with a header line, `size` rows at a time
+
+    Returns:
+        iterator[bytes]: The header, then one encoded chunk per fetch.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(c[0] for c in cursor.description)
+    while True:
+        rows = cursor.fetchmany(size)
+        writer.writerows(rows)
+        chunk = buffer.getvalue()
+        if chunk:
+            yield chunk.encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if not rows:
+            break
+
+
+ENCODERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+}
+
+
+class ExportSlots:
+    """
+    Caps the exports streamed at once by this process
+
+    Each export holds a pooled connection until its last row is sent, so a
+    few slow downloads could otherwise take the connections the routes need.
+
+    Parameters:
+        size (int): Exports streamed at once.
+    """
+
+    def __init__(self, size: int = 2):
+        self.size = size
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._started = 0
+        self._rejected = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._active >= self.size:
+                self._rejected += 1
+                return False
+            self._active += 1
+            self._started += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "started": self._started,
+                "rejected": self._rejected,
+            }
+
+
+export_slots = ExportSlots(settings.export_max_concurrent)
+
+
+class ExportResponse(StreamingResponse):
+    """
+    Streamed export that gives its slot of `export_slots` back once sent
+
+    The slot is taken by the route, before the response starts, so a full
+    process can still answer 503. It is released when the response is done,
+    whether the body was sent in full, failed or was never iterated because
+    the client went away first.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            export_slots.release()
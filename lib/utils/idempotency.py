@@ -0,0 +1,307 @@
+import collections
+import hashlib
+import json
+import logging
+import time
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+from lib.db import get_async_database
+from lib.db.pool import PoolTimeout
+from lib.db.transaction import run_immediate
+from lib.models import Settings
+
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 65536  # bytes; larger responses are not stored
+PURGE_INTERVAL = 60.0  # seconds between deletions of expired rows
+
+# Outcomes that depend on the request only. 409 (a database error) and 429
+# (admission control) are transient, so a retry runs the request again.
+UNCACHED_STATUSES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+LOAD_QUERY = "SELECT fingerprint, status, headers, body, expires_at FROM idempotency_key WHERE key = ?"
+# the first response stored for a key wins, until it expires
+STORE_QUERY = """
+    INSERT INTO idempotency_key (key, fingerprint, status, headers, body, expires_at)
+    VALUES (:key, :fingerprint, :status, :headers, :body, :expires_at)
+    ON CONFLICT (key) DO UPDATE SET
+        fingerprint = excluded.fingerprint, status = excluded.status, headers = excluded.headers,
+        body = excluded.body, expires_at = excluded.expires_at
+    WHERE idempotency_key.expires_at < :now
+"""
+PURGE_QUERY = "DELETE FROM idempotency_key WHERE expires_at < ?"
+
+
+StoredResponse = collections.namedtuple("StoredResponse", "fingerprint status headers body expires_at")
+
+
+def _store(db, key: str, response: StoredResponse, now: float, purge: bool):
+    def write(db):
+        db.execute(
+            STORE_QUERY,
+            {**response._asdict(), "key": key, "headers": json.dumps(response.headers), "now": now},
+        )
+        if purge:
+            db.execute(PURGE_QUERY, [now])
+
+    run_immediate(db, write)
+
+
+class IdempotencyStore:
+    """
+    First responses of requests sent with an Idempotency-Key
+
+    Kept in an in-process LRU of `max_keys` entries for `ttl` seconds, so a
+    replay on the same process costs no SQL at all. With `persist`, every
+    response is also written to the idempotency_key table, where the other
+    worker processes find it when they miss locally; expired rows are
+    deleted along with a later write.
+
+    Parameters:
+        ttl (float): Seconds a response is replayed.
+        max_keys (int): Responses kept in memory.
+        persist (bool): Also store the responses in SQLite.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_keys: int = 100000, persist: bool = True):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.persist = persist
+
+        self._entries = collections.OrderedDict()
+        self._purged_at = 0.0
+
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._stored = 0
+
+    def get_local(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, entry: StoredResponse):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str):
+        """
+        Look a key up, in memory first, then in SQLite
+
+        Returns:
+            StoredResponse | None: The stored response, unless unknown or expired.
+
+        Raises:
+            PoolTimeout: If the key is not in memory and no connection is free to look in SQLite.
+        """
+        entry = self.get_local(key)
+        if entry is not None:
+            self._hits += 1
+            return entry
+        if self.persist:
+            adb = get_async_database()
+            db = await adb.acquire()
+            try:
+                row = await db.fetchone(LOAD_QUERY, [key])
+            finally:
+                await adb.release(db)
+            if row is not None and row[4] >= time.time():
+                entry = StoredResponse(row[0], row[1], [tuple(h) for h in json.loads(row[2])], row[3], row[4])
+                self._remember(key, entry)
+                self._shared_hits += 1
+                return entry
+        self._misses += 1
+        return None
+
+    async def put(self, key: str, fingerprint: str, status_code: int, headers: list, body: bytes):
+        now = time.time()
+        entry = StoredResponse(fingerprint, status_code, headers, body, now + self.ttl)
+        self._remember(key, entry)
+        self._stored += 1
+        if self.persist:
+            purge = now - self._purged_at >= PURGE_INTERVAL
+            if purge:
+                self._purged_at = now
+            adb = get_async_database()
+            db = await adb.acquire()
+            try:
+                await db.write(_store, key, entry, now, purge)
+            finally:
+                await adb.release(db)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "shared_hits": self._shared_hits,
+            "misses": self._misses,
+            "stored": self._stored,
+        }
+
+
+idempotency_store = IdempotencyStore(
+    settings.idempotency_ttl, settings.idempotency_max_keys, settings.idempotency_persist
+)
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware replaying the first response of requests sent again with the same Idempotency-Key
+
+    Only `routes` honour the header, other requests pass through untouched.
+    The first request with a key runs normally and its response is stored
+    once it has been sent (server errors, 409 and 429 are not, so those are
+    retried for real). A later request with the key and the same method,
+    path, query and body gets the stored response back, with an
+    `Idempotent-Replayed: true` header, without running the route: no
+    admission slot, no connection, no SQL on a local hit. The same key with
+    a different request is refused with 422, a retry that arrives while
+    the first request is still running with 409, and a request whose key
+    cannot be looked up in SQLite (no connection free) with 503: running it
+    could repeat a request another worker already completed.
+
+    Parameters:
+        routes (list): Routes (from the API router) that accept Idempotency-Key.
+        store (IdempotencyStore, optional): Defaults to the process-wide store.
+    """
+
+    replays = 0
+    conflicts = 0
+    mismatches = 0
+    unavailable = 0
+
+    def __init__(self, app, routes: list, store: IdempotencyStore = None):
+        self.app = app
+        self.routes = routes
+        self.store = store or idempotency_store
+        self._in_flight = set()
+
+    def _match(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        key = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"idempotency-key"), None)
+        route = self._match(scope) if key is not None else None
+        if route is None:
+            return await self.app(scope, receive, send)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse(
+                {"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"},
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+            return await response(scope, receive, send)
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope["query_string"], body])
+        ).hexdigest()
+
+        try:
+            stored = await self.store.get(key)
+        except PoolTimeout:
+            IdempotencyMiddleware.unavailable += 1
+            response = JSONResponse(
+                {"detail": "Idempotency-Key could not be looked up, the database is busy"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+            return await response(scope, receive, send)
+        if stored is None and key in self._in_flight:
+            IdempotencyMiddleware.conflicts += 1
+            response = JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"},
+                status_code=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": "1"},
+            )
+            return await response(scope, receive, send)
+        # stored by a request that finished while this one was looking it up
+        stored = stored or self.store.get_local(key)
+
+        # replays are labelled with their route in the metrics
+        scope["route"] = route
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                IdempotencyMiddleware.mismatches += 1
+                response = JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"},
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+                return await response(scope, receive, send)
+            IdempotencyMiddleware.replays += 1
+            headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in stored.headers]
+            await send({
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": headers + [(b"idempotent-replayed", b"true")],
+            })
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+
+        request_sent = False
+
+        async def receive_body():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response_status = None
+        response_headers = []
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal response_status, response_headers
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                response_headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        self._in_flight.add(key)
+        try:
+            await self.app(scope, receive_body, send_wrapper)
+            response_body = b"".join(chunks)
+            if (
+                response_status is not None
+                and response_status < 500
+                and response_status not in UNCACHED_STATUSES
+                and len(response_body) <= MAX_STORED_BODY
+            ):
+                try:
+                    await self.store.put(key, fingerprint, response_status, response_headers, response_body)
+                except Exception:
+                    # the response is already sent, a retry will run the request again
+                    logger.exception("could not store the response for an Idempotency-Key")
+        finally:
+            self._in_flight.discard(key)
@@ -0,0 +1,150 @@
+import itertools
+import json
+import sqlite3
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Rows per fetchmany call of the streamed responses
+STREAM_FETCH_SIZE = 500
+
+
+class Rows:
+    """
+    Query result kept as plain tuples, with its column names
+
+    The column layout is read once from the cursor description; the rows are
+    fetched without a row factory, so no sqlite3.Row is built per row, and
+    they are encoded straight from the tuples (see `encode_rows`).
+
+    Parameters:
+        columns (tuple[str]): Column names, in row order.
+        rows (list[tuple]): The rows.
+    """
+
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns: tuple, rows: list):
+        self.columns = columns
+        self.rows = rows
+
+    @classmethod
+    def from_cursor(cls, cursor: sqlite3.Cursor):
+        """Fetch every remaining row of an executed cursor."""
+        cursor.row_factory = None
+        return cls(tuple(c[0] for c in cursor.description), cursor.fetchall())
+
+    @classmethod
+    def fetch(cls, db: sqlite3.Connection, sql: str, params=()):
+        """Execute a query and fetch every row."""
+        return cls.from_cursor(db.execute(sql, params))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def last(self):
+        """The last row as a dict, or None if there are no rows."""
+        return dict(zip(self.columns, self.rows[-1])) if self.rows else None
+
+    def encode(self) -> bytes:
+        """The rows as a JSON array of objects."""
+        return b"[" + encode_rows(self.columns, self.rows) + b"]"
+
+
+def _default(obj):
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def _encode_column(values: tuple) -> list:
+    # one call for the whole column; a string holding a comma splits in
+    # more parts than there are values, then they are encoded one by one
+    parts = dumps(values)[1:-1].split(b",")
+    if len(parts) == len(values):
+        return parts
+    return [dumps(value) for value in values]
+
+
+def encode_rows(columns: tuple, rows: list, separator: bytes = b",") -> bytes:
+    """
+    Encode tuples as JSON objects keyed by `columns`, joined by `separator`
+
+    No dict is built per row: each column is encoded at once, and the values
+    are formatted into the row template of pre-encoded `"column":` keys.
+
+    Parameters:
+        columns (tuple[str]): Column names, in row order.
+        rows (list[tuple]): The rows.
+        separator (bytes): Put between two objects.
+
+    Returns:
+        bytes: The objects, without brackets.
+    """
+
+    if not rows:
+        return b""
+    template = b"{" + b",".join(dumps(c).replace(b"%", b"%%") + b":%b" for c in columns) + b"}"
+    values = itertools.chain.from_iterable(zip(*(_encode_column(c) for c in zip(*rows))))
+    return separator.join([template] * len(rows)) % tuple(values)
+
+
+def iter_ndjson(cursor: sqlite3.Cursor, size: int = STREAM_FETCH_SIZE):
+    """
+    Encode a cursor as newline-delimited JSON, `size` rows at a time
+
+    Parameters:
+        cursor (sqlite3.Cursor): Executed cursor, with or without a row factory.
+        size (int): Rows per fetchmany call.
+
+    Returns:
+        iterator[bytes]: One encoded chunk per fetch.
+    """
+
+    columns = tuple(c[0] for c in cursor.description)
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield encode_rows(columns, rows, b"\n") + b"\n"
+
+
+def _encode(content) -> bytes:
+    if isinstance(content, Rows):
+        return content.encode()
+    if isinstance(content, dict):
+        return b"{" + b",".join(dumps(key) + b":" + _encode(value) for key, value in content.items()) + b"}"
+    return dumps(content)
+
+
+class RowsJSONResponse(JSONResponse):
+    """
+    JSON response for large query results
+
+    Routes return it directly, so FastAPI's generic `jsonable_encoder` pass
+    over every row and value is skipped. Rows (as values of the content dict,
+    at any depth of dicts), sqlite3.Row and pydantic models in the content
+    are encoded by orjson when it is installed (the standard json module
+    otherwise); the output is the same JSON the default response produces.
+    """
+
+    def render(self, content) -> bytes:
+        return _encode(content)
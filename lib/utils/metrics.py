@@ -0,0 +1,227 @@
+import bisect
+import contextvars
+import threading
+import time
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000, 5000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition format
+
+    `observe` is a bisect plus a few additions under a lock, cheap enough to
+    run on every request and every SQL statement.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(values[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """
+    Holds the metrics and renders them for GET /metrics
+
+    Component state is not copied into metrics: `collectors` are called at
+    scrape time and yield (name, type, help, [(labels dict, value)]) tuples
+    read from the components' own stats() snapshots.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, type_, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {type_}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class QueryStats:
+    """SQL work done on behalf of one request, filled in by the instrumented connections."""
+
+    __slots__ = ("statements", "rows", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+
+# The current request's QueryStats; AsyncConnection.run copies the context
+# into the executor thread, so statements are attributed to their request
+query_stats = contextvars.ContextVar("query_stats", default=None)
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body.", ("method", "route")
+)
+request_statements = registry.histogram(
+    "db_statements_per_request", "SQL statements executed per request.", ("route",), COUNT_BUCKETS
+)
+request_rows = registry.histogram(
+    "db_rows_per_request", "Rows read or changed per request.", ("route",), COUNT_BUCKETS
+)
+request_db_seconds = registry.histogram(
+    "db_seconds_per_request", "Time spent inside SQLite per request.", ("route",)
+)
+statement_latency = registry.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time by leading keyword.", ("operation",)
+)
+sqlite_busy = registry.counter(
+    "sqlite_busy_total", "Statements that failed with SQLITE_BUSY or SQLITE_LOCKED.", ("operation",)
+)
+lock_wait = registry.histogram(
+    "sqlite_lock_wait_seconds", "Time to obtain the write lock (BEGIN IMMEDIATE/EXCLUSIVE)."
+)
+group_commit_size = registry.histogram(
+    "db_group_commit_size", "Write transactions per group commit.", (), COUNT_BUCKETS
+)
+group_commit_seconds = registry.histogram(
+    "db_group_commit_seconds", "Time from BEGIN IMMEDIATE to COMMIT of a group commit."
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and per-request SQL work
+
+    The route label is the matched path template (`/professors/{id}/enrollments`),
+    so cardinality stays bounded; unmatched paths are grouped as "unmatched".
+    Each request gets a QueryStats that the instrumented connections fill in,
+    and the response carries a Server-Timing header with the time spent in
+    SQLite.
+    """
+
+    in_progress = 0
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.seconds * 1000:.3f};desc="{stats.statements} statements"'.encode(),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        MetricsMiddleware.in_progress += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            MetricsMiddleware.in_progress -= 1
+            query_stats.reset(token)
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc((method, label, status))
+            http_latency.observe((method, label), time.perf_counter() - started)
+            request_statements.observe((label,), stats.statements)
+            request_rows.observe((label,), stats.rows)
+            request_db_seconds.observe((label,), stats.seconds)
@@ -0,0 +1,119 @@
+import sqlite3
+
+from fastapi import HTTPException, status
+
+from lib.archive import attach_archives, union_terms
+
+
+# Tables that can be listed per professor, keyed by the response field name
+PROFESSOR_TABLES = {
+    "enrollments": "enrollments",
+    "droplist": "droplist",
+}
+
+PROFESSOR_QUERY = "SELECT * FROM PROFESSORS WHERE id = ? LIMIT 1"
+
+PROFESSOR_ROWS_QUERY = """
+    SELECT t.*
+    FROM {schema}.course_section cs
+    JOIN {schema}.{table} t ON t.section_id = cs.id
+    WHERE cs.prof_id = :prof_id {keyset}
+    ORDER BY cs.id, t.student_id
+    LIMIT :limit
+"""
+
+# Per-section counts of a professor's sections; the enrollments use the
+# maintained counter, no need to touch the enrollments table
+SECTION_ENROLLED_QUERY = "SELECT id, enrolled_count FROM {schema}.course_section WHERE prof_id = :prof_id ORDER BY id"
+SECTION_COUNTS_QUERY = """
+    SELECT cs.id, COUNT(t.student_id)
+    FROM {schema}.course_section cs
+    LEFT JOIN {schema}.{table} t ON t.section_id = cs.id
+    WHERE cs.prof_id = :prof_id
+    GROUP BY cs.id
+    ORDER BY cs.id
+"""
+
+
+def parse_cursor(after: str):
+    """
+    Parse a keyset pagination cursor
+
+    Parameters:
+        after (str): Cursor in the form "<section_id>:<student_id>".
+
+    Returns:
+        tuple[int, int]: (section_id, student_id) of the last row already seen.
+
+    Raises:
+        HTTPException (400): If the cursor is malformed.
+    """
+
+    try:
+        section_id, student_id = after.split(":")
+        return int(section_id), int(student_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor must look like <section_id>:<student_id>",
+        )
+
+
+def make_cursor(row):
+    return f"{row['section_id']}:{row['student_id']}"
+
+
+def professor_rows(db: sqlite3.Connection, prof_id: int, table: str, after: str = None, limit: int = None):
+    """
+    Query a professor's enrollment or droplist rows across all their sections
+
+    One join driven by the course_section(prof_id) index, ordered by the
+    table's (section_id, student_id) primary key so pages can be resumed with
+    a keyset cursor. The archived terms the professor taught in are read from
+    their archives, one page per database, and merged.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        prof_id (int): Professor ID.
+        table (str): "enrollments" or "droplist".
+        after (str, optional): Cursor returned with the previous page.
+        limit (int, optional): Page size. All rows when omitted.
+
+    Returns:
+        sqlite3.Cursor: Unfetched cursor over the rows.
+    """
+
+    table = PROFESSOR_TABLES[table]
+    params = {"prof_id": prof_id, "limit": limit or -1}
+    keyset = ""
+    if after:
+        params["section_id"], params["student_id"] = parse_cursor(after)
+        keyset = "AND (cs.id, t.student_id) > (:section_id, :student_id)"
+
+    # ordering on cs.id rather than t.section_id lets SQLite walk the
+    # (prof_id, id) index in order instead of sorting every row
+    sql = PROFESSOR_ROWS_QUERY.format(table=table, keyset=keyset, schema="{schema}")
+    return db.execute(
+        union_terms(sql, attach_archives(db, prof_id=prof_id), "ORDER BY section_id, student_id LIMIT :limit"), params
+    )
+
+
+def professor_section_counts(db: sqlite3.Connection, prof_id: int, table: str):
+    """
+    Count a professor's enrollment or droplist rows per section
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        prof_id (int): Professor ID.
+        table (str): "enrollments" or "droplist".
+
+    Returns:
+        list[dict]: section_id and count for each of the professor's sections.
+    """
+
+    if table == "enrollments":
+        sql = SECTION_ENROLLED_QUERY
+    else:
+        sql = SECTION_COUNTS_QUERY.format(schema="{schema}", table=PROFESSOR_TABLES[table])
+    cursor = db.execute(union_terms(sql, attach_archives(db, prof_id=prof_id), "ORDER BY 1"), {"prof_id": prof_id})
+    return [{"section_id": row[0], "count": row[1]} for row in cursor]
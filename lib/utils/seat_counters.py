@@ -0,0 +1,94 @@
+import argparse
+import contextlib
+import sqlite3
+import sys
+
+
+COUNTER_QUERY = """
+    SELECT cs.id AS section_id,
+        cs.enrolled_count,
+        (SELECT COUNT(*) FROM enrollments e WHERE e.section_id = cs.id) AS actual_enrolled,
+        cs.waitlist_count,
+        (SELECT COUNT(*) FROM waitlist w WHERE w.section_id = cs.id) AS actual_waitlist
+    FROM course_section cs
+"""
+
+REPAIR_QUERY = """
+    UPDATE course_section
+    SET enrolled_count = (SELECT COUNT(*) FROM enrollments e WHERE e.section_id = course_section.id),
+        waitlist_count = (SELECT COUNT(*) FROM waitlist w WHERE w.section_id = course_section.id)
+    WHERE enrolled_count != (SELECT COUNT(*) FROM enrollments e WHERE e.section_id = course_section.id)
+        OR waitlist_count != (SELECT COUNT(*) FROM waitlist w WHERE w.section_id = course_section.id)
+"""
+
+
+def verify_seat_counters(db: sqlite3.Connection):
+    """
+    Compare the maintained seat counters against the real row counts
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+
+    Returns:
+        list[dict]: One entry per section whose counters have drifted.
+    """
+
+    cursor = db.execute(
+        f"""
+        SELECT * FROM ({COUNTER_QUERY})
+        WHERE enrolled_count != actual_enrolled OR waitlist_count != actual_waitlist
+        """
+    )
+    return [dict(zip([c[0] for c in cursor.description], row)) for row in cursor]
+
+
+def repair_seat_counters(db: sqlite3.Connection):
+    """
+    Recompute enrolled_count and waitlist_count for every section
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+
+    Returns:
+        int: The number of sections whose counters were corrected.
+    """
+
+    cursor = db.execute(REPAIR_QUERY)
+    db.commit()
+    return cursor.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Verify (default) or repair the per-section enrolled/waitlist counters."
+    )
+    parser.add_argument("--database", help="SQLite database path (defaults to Settings.database)")
+    parser.add_argument("--repair", action="store_true", help="recompute counters that drifted")
+    args = parser.parse_args(argv)
+
+    database = args.database
+    if database is None:
+        from lib.models import Settings
+
+        database = Settings().database
+
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        drifted = verify_seat_counters(db)
+        for row in drifted:
+            print(
+                f"section {row['section_id']}: "
+                f"enrolled {row['enrolled_count']} (actual {row['actual_enrolled']}), "
+                f"waitlist {row['waitlist_count']} (actual {row['actual_waitlist']})"
+            )
+
+        if args.repair:
+            fixed = repair_seat_counters(db)
+            print(f"repaired {fixed} section(s)")
+            return 0
+
+        print(f"{len(drifted)} section(s) with drifted counters")
+        return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+import time
+
+from lib.db import get_async_database
+from lib.models import Settings
+
+
+settings = Settings()
+logger = logging.getLogger(__name__)
+
+# Seat counters of some or all sections, plus the shared "seats" version, read
+# in one statement (so from one snapshot); `where` selects the sections
+SEAT_COUNTS_QUERY = """
+    SELECT cs.id, cs.enrolled_count, cs.waitlist_count, cs.room_capacity,
+        (SELECT version FROM catalog_version WHERE name = 'seats')
+    FROM course_section cs
+    {where}
+"""
+SECTIONS_FILTER = "WHERE cs.id IN (SELECT value FROM json_each(:section_ids))"
+
+
+def seat_event(section_id: int, counts: tuple) -> dict:
+    enrolled, waitlisted, capacity = counts
+    return {
+        "section_id": section_id,
+        "enrolled_count": enrolled,
+        "waitlist_count": waitlisted,
+        "room_capacity": capacity,
+        "open_seats": max(0, capacity - enrolled),
+    }
+
+
+def read_seat_counts(db, section_ids: list[int] = None):
+    """
+    Read seat counters
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        section_ids (list[int], optional): Sections to read. Defaults to all of them.
+
+    Returns:
+        tuple[dict, int | None]: section_id -> (enrolled, waitlisted, capacity),
+            and the "seats" version (None if no row was read).
+    """
+
+    if section_ids is None:
+        cursor = db.execute(SEAT_COUNTS_QUERY.format(where=""))
+    else:
+        cursor = db.execute(
+            SEAT_COUNTS_QUERY.format(where=SECTIONS_FILTER), {"section_ids": json.dumps(section_ids)}
+        )
+    counts = {}
+    version = None
+    for section_id, enrolled, waitlisted, capacity, version in cursor:
+        counts[section_id] = (enrolled, waitlisted, capacity)
+    return counts, version
+
+
+class Subscription:
+    """
+    One stream's view of the feed
+
+    Only the latest event per section is kept until the stream reads it, so
+    a slow client gets coalesced updates instead of an ever-growing backlog.
+    """
+
+    __slots__ = ("sections", "_pending", "_ready")
+
+    def __init__(self, sections):
+        self.sections = sections
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def push(self, event: dict):
+        self._pending[event["section_id"]] = event
+        self._ready.set()
+
+    async def next(self, timeout: float):
+        """
+        Wait for events
+
+        Returns:
+            list[dict]: Events in publication order, or [] if `timeout` passed first.
+        """
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        self._ready.clear()
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class SeatFeed:
+    """
+    In-process change feed of section seat counters
+
+    Write routes and the waitlist scheduler call `notify(section_ids)` after
+    their commit. One background task reads the counters of the notified
+    sections in a single statement and pushes the ones that changed to the
+    subscribed streams, so the database cost follows the number of changes,
+    not the number of subscribers: idle subscribers cost nothing.
+
+    Writes made by other processes are not notified here. Every
+    `resync_interval` seconds (while anyone is subscribed) the task compares
+    the shared "seats" version with the one of its last full read, and
+    re-reads every section if it moved.
+
+    Parameters:
+        resync_interval (float): Seconds between checks for changes made by
+            other processes; 0 disables them.
+        heartbeat (float): Seconds of silence after which a stream sends a keepalive comment.
+        max_subscribers (int): Streams served at once by this process.
+    """
+
+    def __init__(self, resync_interval: float = 2.0, heartbeat: float = 15.0, max_subscribers: int = 10000):
+        self.resync_interval = resync_interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._load_lock = None
+
+        self._counts = None  # section_id -> (enrolled, waitlisted, capacity), while subscribed
+        self._version = None  # "seats" version of the last full read
+        self._synced_at = 0.0
+        self._subscribers = set()
+        self._all = set()  # subscribers without a section filter
+        self._by_section = {}
+
+        self._events = 0
+        self._refreshes = 0
+        self._full_reads = 0
+        self._last_error = None
+
+    def notify(self, section_ids):
+        """Record that the seat counters of `section_ids` may have changed (thread-safe)."""
+        with self._lock:
+            self._pending.update(section_ids)
+        if self._wakeup is not None and self._subscribers:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def is_full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    async def subscribe(self, section_ids=None):
+        """
+        Subscribe to seat changes
+
+        Parameters:
+            section_ids (list[int], optional): Only these sections. All sections when omitted.
+
+        Returns:
+            tuple[Subscription, list[dict]]: The subscription and a snapshot of
+                the current counters of its sections.
+        """
+        if self._counts is None:
+            if self._load_lock is None:
+                self._load_lock = asyncio.Lock()
+            async with self._load_lock:
+                if self._counts is None:
+                    await self._read_all(initial=True)
+
+        sections = frozenset(section_ids) if section_ids else None
+        subscription = Subscription(sections)
+        self._subscribers.add(subscription)
+        if sections is None:
+            self._all.add(subscription)
+            snapshot = [seat_event(s, c) for s, c in sorted(self._counts.items())]
+        else:
+            for section_id in sections:
+                self._by_section.setdefault(section_id, set()).add(subscription)
+            snapshot = [seat_event(s, self._counts[s]) for s in sorted(sections) if s in self._counts]
+        if self._wakeup is not None:
+            # pick up changes notified during the initial read, and start the resync timer
+            self._wakeup.set()
+        return subscription, snapshot
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        self._all.discard(subscription)
+        for section_id in subscription.sections or ():
+            subscribers = self._by_section.get(section_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_section[section_id]
+        if not self._subscribers:
+            # nobody is watching, stop tracking until the next subscriber
+            self._counts = None
+            self._version = None
+
+    def _publish(self, counts: dict):
+        if self._counts is None:
+            return
+        for section_id, new in counts.items():
+            if self._counts.get(section_id) == new:
+                continue
+            self._counts[section_id] = new
+            event = seat_event(section_id, new)
+            self._events += 1
+            for subscription in self._all:
+                subscription.push(event)
+            for subscription in self._by_section.get(section_id, ()):
+                subscription.push(event)
+
+    async def _read(self, section_ids: list[int] = None):
+        adb = get_async_database()
+        db = await adb.acquire()
+        try:
+            return await db.run(read_seat_counts, section_ids)
+        finally:
+            await adb.release(db)
+
+    async def _read_all(self, initial: bool = False):
+        counts, version = await self._read()
+        self._full_reads += 1
+        self._synced_at = time.monotonic()
+        if initial:
+            self._counts = counts
+        elif self._counts is not None:
+            for section_id in self._counts.keys() - counts.keys():
+                # deleted sections
+                del self._counts[section_id]
+            self._publish(counts)
+        else:
+            # the last subscriber left during the read
+            return
+        self._version = version
+
+    async def _resync(self):
+        self._synced_at = time.monotonic()
+        adb = get_async_database()
+        db = await adb.acquire()
+        try:
+            row = await db.fetchone("SELECT version FROM catalog_version WHERE name = 'seats'")
+        finally:
+            await adb.release(db)
+        if row is not None and row[0] != self._version:
+            await self._read_all()
+
+    async def run_once(self):
+        """Publish the changes of the notified sections, and resync if it is due."""
+        with self._lock:
+            section_ids = sorted(self._pending)
+            self._pending.clear()
+        if self._counts is None:
+            # nobody is subscribed; a new subscriber starts from a full read
+            return
+        if section_ids:
+            counts, _ = await self._read(section_ids)
+            self._refreshes += 1
+            self._publish(counts)
+        if self.resync_interval and time.monotonic() - self._synced_at >= self.resync_interval:
+            await self._resync()
+
+    async def _run(self):
+        while True:
+            timeout = self.resync_interval if self._subscribers and self.resync_interval else None
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+                self._last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                logger.exception("seat feed refresh failed")
+
+    def start(self):
+        """Start the background task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "subscribers": len(self._subscribers),
+            "tracked_sections": len(self._counts) if self._counts is not None else 0,
+            "pending": len(self._pending),
+            "events": self._events,
+            "refreshes": self._refreshes,
+            "full_reads": self._full_reads,
+            "last_error": self._last_error,
+        }
+
+
+seat_feed = SeatFeed(
+    settings.seat_feed_resync_interval, settings.seat_feed_heartbeat, settings.seat_feed_max_subscribers
+)
@@ -0,0 +1,95 @@
+import sqlite3
+
+from fastapi import HTTPException, status
+
+
+# Section and course details shown for every schedule entry
+SCHEDULE_SECTION_COLUMNS = """
+    cs.id AS section_id, cs.dept_code, cs.course_num, c.title, cs.section_no, cs.semester,
+    cs.year, cs.prof_id, p.first_name AS prof_first_name, p.last_name AS prof_last_name,
+    cs.room_num, cs.room_capacity, cs.enrolled_count, cs.waitlist_count, cs.course_start_date
+"""
+
+SCHEDULE_JOINS = """
+    JOIN course_section cs ON cs.id = t.section_id
+    JOIN course c ON c.department_code = cs.dept_code AND c.course_no = cs.course_num
+    LEFT JOIN professors p ON p.id = cs.prof_id
+"""
+
+# Enrollments, waitlist entries (with positions) and the most recent drops of
+# one student in a single statement. Each branch starts from the table's
+# student_id index, so the cost follows the student's own rows, not the table
+# sizes; sections, courses and professors are primary key probes.
+SCHEDULE_QUERY = f"""
+    SELECT 'enrolled' AS kind, t.enrollment_date AS date, NULL AS position, NULL AS administrative,
+        {SCHEDULE_SECTION_COLUMNS}
+    FROM enrollments t {SCHEDULE_JOINS}
+    WHERE t.student_id = :student_id
+    UNION ALL
+    SELECT 'waitlisted', t.waitlist_date,
+        (SELECT COUNT(*)
+        FROM waitlist w
+        WHERE w.section_id = t.section_id AND
+            (w.waitlist_date, w.student_id) < (t.waitlist_date, t.student_id)
+        ) + 1,
+        NULL,
+        {SCHEDULE_SECTION_COLUMNS}
+    FROM waitlist t {SCHEDULE_JOINS}
+    WHERE t.student_id = :student_id
+    UNION ALL
+    SELECT * FROM (
+        SELECT 'dropped', t.drop_date, NULL, t.administrative,
+            {SCHEDULE_SECTION_COLUMNS}
+        FROM droplist t {SCHEDULE_JOINS}
+        WHERE t.student_id = :student_id
+        ORDER BY t.drop_date DESC, t.section_id
+        LIMIT :drops
+    )
+"""
+
+SCHEDULE_KINDS = ("enrolled", "waitlisted", "dropped")
+
+
+def get_student_schedule(db: sqlite3.Connection, student_id: int, drops: int = 10):
+    """
+    Get a student's schedule
+
+    Two statements whatever the number of sections: the student lookup and
+    SCHEDULE_QUERY. Only the terms in the hot database are read, closed terms
+    moved to archives by `python -m lib.archive` are not part of a schedule.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection.
+        student_id (int): Student ID.
+        drops (int): Number of most recent drops to include.
+
+    Returns:
+        dict: The student, their enrolled sections (by section_id), waitlisted
+        sections with 1-based positions (by section_id) and recent drops
+        (newest first).
+
+    Raises:
+        HTTPException (404): If the student does not exist.
+    """
+
+    student = db.execute("SELECT * FROM students WHERE id = ?", [student_id]).fetchone()
+    if student is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Student not found"
+        )
+
+    schedule = {kind: [] for kind in SCHEDULE_KINDS}
+    for row in db.execute(SCHEDULE_QUERY, {"student_id": student_id, "drops": drops}):
+        entry = dict(row)
+        kind = entry.pop("kind")
+        if kind != "waitlisted":
+            del entry["position"]
+        if kind == "dropped":
+            entry["administrative"] = bool(entry["administrative"])
+        else:
+            del entry["administrative"]
+        schedule[kind].append(entry)
+
+    schedule["enrolled"].sort(key=lambda entry: entry["section_id"])
+    schedule["waitlisted"].sort(key=lambda entry: entry["section_id"])
+    return {"student": dict(student), **schedule}
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+
+from lib.db.transaction import run_immediate
+
+
+# Sections whose course started more than two weeks ago no longer take waitlist promotions
+OPEN_WINDOW = "DATE('now') <= date(cs.course_start_date, '+14 days')"
+
+# Waitlisted students that fit in their section's open seats, in waitlist order
+PROMOTION_QUERY = """
+    SELECT section_id, student_id
+    FROM (
+        SELECT w.section_id,
+            w.student_id,
+            ROW_NUMBER() OVER (
+                PARTITION BY w.section_id ORDER BY w.waitlist_date, w.student_id
+            ) AS rank,
+            cs.room_capacity - cs.enrolled_count AS open_seats
+        FROM course_section cs
+        JOIN waitlist w ON w.section_id = cs.id
+        WHERE cs.enrolled_count < cs.room_capacity AND {section_filter} AND
+            NOT EXISTS (SELECT 1 FROM enrollments e
+                        WHERE e.section_id = w.section_id AND e.student_id = w.student_id)
+    )
+    WHERE rank <= open_seats
+"""
+
+SECTIONS_FILTER = "cs.id IN (SELECT value FROM json_each(:section_ids))"
+
+
+def _promote(db: sqlite3.Connection, section_ids: list[int] = None):
+    if section_ids is None:
+        section_filter = OPEN_WINDOW
+        params = {}
+    else:
+        section_filter = SECTIONS_FILTER
+        params = {"section_ids": json.dumps(section_ids)}
+
+    db.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS promotion_batch (
+            section_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            PRIMARY KEY (section_id, student_id)
+        )
+        """
+    )
+    db.execute("DELETE FROM temp.promotion_batch")
+
+    # rank every section's waitlist independently and keep as many students
+    # as that section has open seats
+    db.execute(
+        "INSERT INTO temp.promotion_batch (section_id, student_id) "
+        + PROMOTION_QUERY.format(section_filter=section_filter),
+        params,
+    )
+
+    db.execute(
+        """
+        INSERT INTO enrollments (section_id, student_id, enrollment_date)
+        SELECT section_id, student_id, datetime('now') FROM temp.promotion_batch
+        """
+    )
+    db.execute(
+        """
+        DELETE FROM waitlist
+        WHERE (section_id, student_id) IN (SELECT section_id, student_id FROM temp.promotion_batch)
+        """
+    )
+
+    report = [
+        {"section_id": row[0], "promoted": row[1]}
+        for row in db.execute(
+            """
+            SELECT section_id, COUNT(*) FROM temp.promotion_batch
+            GROUP BY section_id ORDER BY section_id
+            """
+        )
+    ]
+    db.execute("DELETE FROM temp.promotion_batch")
+    return report
+
+
+def promote_waitlists(db: sqlite3.Connection, section_ids: list[int] = None):
+    """
+    Fill open seats from the waitlists of many sections in one set-based pass
+
+    One BEGIN IMMEDIATE transaction ranks each section's waitlist
+    (waitlist_date, then student_id), selects as many students per section
+    as it has open seats, enrolls them and deletes exactly those waitlist
+    rows. The statement count does not depend on the number of sections.
+
+    Parameters:
+        db (sqlite3.Connection): Database connection, outside of a transaction.
+        section_ids (list[int], optional): Sections to promote into. Defaults
+            to every section still within its enrollment window.
+
+    Returns:
+        list[dict]: section_id and number of students promoted, for each
+            section that received at least one student.
+    """
+
+    return run_immediate(db, _promote, section_ids)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import sqlite3
+import time
+
+from lib.db import get_async_database
+from lib.migrations import LATEST_VERSION, get_schema_version
+from lib.migrations.query_plans import hot_queries
+from lib.utils.catalog import catalog_cache
+from lib.utils.config_store import config_store
+
+
+logger = logging.getLogger(__name__)
+
+# Read-only requests sent through the app before the worker accepts any.
+# FastAPI builds the dependency and validation models of every route on the
+# first request it routes, which made the first real request several times
+# slower than the next ones.
+WARMUP_REQUESTS = ("/configs", "/classes/?limit=1")
+
+
+class SchemaOutdated(RuntimeError):
+    """Raised at startup when the database was not migrated to the schema this code expects."""
+
+
+def check_schema(db: sqlite3.Connection):
+    version = get_schema_version(db)
+    if version < LATEST_VERSION:
+        raise SchemaOutdated(
+            f"database schema is at version {version}, this code needs {LATEST_VERSION}: "
+            "run python -m lib.migrations"
+        )
+    return version
+
+
+def prepare_statements(db: sqlite3.Connection):
+    """
+    Run the read statements of `hot_queries()` once, fetching a single row each
+
+    Leaves them compiled in the connection's statement cache and pulls the
+    pages of the indexes they use into its page cache. The statements whose
+    plans are allowed full scans are skipped, they are not cheap to step.
+
+    Returns:
+        int: Statements prepared.
+    """
+
+    prepared = 0
+    for sql, params, allowed in hot_queries().values():
+        if allowed or not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            continue
+        db.execute(sql, params).fetchone()
+        prepared += 1
+    return prepared
+
+
+def _noop(db: sqlite3.Connection):
+    return None
+
+
+async def route_request(app, url: str):
+    """
+    Send a GET request through the app in process (it shows up in the metrics like any other)
+
+    Returns:
+        int: The response status.
+    """
+
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("warmup", 80),
+        "client": None,
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [],
+        "app": app,
+    }
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    await app(scope, receive, send)
+    return response.get("status")
+
+
+async def warm_up(app=None):
+    """
+    Get a worker process ready to serve its first request at steady-state latency
+
+    Run from the application lifespan, before the worker accepts requests:
+    checks the schema version, opens every pool connection (which also
+    starts the database executor threads) and prepares the hot statements on
+    each of them, then loads the catalog cache and the configs and runs an
+    empty write so the group-commit writer is started. With `app`, the
+    WARMUP_REQUESTS are then routed through it once.
+
+    Returns:
+        dict: Seconds spent per step.
+
+    Raises:
+        SchemaOutdated: If the database needs `python -m lib.migrations`.
+    """
+
+    adb = get_async_database()
+    timings = {}
+
+    started = time.perf_counter()
+    connections = [await adb.acquire() for _ in range(adb.pool.size)]
+    try:
+        timings["connect"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        version = await connections[0].run(check_schema)
+        prepared = await asyncio.gather(*(conn.run(prepare_statements) for conn in connections))
+        timings["statements"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        cached = await connections[0].run(catalog_cache.preload)
+        await connections[0].run(config_store.all)
+        timings["caches"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await connections[0].write(_noop)
+        timings["writer"] = time.perf_counter() - started
+    finally:
+        for conn in connections:
+            await adb.release(conn)
+
+    if app is not None:
+        started = time.perf_counter()
+        for url in WARMUP_REQUESTS:
+            status = await route_request(app, url)
+            if status != 200:
+                logger.warning("warmup request %s answered %s", url, status)
+        timings["routes"] = time.perf_counter() - started
+
+    logger.info(
+        "warmed up in %.3fs: schema version %d, %d connections, %d statements each, %d catalog rows cached",
+        sum(timings.values()), version, len(connections), max(prepared), cached,
+    )
+    return timings
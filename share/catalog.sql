@@ -0,0 +1,73 @@
+PRAGMA foreign_keys = ON;
+BEGIN TRANSACTION;
+DROP TABLE IF EXISTS catalog_version;
+-- bumped by the triggers below so readers can detect changes with one cheap lookup
+--   catalog: courses and sections (anything except the seat counters)
+--   seats:   enrolled_count / waitlist_count
+--   configs: the configs table
+CREATE TABLE catalog_version (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    modified_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO catalog_version (name) VALUES ('catalog'), ('seats'), ('configs');
+DROP TABLE IF EXISTS term_archive;
+-- closed terms moved out of this database into read-only files, see lib/archive
+CREATE TABLE term_archive (
+    semester TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    path TEXT NOT NULL,  -- relative to the directory of this database
+    sections INTEGER NOT NULL,
+    archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (year, semester)
+);
+DROP TABLE IF EXISTS term_archive_professor;
+-- professors who taught in each archived term, so their listings attach only those archives
+CREATE TABLE term_archive_professor (
+    semester TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    prof_id INTEGER NOT NULL,
+    PRIMARY KEY (prof_id, year, semester)
+);
+CREATE TRIGGER course_catalog_insert AFTER INSERT ON course
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER course_catalog_update AFTER UPDATE ON course
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER course_catalog_delete AFTER DELETE ON course
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER course_section_catalog_insert AFTER INSERT ON course_section
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER course_section_catalog_update AFTER UPDATE OF id, dept_code, course_num, section_no, semester, year,
+    prof_id, room_num, room_capacity, course_start_date, enrollment_start, enrollment_end ON course_section
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER course_section_catalog_delete AFTER DELETE ON course_section
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'catalog';
+END;
+CREATE TRIGGER course_section_seats_update AFTER UPDATE OF enrolled_count, waitlist_count ON course_section
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'seats';
+END;
+CREATE TRIGGER configs_insert AFTER INSERT ON configs
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'configs';
+END;
+CREATE TRIGGER configs_update AFTER UPDATE ON configs
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'configs';
+END;
+CREATE TRIGGER configs_delete AFTER DELETE ON configs
+BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP WHERE name = 'configs';
+END;
+COMMIT;
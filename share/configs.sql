@@ -1,7 +1,11 @@
 PRAGMA foreign_keys = ON;
 BEGIN TRANSACTION;
 DROP TABLE IF EXISTS configs;
-CREATE TABLE configs (automatic_enrollment TEXT NOT NULL);
-INSERT INTO configs (automatic_enrollment)
-VALUES ('TRUE');
-COMMIT;
\ No newline at end of file
+-- typed and cached by lib/utils/config_store.py; keys without a row use its defaults
+CREATE TABLE configs (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT INTO configs (key, value)
+VALUES ('automatic_enrollment', 'TRUE');
+COMMIT;
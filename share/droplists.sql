@@ -9,6 +9,7 @@ CREATE TABLE droplist (
     administrative BOOLEAN NOT NULL DEFAULT FALSE,
     PRIMARY KEY(section_id, student_id)
 );
+CREATE INDEX droplist_student_idx ON droplist(student_id);
 INSERT INTO droplist (section_id, student_id, drop_date)
 VALUES (2, 65123456, '2023-08-24 09:00:00'),
     (2, 73123456, '2023-08-25 10:00:00'),
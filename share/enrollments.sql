@@ -9,6 +9,17 @@ CREATE TABLE enrollments (
     enrollment_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     PRIMARY KEY(section_id, student_id)
 );
+-- a student's own enrollments (schedule, drops)
+CREATE INDEX enrollments_student_idx ON enrollments(student_id);
+-- keep course_section.enrolled_count in sync so seat checks never have to COUNT(*)
+CREATE TRIGGER enrollments_count_insert AFTER INSERT ON enrollments
+BEGIN
+    UPDATE course_section SET enrolled_count = enrolled_count + 1 WHERE id = NEW.section_id;
+END;
+CREATE TRIGGER enrollments_count_delete AFTER DELETE ON enrollments
+BEGIN
+    UPDATE course_section SET enrolled_count = enrolled_count - 1 WHERE id = OLD.section_id;
+END;
 INSERT INTO enrollments (section_id, student_id, enrollment_date)
 VALUES (2, 12345678, '2023-08-21 09:00:00'),
     (2, 23456789, '2023-08-22 09:00:00'),
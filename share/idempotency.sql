@@ -0,0 +1,15 @@
+PRAGMA foreign_keys = ON;
+BEGIN TRANSACTION;
+DROP TABLE IF EXISTS idempotency_key;
+-- first responses of enrollment and drop requests sent with an Idempotency-Key,
+-- shared by the worker processes, see lib/utils/idempotency.py
+CREATE TABLE idempotency_key (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,  -- sha256 of the method, path, query and body
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,  -- JSON list of [name, value]
+    body BLOB NOT NULL,
+    expires_at REAL NOT NULL  -- unix time
+);
+CREATE INDEX idempotency_key_expires_idx ON idempotency_key(expires_at);
+COMMIT;
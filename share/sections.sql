@@ -14,6 +14,9 @@ CREATE TABLE course_section (
   course_start_date TEXT NOT NULL,
   enrollment_start TEXT NOT NULL,
   enrollment_end TEXT NOT NULL,
+  -- maintained by the triggers on enrollments and waitlist, see lib/utils/seat_counters.py
+  enrolled_count INTEGER NOT NULL DEFAULT 0,
+  waitlist_count INTEGER NOT NULL DEFAULT 0,
   UNIQUE (
     dept_code,
     course_num,
@@ -23,6 +26,12 @@ CREATE TABLE course_section (
   ),
   FOREIGN KEY (dept_code, course_num) REFERENCES course(department_code, course_no)
 );
+CREATE INDEX course_section_prof_idx ON course_section(prof_id);
+CREATE INDEX course_section_term_idx ON course_section(year, semester);
+-- GET /classes/?semester= without a year
+CREATE INDEX course_section_semester_idx ON course_section(semester, year);
+-- GET /classes/?open_seats=true: only sections with seats left, in id order
+CREATE INDEX course_section_open_idx ON course_section(id) WHERE enrolled_count < room_capacity;
 INSERT INTO course_section (id, dept_code, course_num, section_no, semester, year, prof_id, room_num, room_capacity, course_start_date, enrollment_start, enrollment_end) VALUES (1, 'CPSC', 101, 1, 'SU', 2023, 1, 101, 30, '2023-06-12', '2023-06-01 09:00:00', '2023-06-15 17:00:00');
 INSERT INTO course_section (id, dept_code, course_num, section_no, semester, year, prof_id, room_num, room_capacity, course_start_date, enrollment_start, enrollment_end) VALUES (2, 'CPSC', 201, 1, 'FA', 2023, 2, 102, 25, '2023-09-05', '2023-08-20 09:00:00', '2023-09-25 17:00:00');
 INSERT INTO course_section (id, dept_code, course_num, section_no, semester, year, prof_id, room_num, room_capacity, course_start_date, enrollment_start, enrollment_end) VALUES (3, 'EGEC', 301, 1, 'SU', 2023, 3, 201, 20, '2023-06-12', '2023-05-30 09:00:00', '2023-06-15 17:00:00');
@@ -8,6 +8,18 @@ CREATE TABLE waitlist (
     waitlist_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     PRIMARY KEY(section_id, student_id)
 );
+-- waitlist order within a section (student_id breaks ties between identical timestamps)
+CREATE INDEX waitlist_section_date_idx ON waitlist(section_id, waitlist_date, student_id);
+CREATE INDEX waitlist_student_idx ON waitlist(student_id);
+-- keep course_section.waitlist_count in sync so waitlist checks never have to COUNT(*)
+CREATE TRIGGER waitlist_count_insert AFTER INSERT ON waitlist
+BEGIN
+    UPDATE course_section SET waitlist_count = waitlist_count + 1 WHERE id = NEW.section_id;
+END;
+CREATE TRIGGER waitlist_count_delete AFTER DELETE ON waitlist
+BEGIN
+    UPDATE course_section SET waitlist_count = waitlist_count - 1 WHERE id = OLD.section_id;
+END;
 INSERT INTO waitlist (section_id, student_id, waitlist_date)
 VALUES (2, 65123456, '2023-08-28 09:00:00'),
     (2, 73123456, '2023-08-28 10:00:00'),
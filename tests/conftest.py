@@ -0,0 +1,127 @@
+import contextlib
+import os
+import pathlib
+import sqlite3
+import tempfile
+
+import httpx
+import pytest
+
+# Settings needs a database path at import time; every test uses its own
+os.environ.setdefault("DATABASE", str(pathlib.Path(tempfile.gettempdir()) / "courseenrollment-tests.db"))
+
+import lib.db
+from lib.db.aio import AsyncDatabase
+from lib.db.pool import ConnectionPool
+from lib.migrations import migrate
+from lib.utils.config_store import config_store
+
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Same order as bin/init.sh
+SCHEMA_FILES = [
+    "departments", "professors", "students", "courses", "sections", "enrollments",
+    "waitlists", "droplists", "configs", "catalog", "idempotency",
+]
+
+PRAGMAS = {"journal_mode": "WAL", "busy_timeout": 5000, "foreign_keys": "ON"}
+
+# Ids well above the seed data
+FIRST_STUDENT = 900000
+FIRST_SECTION = 9000
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Path of a database built like bin/init.sh does: the share/ scripts, then every migration."""
+
+    path = tmp_path / "titanonline.db"
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        for name in SCHEMA_FILES:
+            db.executescript((ROOT / "share" / f"{name}.sql").read_text())
+        migrate(db)
+    # the store is process-wide, and every test database starts at the same configs version
+    config_store.invalidate()
+    yield str(path)
+    config_store.invalidate()
+
+
+@pytest.fixture
+def pool(database):
+    pool = ConnectionPool(database, size=8, pragmas=PRAGMAS)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def db(pool):
+    conn = pool.acquire()
+    yield conn
+    pool.release(conn)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client(database, monkeypatch):
+    """
+    Client of the app served from the test database, without its lifespan
+
+    The process-wide pool has a single connection, so a request that holds
+    two at once times out instead of passing by luck.
+    """
+
+    import api
+
+    pool = ConnectionPool(database, size=1, timeout=1.0, pragmas=PRAGMAS)
+    adb = AsyncDatabase(pool, workers=4)
+    monkeypatch.setattr(lib.db, "_pool", pool)
+    monkeypatch.setattr(lib.db, "_async_db", adb)
+    monkeypatch.setattr(lib.db, "_writer", None)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    adb.close()
+    pool.close()
+
+
+def add_section(db: sqlite3.Connection, room_capacity: int, section_no: int = 1):
+    """Add a CPSC 101 section starting today (so within the promotion window) and return its id."""
+
+    section_id = FIRST_SECTION + section_no
+    db.execute(
+        """
+        INSERT INTO course_section (id, dept_code, course_num, section_no, semester, year, prof_id,
+            room_num, room_capacity, course_start_date, enrollment_start, enrollment_end)
+        VALUES (?, 'CPSC', 101, ?, 'FA', 2099, 1, 101, ?, date('now'), datetime('now', '-1 day'),
+            datetime('now', '+1 day'))
+        """,
+        [section_id, 100 + section_no, room_capacity],
+    )
+    db.commit()
+    return section_id
+
+
+def add_students(db: sqlite3.Connection, count: int):
+    """Add `count` students and return their ids."""
+
+    ids = list(range(FIRST_STUDENT, FIRST_STUDENT + count))
+    db.executemany(
+        "INSERT INTO students (id, first_name, last_name, email) VALUES (?, 'Test', 'Student', 'test@example.com')",
+        [[i] for i in ids],
+    )
+    db.commit()
+    return ids
+
+
+def set_config(db: sqlite3.Connection, key: str, value: str):
+    db.execute(
+        "INSERT INTO configs (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        [key, value],
+    )
+    db.commit()
+    config_store.invalidate()
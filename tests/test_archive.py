@@ -0,0 +1,61 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+from conftest import FIRST_SECTION
+from lib.archive import ArchiveError, archive_term, attach_archives, matching_archives
+from lib.utils.professor_helper import professor_section_counts
+
+
+def add_term(db: sqlite3.Connection, year: int, prof_id: int):
+    """Add a closed FA section of `year` taught by `prof_id` and return its id."""
+
+    section_id = FIRST_SECTION + year % 100
+    db.execute(
+        """
+        INSERT INTO course_section (id, dept_code, course_num, section_no, semester, year, prof_id,
+            room_num, room_capacity, course_start_date, enrollment_start, enrollment_end)
+        VALUES (?, 'CPSC', 101, 1, 'FA', ?, ?, 101, 30, '2000-09-01', '2000-08-01', '2000-08-15')
+        """,
+        [section_id, year, prof_id],
+    )
+    db.commit()
+    return section_id
+
+
+def attached(db: sqlite3.Connection):
+    return [row[1] for row in db.execute("PRAGMA database_list") if row[1] not in ("main", "temp")]
+
+
+@pytest.fixture
+def db(database):
+    # a plain connection, like python -m lib.archive opens
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        db.row_factory = sqlite3.Row
+        yield db
+
+
+def test_history_is_not_capped(db, tmp_path):
+    # as if SQLite could attach only two databases
+    db.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 2)
+    years = range(2001, 2006)
+    sections = {year: add_term(db, year, prof_id=1 if year < 2003 else 2) for year in years}
+    for year in years:
+        archive_term(db, "FA", year, tmp_path / "archive")
+
+    # each read attaches only the terms it matches, and detaches the others
+    assert attach_archives(db, "FA", 2001) == ["term_2001_fa"]
+    assert attach_archives(db, year=2004) == ["term_2004_fa"]
+    assert attached(db) == ["term_2004_fa"]
+
+    # a professor's listings read the terms they taught in
+    assert attach_archives(db, prof_id=1) == ["term_2001_fa", "term_2002_fa"]
+    counts = professor_section_counts(db, 1, "enrollments")
+    assert {c["section_id"] for c in counts} >= {sections[2001], sections[2002]}
+
+    # more history than one query can read is refused, not left out
+    with pytest.raises(ArchiveError):
+        matching_archives(db, semester="FA")
+    with pytest.raises(ArchiveError):
+        professor_section_counts(db, 2, "enrollments")
@@ -0,0 +1,112 @@
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import add_section, add_students, set_config
+from lib.models import Enrollment
+from lib.utils.enrollment_engine import ENROLLED, REJECTED, WAITLISTED, enroll, enroll_batch
+from lib.utils.enrollment_helper import drop_enrollment
+from lib.utils.seat_counters import verify_seat_counters
+from lib.utils.waitlist_promotion import promote_waitlists
+
+
+def enroll_concurrently(pool, section_id, student_ids):
+    def request(student_id):
+        with pool.connection() as conn:
+            return enroll(conn, student_id, section_id)
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        return list(executor.map(request, student_ids))
+
+
+def seats(db, section_id):
+    return db.execute(
+        """
+        SELECT (SELECT COUNT(*) FROM enrollments WHERE section_id = :id),
+            (SELECT COUNT(*) FROM waitlist WHERE section_id = :id)
+        """,
+        {"id": section_id},
+    ).fetchone()
+
+
+def test_concurrent_enrollments_never_oversell(pool, db):
+    set_config(db, "waitlist_capacity", "4")
+    section_id = add_section(db, room_capacity=5)
+    students = add_students(db, 30)
+
+    results = enroll_concurrently(pool, section_id, students)
+
+    statuses = collections.Counter(r.status for r in results)
+    assert statuses == {ENROLLED: 5, WAITLISTED: 4, REJECTED: 21}
+    assert {r.reason for r in results if r.status == REJECTED} == {"class_full"}
+    assert tuple(seats(db, section_id)) == (5, 4)
+    assert verify_seat_counters(db) == []
+
+
+def test_concurrent_requests_of_one_student_enroll_once(pool, db):
+    section_id = add_section(db, room_capacity=5)
+    student_id, = add_students(db, 1)
+
+    results = enroll_concurrently(pool, section_id, [student_id] * 8)
+
+    assert [r.status for r in results].count(ENROLLED) == 1
+    assert {r.reason for r in results if r.status == REJECTED} == {"already_enrolled"}
+    assert tuple(seats(db, section_id)) == (1, 0)
+
+
+def test_student_waitlist_limit(db):
+    set_config(db, "max_student_waitlists", "2")
+    sections = [add_section(db, room_capacity=1, section_no=n) for n in range(3)]
+    first, student_id = add_students(db, 2)
+    for section_id in sections:
+        assert enroll(db, first, section_id).status == ENROLLED
+
+    results = [enroll(db, student_id, section_id) for section_id in sections]
+
+    assert [r.status for r in results] == [WAITLISTED, WAITLISTED, REJECTED]
+    assert results[-1].reason == "waitlist_limit"
+
+
+def test_batch_matches_one_by_one(db):
+    set_config(db, "waitlist_capacity", "2")
+    section_id = add_section(db, room_capacity=3)
+    students = add_students(db, 7)
+    items = [Enrollment(student_id=s, section_id=section_id) for s in students]
+    # a repeated item is decided against the rows the earlier one wrote
+    items.append(items[0])
+
+    results = enroll_batch(db, items, chunk_size=4)
+
+    assert [r.status for r in results] == [ENROLLED] * 3 + [WAITLISTED] * 2 + [REJECTED] * 3
+    assert [r.reason for r in results[5:]] == ["class_full", "class_full", "already_enrolled"]
+    assert tuple(seats(db, section_id)) == (3, 2)
+    assert verify_seat_counters(db) == []
+
+
+def test_counters_after_drops_and_promotion(pool, db):
+    section_id = add_section(db, room_capacity=4)
+    students = add_students(db, 7)
+    results = enroll_concurrently(pool, section_id, students)
+    assert tuple(seats(db, section_id)) == (4, 3)
+
+    # two seats freed, a waitlisted student drops too
+    first, second = [r.student_id for r in results if r.status == ENROLLED][:2]
+    assert drop_enrollment(db, section_id, first) is True
+    assert drop_enrollment(db, section_id, second, administrative=True) is True
+    waitlisted = [row[0] for row in db.execute(
+        "SELECT student_id FROM waitlist WHERE section_id = ? ORDER BY waitlist_date, student_id", [section_id]
+    )]
+    assert drop_enrollment(db, section_id, waitlisted[0]) is False
+    assert verify_seat_counters(db) == []
+
+    report = promote_waitlists(db, [section_id])
+
+    assert report == [{"section_id": section_id, "promoted": 2}]
+    assert tuple(seats(db, section_id)) == (4, 0)
+    enrolled = {row[0] for row in db.execute("SELECT student_id FROM enrollments WHERE section_id = ?", [section_id])}
+    assert set(waitlisted[1:]) <= enrolled
+    assert db.execute("SELECT COUNT(*) FROM droplist WHERE section_id = ?", [section_id]).fetchone()[0] == 3
+    assert verify_seat_counters(db) == []
+
+    # nothing left to promote, and a second pass changes nothing
+    assert promote_waitlists(db, [section_id]) == []
+    assert verify_seat_counters(db) == []
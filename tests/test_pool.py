@@ -0,0 +1,31 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import PRAGMAS
+from lib.db.pool import ConnectionPool
+
+
+def test_discarded_connection_wakes_a_waiter(database):
+    pool = ConnectionPool(database, size=1, timeout=5.0, pragmas=PRAGMAS)
+    broken = pool.acquire()
+
+    def checkout():
+        with pool.connection() as db:
+            return db.execute("SELECT 1").fetchone()[0]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        waiter = executor.submit(checkout)
+        while pool.stats()["waits"] == 0:
+            time.sleep(0.01)
+        # cannot be reset, so release closes it and frees its slot
+        broken.close()
+        pool.release(broken)
+        # before the pool timeout, which would raise PoolTimeout
+        assert waiter.result(timeout=10) == 1
+
+    stats = pool.stats()
+    assert stats["discarded"] == 1
+    assert stats["timeouts"] == 0
+    assert (stats["open"], stats["idle"], stats["in_use"]) == (1, 1, 0)
+    pool.close()
+    assert pool.stats()["open"] == 0
@@ -0,0 +1,16 @@
+import contextlib
+import sqlite3
+
+from lib.migrations.query_plans import check_query_plans, hot_queries
+
+
+def test_hot_queries_use_indexes(database):
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        assert check_query_plans(db) == []
+
+
+def test_hot_queries_compile(database):
+    # a statement that no longer matches the schema fails here rather than at startup
+    with contextlib.closing(sqlite3.connect(database)) as db:
+        for sql, params, _ in hot_queries().values():
+            db.execute("EXPLAIN " + sql, params)
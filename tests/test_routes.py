@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_professor_rows_stream_with_one_connection(client):
+    listed = (await client.get("/professors/2/enrollments")).json()["enrollments"]
+
+    # the request connection is returned before the stream checks out its own
+    response = await client.get("/professors/2/enrollments", params={"stream": "true"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == listed
+    assert listed
+
+
+async def test_section_waitlist(client):
+    response = await client.get("/professor/waitlist/2")
+    assert response.status_code == 200
+    assert len(response.json()["waitlist"]) == 5
+
+    # nobody waiting is not an error
+    response = await client.get("/professor/waitlist/3")
+    assert response.status_code == 200
+    assert response.json() == {"waitlist": []}
@@ -0,0 +1,136 @@
+import collections
+import contextlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import PRAGMAS, add_section, add_students, set_config
+from lib.db.pool import ConnectionPool
+from lib.db.writer import GroupCommitWriter
+from lib.utils.enrollment_engine import ENROLLED, REJECTED, WAITLISTED, enroll
+from lib.utils.enrollment_helper import drop_enrollment
+from lib.utils.seat_counters import verify_seat_counters
+
+
+@pytest.fixture
+def writer(database):
+    # a wide window, so the units submitted together share one group commit
+    writer = GroupCommitWriter(ConnectionPool(database, size=1, pragmas=PRAGMAS), window=0.05)
+    yield writer
+    writer.close(timeout=10)
+    writer.pool.close()
+
+
+def insert_student(db: sqlite3.Connection, student_id: int):
+    db.execute(
+        "INSERT INTO students (id, first_name, last_name, email) VALUES (?, 'Test', 'Student', 'test@example.com')",
+        [student_id],
+    )
+    return student_id
+
+
+def insert_then_fail(db: sqlite3.Connection, student_id: int):
+    insert_student(db, student_id)
+    raise ValueError("unit failed")
+
+
+def insert_then_roll_back(db: sqlite3.Connection, student_id: int):
+    # breaks the unit contract: ends the group transaction under the writer
+    insert_student(db, student_id)
+    db.rollback()
+
+
+def student_ids(db: sqlite3.Connection):
+    return {row[0] for row in db.execute("SELECT id FROM students WHERE id BETWEEN 800000 AND 899999")}
+
+
+def test_failing_unit_is_isolated(writer, db):
+    futures = [
+        writer.submit(insert_student, 800001),
+        writer.submit(insert_then_fail, 800002),
+        writer.submit(insert_student, 800003),
+        # violates the primary key, the statement fails inside its unit
+        writer.submit(insert_student, 800001),
+    ]
+
+    assert futures[0].result(timeout=10) == 800001
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=10)
+    assert futures[2].result(timeout=10) == 800003
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[3].result(timeout=10)
+
+    assert student_ids(db) == {800001, 800003}
+    stats = writer.stats()
+    assert stats["groups"] == 1
+    assert stats["units"] == 4
+    assert stats["failed"] == 2
+    assert stats["regrouped"] == 0
+
+
+def test_group_failure_reruns_each_unit_alone(writer, db):
+    futures = [
+        writer.submit(insert_student, 800001),
+        writer.submit(insert_then_roll_back, 800002),
+        writer.submit(insert_student, 800003),
+    ]
+
+    assert futures[0].result(timeout=10) == 800001
+    with pytest.raises(sqlite3.OperationalError):
+        futures[1].result(timeout=10)
+    assert futures[2].result(timeout=10) == 800003
+
+    # the units of the lost group transaction were committed on their own
+    assert student_ids(db) == {800001, 800003}
+    assert writer.stats()["regrouped"] == 1
+
+
+def test_results_are_handed_out_after_commit(writer, database):
+    future = writer.submit(insert_student, 800001)
+    assert future.result(timeout=10) == 800001
+
+    # another connection already sees the row when the caller is told
+    with contextlib.closing(sqlite3.connect(database)) as other:
+        assert other.execute("SELECT COUNT(*) FROM students WHERE id = 800001").fetchone()[0] == 1
+
+
+def test_concurrent_enrollments_through_writer(writer, db):
+    set_config(db, "waitlist_capacity", "3")
+    section_id = add_section(db, room_capacity=6)
+    students = add_students(db, 40)
+    start = threading.Barrier(len(students))
+
+    def request(student_id):
+        start.wait()
+        return writer.submit(enroll, student_id, section_id).result(timeout=30)
+
+    with ThreadPoolExecutor(max_workers=len(students)) as executor:
+        results = list(executor.map(request, students))
+
+    statuses = collections.Counter(r.status for r in results)
+    assert statuses == {ENROLLED: 6, WAITLISTED: 3, REJECTED: 31}
+    assert writer.stats()["largest_group"] > 1
+
+    # drops grouped with enrollments keep the counters right
+    enrolled = [r.student_id for r in results if r.status == ENROLLED]
+    futures = [writer.submit(drop_enrollment, section_id, s) for s in enrolled[:2]]
+    futures += [writer.submit(enroll, s, section_id) for s in students[:2]]
+    for future in futures:
+        future.result(timeout=10)
+
+    assert verify_seat_counters(db) == []
+
+
+def test_writer_restarts_after_thread_failure(writer, database, tmp_path, db):
+    # the writer thread cannot open its connection
+    writer.pool.database = str(tmp_path / "missing" / "titanonline.db")
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit(insert_student, 800001).result(timeout=10)
+    assert writer.stats()["restarts"] == 1
+
+    # the next submit starts a new thread
+    writer.pool.database = database
+    assert writer.submit(insert_student, 800002).result(timeout=10) == 800002
+    assert student_ids(db) == {800002}